@@ -0,0 +1,131 @@
+"""
+API响应工具
+提供可插拔的高速JSON编码器（orjson/msgspec，不可用时回退到标准库）
+以及列表接口的按需字段选择（?fields=id,original_filename）
+"""
+
+import json
+from datetime import date, time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def json_default(obj):
+    """编码器不支持的类型：日期时间统一输出 ISO 8601（Flask 默认为 RFC 822），其他与 Flask 默认处理一致"""
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+
+def available_encoders() -> List[str]:
+    """返回当前环境中可用的JSON编码器，按优先级排序"""
+    encoders = []
+    if orjson is not None:
+        encoders.append('orjson')
+    if msgspec is not None:
+        encoders.append('msgspec')
+    encoders.append('stdlib')
+    return encoders
+
+
+def make_encoder(name: str, default: Callable) -> Tuple[str, Callable[[object], bytes]]:
+    """根据名称创建编码函数，返回 (实际使用的编码器名称, obj -> UTF-8 bytes)
+
+    name 为 auto 时按 orjson > msgspec > stdlib 的顺序选择；指定的编码器不可用时回退到标准库。
+    default 用于处理编码器不支持的类型；orjson 的日期时间也交给 default，各编码器输出一致。
+    msgspec 原生编码日期时间，不带时区的值（应用中使用的 utcnow）与 isoformat() 相同。
+    """
+    if name == 'auto':
+        name = available_encoders()[0]
+
+    if name == 'orjson' and orjson is not None:
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        return name, lambda obj: orjson.dumps(obj, default=default, option=option)
+
+    if name == 'msgspec' and msgspec is not None:
+        encoder = msgspec.json.Encoder(enc_hook=default, order='sorted')
+        return name, encoder.encode
+
+    return 'stdlib', lambda obj: json.dumps(
+        obj, default=default, ensure_ascii=False, sort_keys=True, separators=(',', ':')
+    ).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON提供器：jsonify 使用高速编码器直接输出 bytes
+
+    调试模式下仍使用 Flask 默认的缩进输出，便于阅读。
+    """
+
+    encoder_name = 'auto'
+    # 调试模式和标准库编码器同样输出 ISO 8601 日期时间
+    default = staticmethod(json_default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.encoder_name, self._encode = make_encoder(
+            app.config.get('JSON_ENCODER', self.encoder_name), self.default
+        )
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj), mimetype=self.mimetype)
+
+
+class FieldSet:
+    """列表接口的字段定义：字段名 -> (依赖的数据库列, 取值函数)
+
+    根据请求的 fields 参数只查询需要的列，并只输出需要的字段。
+    """
+
+    def __init__(self, fields: Dict[str, Tuple[tuple, Callable]]):
+        self.fields = fields
+
+    def parse(self, value: Optional[str]) -> List[str]:
+        """解析逗号分隔的字段列表，未指定时返回全部字段；包含未知字段时抛出 ValueError"""
+        if not value or not value.strip():
+            return list(self.fields)
+        names = []
+        for name in value.split(','):
+            name = name.strip()
+            if not name or name in names:
+                continue
+            if name not in self.fields:
+                raise ValueError(f'不支持的字段: {name}')
+            names.append(name)
+        return names or list(self.fields)
+
+    def columns(self, names: Iterable[str]) -> tuple:
+        """返回这些字段需要查询的列（去重并保持顺序）"""
+        columns = {}
+        for name in names:
+            for column in self.fields[name][0]:
+                columns.setdefault(column.key, column)
+        return tuple(columns.values())
+
+    def serialize(self, row, names: Iterable[str]) -> dict:
+        """把一行查询结果转换为只包含所选字段的字典"""
+        return {name: self.fields[name][1](row) for name in names}
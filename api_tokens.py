@@ -0,0 +1,85 @@
+"""
+API访问令牌
+为同步工具和命令行客户端签发带权限范围和有效期的 JWT（HS256）。
+令牌自包含用户ID、权限范围、过期时间、唯一ID（jti）和令牌纪元（ver），
+校验只需验签和查内存中的吊销列表，不需要会话存储。
+"""
+
+import secrets
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+
+import jwt
+
+ALGORITHM = 'HS256'
+TOKEN_TYPE = 'api'
+
+# read: 只读请求（GET/HEAD/OPTIONS）；write: 其他修改类请求
+SCOPES = ('read', 'write')
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class TokenError(Exception):
+    """令牌无效、过期或已吊销"""
+
+
+def normalize_scopes(scopes: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """校验并规范化权限范围，未指定时只授予 read；write 隐含 read"""
+    if not scopes:
+        return ('read',)
+    if isinstance(scopes, str):
+        scopes = scopes.replace(',', ' ').split()
+    scopes = set(scopes)
+    unknown = scopes - set(SCOPES)
+    if unknown:
+        raise ValueError(f'不支持的权限范围: {", ".join(sorted(unknown))}')
+    if 'write' in scopes:
+        scopes.add('read')
+    return tuple(scope for scope in SCOPES if scope in scopes)
+
+
+def required_scope(method: str) -> str:
+    """请求方法需要的权限范围"""
+    return 'read' if method.upper() in READ_METHODS else 'write'
+
+
+def issue_token(secret: str, user_id: int, scopes: Iterable[str], ttl: timedelta, epoch: int = 0,
+                name: Optional[str] = None) -> Tuple[str, dict]:
+    """签发令牌，返回 (令牌字符串, claims)"""
+    now = datetime.utcnow()
+    claims = {
+        'typ': TOKEN_TYPE,
+        'sub': str(user_id),
+        'scope': ' '.join(normalize_scopes(scopes)),
+        'iat': now,
+        'exp': now + ttl,
+        'jti': secrets.token_hex(16),
+        'ver': epoch,
+    }
+    if name:
+        claims['name'] = name
+    return jwt.encode(claims, secret, algorithm=ALGORITHM), claims
+
+
+def decode_token(secret: str, token: str) -> dict:
+    """验签并解析令牌，无效或过期时抛出 TokenError"""
+    try:
+        claims = jwt.decode(token, secret, algorithms=[ALGORITHM],
+                            options={'require': ['exp', 'iat', 'sub', 'jti']})
+    except jwt.ExpiredSignatureError:
+        raise TokenError('令牌已过期')
+    except jwt.InvalidTokenError as e:
+        raise TokenError(f'令牌无效: {e}')
+    if claims.get('typ') != TOKEN_TYPE:
+        raise TokenError('令牌类型错误')
+    return claims
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """从 Authorization 头中取出 Bearer 令牌"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
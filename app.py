@@ -1,17 +1,17 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, abort, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, abort, session, g
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import make_transient_to_detached
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.exceptions import TooManyRequests
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 import os
 import uuid
 import mimetypes
 import json
-from PIL import Image
-import cv2
-import numpy as np
+import time
 from cloud_storage import CloudStorageManager
 from dotenv import load_dotenv
 import requests
@@ -22,67 +22,70 @@ import tempfile
 from config import config
 from logging_config import SoloCloudLogger, get_logger, log_user_action, log_security_event, log_system_event
 from error_handlers import init_error_handlers
-import jwt
 import secrets
+import click
 from cloud_storage import storage_manager, STORAGE_PROVIDERS
+from storage_resilience import metrics_snapshot as storage_metrics_snapshot
+from object_cache import ObjectCache
+from cache_utils import VersionedSnapshotCache, TTLCache
+from sqlite_profile import apply_sqlite_profile
+from api_response import FastJSONProvider, FieldSet
+from write_behind import WriteBehindCounter, ReservingCounter
+from response_middleware import init_compression, weak_etag, is_not_modified, not_modified, set_list_etag
+from rate_limit import RateLimiter, rate_limit, client_ip
+from password_hashing import PasswordHasher
+from change_feed import register_change_tracking, serialize_change, append_changes
+from event_stream import EventHub, touch, format_event
+from api_tokens import TokenError, issue_token, decode_token, bearer_token, required_scope, normalize_scopes
 
 # 加载环境变量
 load_dotenv()
 
-# 简单的防暴力登录保护
-login_attempts = {}  # {ip: {'count': int, 'last_attempt': datetime, 'blocked_until': datetime}}
+# 防暴力登录保护：失败次数保存在所有worker共享的频率限制存储中（rate_limiter 在应用创建后初始化）
+LOGIN_MAX_ATTEMPTS = 5
+LOGIN_ATTEMPT_WINDOW = 15 * 60  # 失败次数统计窗口（秒）
+LOGIN_BLOCK_SECONDS = 30 * 60  # 失败次数达到上限后的封禁时间（秒）
+
+def login_failure_key(ip):
+    return f'login_failed:{ip}'
+
+def get_login_status(ip):
+    """查询IP的登录失败状态（不计数）"""
+    return rate_limiter.peek(login_failure_key(ip), LOGIN_MAX_ATTEMPTS, LOGIN_ATTEMPT_WINDOW)
 
 def is_ip_blocked(ip):
     """检查IP是否被封禁"""
-    if ip not in login_attempts:
-        return False
-    
-    attempt_info = login_attempts[ip]
-    
-    # 检查是否还在封禁期内
-    if 'blocked_until' in attempt_info and attempt_info['blocked_until'] > datetime.now():
-        return True
-    
-    # 检查是否需要重置计数器（超过15分钟重置）
-    if 'last_attempt' in attempt_info:
-        if datetime.now() - attempt_info['last_attempt'] > timedelta(minutes=15):
-            login_attempts[ip] = {'count': 0}
-    
-    return False
+    return not get_login_status(ip).allowed
 
 def record_failed_login(ip):
     """记录登录失败"""
-    now = datetime.now()
-    
-    if ip not in login_attempts:
-        login_attempts[ip] = {'count': 0}
-    
-    login_attempts[ip]['count'] += 1
-    login_attempts[ip]['last_attempt'] = now
+    result = rate_limiter.hit(login_failure_key(ip), LOGIN_MAX_ATTEMPTS, LOGIN_ATTEMPT_WINDOW,
+                              block=LOGIN_BLOCK_SECONDS)
     
     # 记录安全事件
     log_security_event(
-        f"登录失败尝试 ({login_attempts[ip]['count']}/5)",
+        f"登录失败尝试 ({result.count}/{LOGIN_MAX_ATTEMPTS})",
         ip_address=ip,
-        details=f"累计失败次数: {login_attempts[ip]['count']}"
+        details=f"累计失败次数: {result.count}"
     )
     
-    # 如果失败次数达到5次，封禁30分钟
-    if login_attempts[ip]['count'] >= 5:
-        login_attempts[ip]['blocked_until'] = now + timedelta(minutes=30)
+    # 如果失败次数达到上限，封禁30分钟
+    if result.count >= LOGIN_MAX_ATTEMPTS:
         log_security_event(
             "IP地址被封禁",
             ip_address=ip,
-            details="连续5次登录失败，封禁30分钟",
+            details=f"连续{LOGIN_MAX_ATTEMPTS}次登录失败，封禁{LOGIN_BLOCK_SECONDS // 60}分钟",
             level='error'
         )
-        print(f"IP {ip} 因多次登录失败被封禁30分钟")
+        print(f"IP {ip} 因多次登录失败被封禁{LOGIN_BLOCK_SECONDS // 60}分钟")
 
 def get_remaining_attempts(ip):
     """获取剩余尝试次数"""
-    if ip not in login_attempts:
-        return 5
-    return max(0, 5 - login_attempts[ip]['count'])
+    return get_login_status(ip).remaining
+
+def clear_failed_logins(ip):
+    """登录成功后清除失败记录"""
+    rate_limiter.reset(login_failure_key(ip))
 
 def init_database():
     """初始化数据库表结构"""
@@ -116,6 +119,9 @@ def init_database():
             has_user_id = 'user_id' in media_file_columns
             
             if has_user_id:
+                # 补建新版本引入的表（create_all 只会创建缺失的表），再为已有的表补齐新增的列和索引
+                db.create_all()
+                ensure_added_columns(inspector)
                 print("✅ 数据库结构正常，保持现有数据")
             else:
                 print("⚠️  表结构不匹配，重新创建数据库")
@@ -137,6 +143,33 @@ def init_database():
     # 确保单用户系统
     ensure_single_user_system()
 
+# 新版本给已有表增加的列 {表名: {列名: 列定义}}；create_all 不会修改已存在的表
+ADDED_COLUMNS = {
+    'media_file': {
+        'access_count': 'INTEGER NOT NULL DEFAULT 0',
+        'last_access': 'DATETIME',
+        'remote_storage': 'VARCHAR(20)',
+        'remote_path': 'VARCHAR(500)',
+        'deleted_at': 'DATETIME',
+        'purge_at': 'DATETIME',
+    },
+}
+
+def ensure_added_columns(inspector):
+    """为旧版本创建的数据库补齐新增的列和索引"""
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {col['name'] for col in inspector.get_columns(table)}
+        missing = [(name, ddl) for name, ddl in columns.items() if name not in existing]
+        if not missing:
+            continue
+        with db.engine.begin() as conn:
+            for name, ddl in missing:
+                conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}')
+        print(f"🛠️  数据表 {table} 新增列: {', '.join(name for name, _ in missing)}")
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
 def ensure_single_user_system():
     """确保系统为单用户模式，如果有多个用户则只保留第一个"""
     users = User.query.all()
@@ -147,16 +180,27 @@ def ensure_single_user_system():
         for user in users[1:]:
             print(f"删除用户: {user.username}")
             db.session.delete(user)
-        db.session.commit()
+        commit_user_changes()
         print(f"✅ 已清理为单用户系统，保留用户: {first_user.username}")
     elif len(users) == 1:
         print(f"✅ 单用户系统正常，当前用户: {users[0].username}")
     else:
         print("🔄 系统无用户，等待首次设置")
 
+def bootstrap():
+    """启动阶段的一次性初始化：创建目录、数据表并检查单用户系统
+    
+    由 gunicorn 的 on_starting 钩子在 master 进程 fork worker 之前调用，
+    也可以通过 `flask --app app init-db` 手动执行。
+    """
+    with app.app_context():
+        init_database()
+        # 释放master进程中的数据库连接，避免被fork出的worker共享
+        db.engine.dispose()
+
 def check_single_user_limit():
     """检查是否超过单用户限制"""
-    return User.query.count() >= 1
+    return get_user_count() >= 1
 
 def get_solo_user():
     """获取系统中的唯一用户"""
@@ -173,6 +217,9 @@ def create_app(config_name=None):
     config_name = config_name or 'default'
     app.config.from_object(config[config_name])
     
+    # 使用高速JSON编码器（orjson/msgspec 可用时）
+    app.json = FastJSONProvider(app)
+    
     # 自动适应访问协议 - 不强制HTTPS
     # ProxyFix会自动处理X-Forwarded-Proto头，让Flask知道实际的协议
     
@@ -180,6 +227,10 @@ def create_app(config_name=None):
     db.init_app(app)
     login_manager.init_app(app)
     
+    # SQLite 生产配置：每个新连接应用 WAL 等 PRAGMA
+    with app.app_context():
+        apply_sqlite_profile(db.engine, app.config.get('SQLITE_PRAGMAS'))
+    
     # 初始化日志系统
     logger_instance = SoloCloudLogger()
     logger_instance.init_app(app)
@@ -187,6 +238,9 @@ def create_app(config_name=None):
     # 初始化错误处理
     init_error_handlers(app)
     
+    # JSON响应压缩（gzip/brotli）
+    init_compression(app)
+    
     # 创建上传目录
     upload_folder = app.config.get('UPLOAD_FOLDER', '/app/uploads')
     os.makedirs(upload_folder, exist_ok=True)
@@ -197,14 +251,7 @@ def create_app(config_name=None):
     os.makedirs(os.path.join(upload_folder, 'chat'), exist_ok=True)
     os.makedirs(os.path.join(upload_folder, 'chat_thumbnails'), exist_ok=True)
     
-    # 注册数据库初始化回调（延迟到模型定义后执行）
-    def initialize_database():
-        if not hasattr(app, '_database_initialized'):
-            init_database()
-            app._database_initialized = True
-    
-    # 在应用启动后初始化数据库
-    app.before_request(initialize_database)
+    # 数据库初始化不在请求路径中执行，见 bootstrap()（gunicorn master 在 fork 前调用）
     
     # 动态设置Cookie安全属性 - 根据实际访问协议
     @app.before_request
@@ -235,6 +282,12 @@ login_manager.login_message = '请先登录访问此页面'
 # 创建应用实例
 app = create_app()
 
+# 跨worker共享的频率限制器（登录失败计数、接口限流）
+rate_limiter = RateLimiter(app.config['RATE_LIMIT_STORAGE'], max_entries=app.config.get('RATE_LIMIT_MAX_ENTRIES', 10000))
+
+# 密码哈希算法与成本（可用 python password_hashing.py 校准）
+password_hasher = PasswordHasher(app.config.get('PASSWORD_HASHER', 'pbkdf2'), app.config.get('PASSWORD_HASH_COST'))
+
 # 本地存储配置 - 使用Flask配置中的上传文件夹
 UPLOAD_FOLDER = app.config['UPLOAD_FOLDER']
 # 移除文件格式限制，允许上传任何类型的文件
@@ -282,10 +335,10 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(password, self.password_hash)
 
 class MediaFile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -300,8 +353,22 @@ class MediaFile(db.Model):
     upload_time = db.Column(db.DateTime, default=datetime.utcnow)
     description = db.Column(db.Text)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # 冷热分层：访问次数（通过写回缓冲批量累加，分层任务定期衰减）与最近访问时间
+    access_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_access = db.Column(db.DateTime)
+    # 文件升级回本地后保留的云端副本，再次降级时无需重新上传
+    remote_storage = db.Column(db.String(20))
+    remote_path = db.Column(db.String(500))
+    # 回收站：删除时间，以及到期后由清理任务永久删除的时间（恢复时两者都清空）
+    deleted_at = db.Column(db.DateTime)
+    purge_at = db.Column(db.DateTime)
     
     user = db.relationship('User', backref=db.backref('files', lazy=True))
+    
+    __table_args__ = (
+        db.Index('ix_media_file_storage_access', 'storage_type', 'last_access'),
+        db.Index('ix_media_file_purge_at', 'purge_at'),
+    )
 
 class ShareLink(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -350,22 +417,31 @@ class SystemConfig(db.Model):
     created_time = db.Column(db.DateTime, default=datetime.utcnow)
     updated_time = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    @staticmethod
+    def _parse_value(config):
+        """按配置类型解析配置值，解析失败返回 _INVALID_CONFIG"""
+        if config.config_type == 'json':
+            try:
+                return json.loads(config.config_value)
+            except:
+                return _INVALID_CONFIG
+        elif config.config_type == 'boolean':
+            return config.config_value.lower() in ['true', '1', 'yes']
+        else:
+            return config.config_value
+    
+    @staticmethod
+    def load_snapshot():
+        """一次性加载全部配置，返回 {config_key: 解析后的值}"""
+        return {config.config_key: SystemConfig._parse_value(config) for config in SystemConfig.query.all()}
+    
     @staticmethod
     def get_config(key, default_value=None):
-        """获取配置值"""
-        config = SystemConfig.query.filter_by(config_key=key).first()
-        if config:
-            if config.config_type == 'json':
-                import json
-                try:
-                    return json.loads(config.config_value)
-                except:
-                    return default_value
-            elif config.config_type == 'boolean':
-                return config.config_value.lower() in ['true', '1', 'yes']
-            else:
-                return config.config_value
-        return default_value
+        """获取配置值（读取进程内缓存快照）"""
+        value = config_cache.get().get(key, _INVALID_CONFIG)
+        if value is _INVALID_CONFIG:
+            return default_value
+        return value
     
     @staticmethod
     def set_config(key, value, config_type='string', description=None):
@@ -373,7 +449,6 @@ class SystemConfig(db.Model):
         config = SystemConfig.query.filter_by(config_key=key).first()
         if config:
             if config_type == 'json':
-                import json
                 config.config_value = json.dumps(value)
             else:
                 config.config_value = str(value)
@@ -383,7 +458,6 @@ class SystemConfig(db.Model):
                 config.description = description
         else:
             if config_type == 'json':
-                import json
                 value_str = json.dumps(value)
             else:
                 value_str = str(value)
@@ -394,13 +468,219 @@ class SystemConfig(db.Model):
                 description=description
             )
             db.session.add(config)
+        # 与配置写入在同一事务中递增版本号，通知其他worker重新加载
+        CacheVersion.bump('system_config')
         db.session.commit()
+        config_cache.invalidate()
         return config
 
+class CacheVersion(db.Model):
+    """缓存版本号模型 - 单调递增的版本号，用于多个worker之间的缓存失效"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    @staticmethod
+    def get_version(name):
+        """读取版本号，表不存在等异常情况返回None（调用方会直接重新加载）"""
+        try:
+            return db.session.execute(
+                db.select(CacheVersion.version).where(CacheVersion.name == name)
+            ).scalar() or 0
+        except Exception as e:
+            print(f"读取缓存版本号失败 {name}: {e}")
+            return None
+    
+    @staticmethod
+    def bump(name):
+        """递增版本号（不提交，由调用方在同一事务中提交）"""
+        result = db.session.execute(
+            db.update(CacheVersion)
+            .where(CacheVersion.name == name)
+            .values(version=CacheVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.add(CacheVersion(name=name, version=1))
+
+class RevokedToken(db.Model):
+    """已吊销的API令牌 - 只需保存到令牌过期为止"""
+    jti = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_time = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChangeLog(db.Model):
+    """变更日志 - 文件、笔记、聊天消息的新增/修改/删除记录，序号单调递增且不复用"""
+    __table_args__ = (
+        db.Index('ix_change_log_user_seq', 'user_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # file, note, chat_message
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # create, update, delete
+    user_id = db.Column(db.Integer, nullable=False)
+    created_time = db.Column(db.DateTime, default=datetime.utcnow)
+
+# 已清理的变更日志的最大序号（系统配置键），since 小于它的客户端需要全量刷新
+CHANGE_LOG_PRUNED_KEY = 'change_log_pruned_seq'
+
+def notify_change_subscribers():
+    """更新通知文件的修改时间，各worker的事件推送线程据此读取新的变更"""
+    touch(app.config['EVENT_NOTIFY_FILE'])
+
+# 在同一事务中记录这些模型的变更，提交后通知实时推送
+register_change_tracking(db.session, ChangeLog.__table__, {
+    MediaFile: 'file',
+    Note: 'note',
+    ChatMessage: 'chat_message',
+}, on_commit=notify_change_subscribers)
+
+def fetch_change_events(since, limit=500):
+    """事件推送线程读取新变更（在请求之外执行，需要自己的应用上下文）"""
+    with app.app_context():
+        rows = ChangeLog.query.filter(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit).all()
+        return [dict(serialize_change(row), user_id=row.user_id) for row in rows]
+
+def latest_change_seq():
+    with app.app_context():
+        return db.session.query(db.func.max(ChangeLog.seq)).scalar() or 0
+
+# 每个worker一个事件分发中心，SSE连接在其中订阅当前用户的变更
+event_hub = EventHub(
+    app.config['EVENT_NOTIFY_FILE'], fetch_change_events, latest_change_seq,
+    poll_interval=app.config.get('EVENT_POLL_INTERVAL', 0.5)
+)
+
+# 配置解析失败/不存在的哨兵值
+_INVALID_CONFIG = object()
+
+# 系统配置缓存：每个worker一份快照，版本号变化时重新加载
+config_cache = VersionedSnapshotCache(
+    loader=SystemConfig.load_snapshot,
+    version_getter=lambda: CacheVersion.get_version('system_config'),
+    ttl=app.config.get('CONFIG_CACHE_TTL', 2.0)
+)
+
+def load_user_snapshot():
+    """加载全部用户的列数据，返回 {user_id: {列名: 值}}（单用户系统通常只有一行）"""
+    columns = [column.key for column in User.__table__.columns]
+    return {user.id: {column: getattr(user, column) for column in columns} for user in User.query.all()}
+
+# 用户身份缓存：每个worker一份快照，修改密码等操作递增版本号使其失效
+user_cache = VersionedSnapshotCache(
+    loader=load_user_snapshot,
+    version_getter=lambda: CacheVersion.get_version('user'),
+    ttl=app.config.get('USER_CACHE_TTL', 5.0)
+)
+
+def get_user_count():
+    """获取用户数量（读取身份缓存）"""
+    return len(user_cache.get())
+
+def commit_user_changes():
+    """提交用户表的修改，并在同一事务中递增用户版本号使各worker的身份缓存失效"""
+    CacheVersion.bump('user')
+    db.session.commit()
+    user_cache.invalidate()
+
+def load_token_revocations():
+    """加载令牌吊销状态：当前令牌纪元（更早签发的令牌全部失效）和未过期的已吊销jti集合"""
+    revoked = db.session.query(RevokedToken.jti).filter(RevokedToken.expires_at > datetime.utcnow()).all()
+    return {
+        'epoch': CacheVersion.get_version('api_token_epoch') or 0,
+        'revoked': {row.jti for row in revoked},
+    }
+
+# API令牌吊销列表缓存：吊销操作递增 api_token 版本号
+token_revocation_cache = VersionedSnapshotCache(
+    loader=load_token_revocations,
+    version_getter=lambda: CacheVersion.get_version('api_token'),
+    ttl=app.config.get('USER_CACHE_TTL', 5.0)
+)
+
+def get_token_secret():
+    return app.config.get('API_TOKEN_SECRET') or app.config['SECRET_KEY']
+
+def token_error(message, status=401):
+    """令牌认证失败时直接返回JSON错误（API客户端不需要跳转登录页）"""
+    response = jsonify({'error': message})
+    response.status_code = status
+    if status == 401:
+        response.headers['WWW-Authenticate'] = 'Bearer'
+    abort(response)
+
 # Flask-Login用户加载器
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    data = user_cache.get().get(int(user_id))
+    if data is None:
+        return None
+    # 由缓存数据重建实例并挂到当前会话，无需查询数据库
+    user = User(**data)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+@login_manager.request_loader
+def load_user_from_token(request):
+    """/api 路由接受 Authorization: Bearer 令牌，验签后从身份缓存取用户，无需会话和数据库查询"""
+    if not request.path.startswith('/api/'):
+        return None
+    token = bearer_token(request.headers.get('Authorization'))
+    if token is None:
+        return None
+    
+    try:
+        claims = decode_token(get_token_secret(), token)
+    except TokenError as e:
+        token_error(str(e))
+    
+    revocations = token_revocation_cache.get()
+    if claims.get('ver', 0) < revocations['epoch'] or claims['jti'] in revocations['revoked']:
+        token_error('令牌已吊销')
+    
+    scope = required_scope(request.method)
+    if scope not in claims.get('scope', '').split():
+        token_error(f'令牌缺少 {scope} 权限', 403)
+    
+    user = load_user(claims['sub'])
+    if user is None or not user.is_active:
+        token_error('令牌对应的用户不存在')
+    g.api_token = claims
+    return user
+
+def create_api_token(user_id, scopes=None, expires_in=None, name=None):
+    """为用户签发API令牌，返回 (令牌字符串, claims)"""
+    default_ttl = app.config.get('API_TOKEN_DEFAULT_TTL', 30 * 86400)
+    max_ttl = app.config.get('API_TOKEN_MAX_TTL', 365 * 86400)
+    ttl = min(int(expires_in or default_ttl), max_ttl)
+    if ttl <= 0:
+        raise ValueError('有效期必须大于0')
+    epoch = token_revocation_cache.get()['epoch']
+    return issue_token(get_token_secret(), user_id, normalize_scopes(scopes), timedelta(seconds=ttl), epoch, name)
+
+@app.cli.command('create-token')
+@click.argument('username')
+@click.option('--scope', 'scopes', default='read', help='权限范围，多个用逗号分隔（read,write）')
+@click.option('--expires-in', type=int, default=None, help='有效期（秒）')
+@click.option('--name', default=None, help='令牌名称（便于识别用途）')
+def create_token_command(username, scopes, expires_in, name):
+    """为用户签发API令牌（供同步工具和命令行客户端使用）"""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f"用户 '{username}' 不存在")
+    try:
+        token, claims = create_api_token(user.id, scopes, expires_in, name)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"jti: {claims['jti']}")
+    click.echo(f"scope: {claims['scope']}")
+    click.echo(f"expires_at: {claims['exp'].isoformat()}Z")
+    click.echo(token)
+
+@app.cli.command('init-db')
+def init_db_command():
+    """初始化数据库（与 gunicorn 启动时的 bootstrap 相同）"""
+    bootstrap()
 
 # 存储配置管理函数
 def get_current_storage_provider():
@@ -483,6 +763,12 @@ def get_current_storage_configs_from_db():
         # 回退到环境变量
         return get_current_storage_configs()
 
+def storage_config_from_db(provider):
+    """存储管理器的配置来源：数据库中的存储设置（各worker通过系统配置缓存读取，修改后自动生效）"""
+    return get_current_storage_configs_from_db().get(provider, {})
+
+storage_manager.config_source = storage_config_from_db
+
 def get_configured_providers_from_db():
     """从数据库获取已配置的存储提供商列表"""
     try:
@@ -549,6 +835,7 @@ def get_file_type(filename):
 def create_thumbnail(image_path, thumbnail_path, size=(200, 200)):
     """为图片创建缩略图"""
     try:
+        from PIL import Image
         with Image.open(image_path) as img:
             img.thumbnail(size, Image.Resampling.LANCZOS)
             img.save(thumbnail_path, optimize=True, quality=85)
@@ -560,6 +847,10 @@ def create_thumbnail(image_path, thumbnail_path, size=(200, 200)):
 def create_video_thumbnail(video_path, thumbnail_path, size=(200, 200)):
     """为视频创建缩略图（提取第一帧）"""
     try:
+        # 延迟导入：OpenCV体积大，只在首次生成视频缩略图时加载
+        import cv2
+        from PIL import Image
+        
         # 打开视频文件
         cap = cv2.VideoCapture(video_path)
         
@@ -713,9 +1004,8 @@ def upload_to_cloud_storage(file_path, object_name):
         if provider == 'local':
             return True, "本地存储成功"
         
-        # 获取存储客户端
-        config = CLOUD_STORAGE_CONFIGS.get(provider, {})
-        storage_client = storage_manager.get_storage_client(provider, config)
+        # 获取存储客户端（数据库中的存储设置优先）
+        storage_client = storage_manager.get_storage(provider)
         
         if not storage_client:
             return False, f"不支持的存储提供商: {provider}"
@@ -735,7 +1025,7 @@ def upload_to_cloud_storage(file_path, object_name):
 @app.route('/')
 def index():
     # 检查是否是首次访问（没有用户）
-    if User.query.count() == 0:
+    if get_user_count() == 0:
         return redirect(url_for('first_time_setup'))
     
     if current_user.is_authenticated:
@@ -750,13 +1040,14 @@ def index():
         return render_template('index.html',
                              current_storage_provider=current_storage_provider,
                              storage_provider_name=storage_provider_name,
-                             max_file_size_mb=max_size_mb)
+                             max_file_size_mb=max_size_mb,
+                             live_updates_enabled=app.config.get('LIVE_UPDATES_ENABLED', True))
     return redirect(url_for('login'))
 
 @app.route('/first-time-setup', methods=['GET', 'POST'])
 def first_time_setup():
     # SoloCloud为单用户系统，如果已经有用户，禁止访问此页面
-    if User.query.count() > 0:
+    if get_user_count() > 0:
         return redirect(url_for('login'))
     
     if request.method == 'POST':
@@ -787,7 +1078,7 @@ def first_time_setup():
         
         try:
             db.session.add(user)
-            db.session.commit()
+            commit_user_changes()
             print(f"✅ 用户创建成功: {username}")
         except Exception as e:
             db.session.rollback()
@@ -803,21 +1094,20 @@ def first_time_setup():
     return render_template('first_time_setup.html')
 
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limit(rate_limiter, limit=app.config.get('LOGIN_RATE_LIMIT', 20), window=60, methods=('POST',))
 def login():
     # 如果没有用户，重定向到首次设置
-    if User.query.count() == 0:
+    if get_user_count() == 0:
         return redirect(url_for('first_time_setup'))
     
     if request.method == 'POST':
         ip = request.remote_addr
         
         # 检查IP是否被封禁
-        if is_ip_blocked(ip):
-            if ip in login_attempts and 'blocked_until' in login_attempts[ip]:
-                remaining_time = login_attempts[ip]['blocked_until'] - datetime.now()
-                minutes = int(remaining_time.total_seconds() / 60)
-                return render_template('login.html', error=f'登录失败次数过多，请等待 {minutes} 分钟后再试')
-            return render_template('login.html', error='您的IP已被暂时封禁，请稍后再试')
+        status = get_login_status(ip)
+        if not status.allowed:
+            minutes = int(status.retry_after / 60)
+            return render_template('login.html', error=f'登录失败次数过多，请等待 {minutes} 分钟后再试')
         
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '')
@@ -831,8 +1121,12 @@ def login():
         
         if user and user.check_password(password):
             # 登录成功，清除失败记录
-            if ip in login_attempts:
-                login_attempts[ip] = {'count': 0}
+            clear_failed_logins(ip)
+            
+            # 已存储的哈希与当前配置的算法或成本不一致时，用明文密码重新哈希
+            if password_hasher.needs_rehash(user.password_hash):
+                user.set_password(password)
+                commit_user_changes()
             
             # 记录成功登录
             log_user_action(
@@ -851,7 +1145,7 @@ def login():
             if remaining > 0:
                 return render_template('login.html', error=f'用户名或密码错误（剩余尝试次数：{remaining}）')
             else:
-                return render_template('login.html', error='登录失败次数过多，已被封禁30分钟')
+                return render_template('login.html', error=f'登录失败次数过多，已被封禁{LOGIN_BLOCK_SECONDS // 60}分钟')
     
     return render_template('login.html')
 
@@ -861,7 +1155,7 @@ def single_user_only(f):
     from functools import wraps
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if User.query.count() > 1:
+        if get_user_count() > 1:
             # 如果有多个用户，自动清理
             ensure_single_user_system()
         return f(*args, **kwargs)
@@ -876,7 +1170,7 @@ def change_password():
         new_password = request.form['new_password']
         confirm_password = request.form['confirm_password']
         
-        if not check_password_hash(current_user.password_hash, current_password):
+        if not current_user.check_password(current_password):
             return render_template('change_password.html', error='当前密码错误')
         
         if new_password != confirm_password:
@@ -885,8 +1179,8 @@ def change_password():
         if len(new_password) < 6:
             return render_template('change_password.html', error='密码长度至少6位')
         
-        current_user.password_hash = generate_password_hash(new_password)
-        db.session.commit()
+        current_user.set_password(new_password)
+        commit_user_changes()
         
         return render_template('change_password.html', message='密码修改成功')
     
@@ -957,6 +1251,10 @@ def storage_settings():
                 })
             update_env_file(env_updates)
             
+            # 释放本worker中按旧配置创建的存储客户端；其他worker的配置缓存在版本号变化后
+            # （最多 CONFIG_CACHE_TTL 秒）读到新设置，get_storage 按新的配置摘要替换客户端
+            storage_manager.invalidate(storage_provider)
+            
             # 获取当前配置用于显示
             current_provider = get_current_storage_provider()
             return render_template('storage_settings.html', 
@@ -1087,6 +1385,13 @@ def api_get_storage_config():
     
     return jsonify(config)
 
+@app.route('/api/storage/metrics')
+@login_required
+def api_storage_metrics():
+    """当前 worker 中各存储提供商的调用、重试、熔断统计"""
+    return jsonify({'pid': os.getpid(), 'providers': storage_metrics_snapshot(),
+                    'object_cache': object_cache.stats()})
+
 @app.route('/api/upload', methods=['POST'])
 @login_required
 def upload_file():
@@ -1201,6 +1506,8 @@ def upload_file():
 
 @app.route('/api/upload-from-url', methods=['POST'])
 @login_required
+@rate_limit(rate_limiter, limit=app.config.get('URL_UPLOAD_RATE_LIMIT', 10), window=60,
+            key_func=lambda: str(current_user.id))
 def upload_from_url():
     """从URL下载文件并保存"""
     data = request.get_json()
@@ -1284,7 +1591,7 @@ def upload_from_url():
         final_path = local_path
         if storage_type != 'local':
             cloud_path = f"{subfolder}/{unique_filename}"
-            success, message = storage_manager.upload_file(local_path, cloud_path)
+            success, message = upload_to_cloud_storage(local_path, cloud_path)
             if success:
                 final_path = cloud_path
                 # 删除本地文件（保留缩略图）
@@ -1321,6 +1628,20 @@ def upload_from_url():
     except Exception as e:
         return jsonify({'error': f'处理失败: {str(e)}'}), 500
 
+# 文件列表接口可返回的字段（?fields= 按需选择，默认全部）
+FILE_LIST_FIELDS = FieldSet({
+    'id': ((MediaFile.id,), lambda f: f.id),
+    'filename': ((MediaFile.filename,), lambda f: f.filename),
+    'original_filename': ((MediaFile.original_filename,), lambda f: f.original_filename),
+    'file_type': ((MediaFile.file_type,), lambda f: f.file_type),
+    'file_size': ((MediaFile.file_size,), lambda f: f.file_size),
+    'storage_type': ((MediaFile.storage_type,), lambda f: f.storage_type),
+    'upload_time': ((MediaFile.upload_time,), lambda f: f.upload_time.isoformat()),
+    'description': ((MediaFile.description,), lambda f: f.description),
+    'thumbnail_path': ((MediaFile.thumbnail_path,), lambda f: f.thumbnail_path),
+    'has_thumbnail': ((MediaFile.thumbnail_path,), lambda f: f.thumbnail_path is not None),
+})
+
 @app.route('/api/files')
 @login_required
 def list_files():
@@ -1330,8 +1651,13 @@ def list_files():
     search = request.args.get('search', '').strip()  # 搜索关键词
     sort_by = request.args.get('sort_by', 'upload_time')  # 排序字段
     sort_order = request.args.get('sort_order', 'desc')  # 排序方向
+    try:
+        fields = FILE_LIST_FIELDS.parse(request.args.get('fields'))  # 返回的字段
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    query = MediaFile.query.filter_by(user_id=current_user.id)
+    # 回收站中的文件不出现在列表中
+    query = MediaFile.query.filter_by(user_id=current_user.id, deleted_at=None)
     
     # 文件类型筛选
     if file_type:
@@ -1356,43 +1682,118 @@ def list_files():
     else:
         query = query.order_by(sort_column.desc())
     
-    files = query.paginate(page=page, per_page=per_page, error_out=False)
+    # 只查询响应需要的列，不构建完整的ORM对象
+    # 结果集摘要（数量 + 最新上传时间 + 最大ID）和该用户最新的变更序号作为ETag，列表未变化时直接返回304；
+    # 冷热分层/迁移改变存储位置、移入回收站后恢复等修改不影响摘要，但都会写变更日志
+    total, latest_time, latest_id = query.order_by(None).with_entities(
+        db.func.count(MediaFile.id), db.func.max(MediaFile.upload_time), db.func.max(MediaFile.id)
+    ).one()
+    change_seq = db.session.query(db.func.max(ChangeLog.seq)).filter(ChangeLog.user_id == current_user.id).scalar()
+    etag = weak_etag(current_user.id, request.full_path, total, latest_time, latest_id, change_seq)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    
+    files = query.with_entities(*FILE_LIST_FIELDS.columns(fields)).paginate(
+        page=page, per_page=per_page, error_out=False, count=False
+    )
+    files.total = total
     
-    return jsonify({
-        'files': [{
-            'id': f.id,
-            'filename': f.filename,
-            'original_filename': f.original_filename,
-            'file_type': f.file_type,
-            'file_size': f.file_size,
-            'storage_type': f.storage_type,
-            'upload_time': f.upload_time.isoformat(),
-            'description': f.description,
-            'thumbnail_path': f.thumbnail_path,
-            'has_thumbnail': f.thumbnail_path is not None
-        } for f in files.items],
+    return set_list_etag(jsonify({
+        'files': [FILE_LIST_FIELDS.serialize(f, fields) for f in files.items],
         'total': files.total,
         'pages': files.pages,
         'current_page': page
-    })
+    }), etag)
+
+def flush_file_accesses(counts):
+    """批量写入文件访问次数增量 {file_id: 增量}，最近访问时间记为写入时间"""
+    table = MediaFile.__table__
+    stmt = table.update().where(table.c.id == db.bindparam('file_id')).values(
+        access_count=table.c.access_count + db.bindparam('amount'),
+        last_access=db.bindparam('accessed')
+    )
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(stmt, [{'file_id': file_id, 'amount': amount, 'accessed': now}
+                                  for file_id, amount in counts.items()])
+        db.session.commit()
+
+# 文件访问统计（供冷热分层使用）：在内存中累加，后台批量落库
+file_access_counter = WriteBehindCounter(
+    flush_fn=flush_file_accesses,
+    interval=app.config.get('FILE_ACCESS_FLUSH_INTERVAL', 5.0)
+)
+
+def resolve_file_location(media_file):
+    """返回文件当前所在的 (存储类型, 路径)
+
+    分层任务迁移文件时先提交新位置再删除旧副本，请求拿到的可能是迁移前的记录（或缓存），
+    本地文件已不存在时改用保留的云端副本或数据库中的最新位置。
+    """
+    if media_file.storage_type != 'local' or os.path.exists(media_file.file_path):
+        return media_file.storage_type, media_file.file_path
+    if getattr(media_file, 'remote_storage', None):
+        return media_file.remote_storage, media_file.remote_path
+    row = db.session.query(MediaFile.storage_type, MediaFile.file_path).filter(MediaFile.id == media_file.id).first()
+    if row is not None:
+        return row.storage_type, row.file_path
+    return media_file.storage_type, media_file.file_path
+
+# 云存储对象的本地读穿缓存（OBJECT_CACHE_MAX_MB > 0 时启用）
+object_cache = ObjectCache(
+    app.config['OBJECT_CACHE_DIR'],
+    app.config.get('OBJECT_CACHE_MAX_MB', 0) * 1024 * 1024
+)
+
+def cloud_file_response(storage, storage_type, file_path, media_file, cache_redirect=False):
+    """返回云存储文件：启用本地缓存时由服务器读取并缓存，否则重定向到云存储URL（无法生成时返回None）
+
+    cache_redirect 只在所有者访问时为 True：分享链接的每次访问都要经过服务器检查次数限制、过期和删除状态。
+    """
+    if not object_cache.enabled:
+        url, max_age = storage.get_download_url(file_path)
+        if not url:
+            return None
+        response = redirect(url)
+        if cache_redirect and max_age > 0:
+            # 签名URL在服务端复用期内不变，浏览器可以直接复用这次重定向
+            response.headers['Cache-Control'] = f'private, max-age={max_age}'
+        else:
+            response.headers['Cache-Control'] = 'no-store'
+        return response
+    
+    # 缓存键包含存储配置摘要，更换 Bucket 后不会读到旧对象
+    key = f"{storage_type}:{storage_manager.config_hash(storage.config)[:12]}:{file_path}"
+    # Range 请求（视频拖动）先完整缓存再按范围返回，其余请求边读边返回
+    kind, value = object_cache.open(key, lambda: storage.stream_file(file_path), media_file.file_size,
+                                    stream=request.range is None)
+    if kind == 'path':
+        return send_file(value, mimetype=media_file.mime_type, conditional=True)
+    response = app.response_class(value, mimetype=media_file.mime_type, direct_passthrough=True)
+    response.content_length = media_file.file_size
+    return response
 
 @app.route('/api/files/<int:file_id>')
+@login_required
 def get_file(file_id):
-    media_file = MediaFile.query.get_or_404(file_id)
+    # 只有文件所有者可以访问（这里会生成私有空间的签名URL）；匿名访问只能通过分享链接
+    media_file = MediaFile.query.filter_by(id=file_id, user_id=current_user.id, deleted_at=None).first_or_404()
+    file_access_counter.increment(media_file.id)
     
     try:
-        storage = storage_manager.get_storage(media_file.storage_type)
+        storage_type, file_path = resolve_file_location(media_file)
+        storage = storage_manager.get_storage(storage_type)
         if not storage:
-            return jsonify({'error': f'不支持的存储类型: {media_file.storage_type}'}), 500
+            return jsonify({'error': f'不支持的存储类型: {storage_type}'}), 500
         
         # 对于本地存储，直接返回文件
-        if media_file.storage_type == 'local':
-            return send_file(media_file.file_path)
+        if storage_type == 'local':
+            return send_file(file_path)
         
-        # 对于云存储，生成访问URL
-        url = storage.get_file_url(media_file.file_path)
-        if url:
-            return redirect(url)
+        # 对于云存储，经本地缓存返回或重定向到访问URL
+        response = cloud_file_response(storage, storage_type, file_path, media_file, cache_redirect=True)
+        if response is not None:
+            return response
         else:
             return jsonify({'error': '无法生成文件访问URL'}), 500
             
@@ -1400,8 +1801,9 @@ def get_file(file_id):
         return jsonify({'error': f'文件访问失败: {str(e)}'}), 500
 
 @app.route('/api/thumbnail/<int:file_id>')
+@login_required
 def get_thumbnail(file_id):
-    media_file = MediaFile.query.get_or_404(file_id)
+    media_file = MediaFile.query.filter_by(id=file_id, user_id=current_user.id, deleted_at=None).first_or_404()
     
     if media_file.thumbnail_path and os.path.exists(media_file.thumbnail_path):
         return send_file(media_file.thumbnail_path)
@@ -1409,34 +1811,179 @@ def get_thumbnail(file_id):
         return jsonify({'error': '缩略图不存在'}), 404
 
 @app.route('/api/files/<int:file_id>/thumbnail')
+@login_required
 def get_file_thumbnail(file_id):
     # 兼容性API
     return get_thumbnail(file_id)
 
+# 回收站：删除只做标记，文件和云端对象由后台清理任务（purge.py）到期后按批永久删除
+TRASH_CHUNK_SIZE = 500  # 每条 SQL 语句中 IN 列表的最大长度
+
+def _chunks(ids, size=TRASH_CHUNK_SIZE):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def parse_file_ids(data):
+    """解析请求中的文件ID列表，格式不正确时返回None"""
+    ids = (data or {}).get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return None
+    return list(dict.fromkeys(ids))
+
+def move_files_to_trash(user_id, file_ids):
+    """把用户的文件移入回收站，返回实际移入的ID列表
+
+    批量 UPDATE，不加载ORM对象；变更记录单独写入，并使这些文件的分享链接缓存失效。
+    """
+    table = MediaFile.__table__
+    now = datetime.utcnow()
+    purge_at = now + timedelta(days=app.config.get('TRASH_RETENTION_DAYS', 30))
+    moved = []
+    for chunk in _chunks(file_ids):
+        ids = [row.id for row in db.session.execute(
+            db.select(table.c.id).where(
+                table.c.id.in_(chunk), table.c.user_id == user_id, table.c.deleted_at.is_(None)
+            )
+        )]
+        if not ids:
+            continue
+        db.session.execute(
+            table.update().where(table.c.id.in_(ids), table.c.deleted_at.is_(None))
+            .values(deleted_at=now, purge_at=purge_at)
+        )
+        moved.extend(ids)
+    if moved:
+        append_changes(db.session, ChangeLog.__table__, 'file', moved, 'delete', user_id)
+        CacheVersion.bump('share_link')
+    db.session.commit()
+    return moved
+
+def restore_files_from_trash(user_id, file_ids):
+    """从回收站恢复尚未开始永久删除的文件，返回恢复的ID列表"""
+    table = MediaFile.__table__
+    now = datetime.utcnow()
+    restored = []
+    for chunk in _chunks(file_ids):
+        # 已到期的文件可能正在被清理任务删除，不再恢复
+        condition = db.and_(
+            table.c.id.in_(chunk), table.c.user_id == user_id,
+            table.c.deleted_at.isnot(None), table.c.purge_at > now
+        )
+        ids = [row.id for row in db.session.execute(db.select(table.c.id).where(condition))]
+        if not ids:
+            continue
+        db.session.execute(
+            table.update().where(condition, table.c.id.in_(ids)).values(deleted_at=None, purge_at=None)
+        )
+        restored.extend(ids)
+    if restored:
+        append_changes(db.session, ChangeLog.__table__, 'file', restored, 'create', user_id)
+        CacheVersion.bump('share_link')
+    db.session.commit()
+    return restored
+
+def purge_files_now(user_id, file_ids=None):
+    """把回收站中的文件标记为立即到期（file_ids 为 None 时清空回收站），由清理任务在下一轮永久删除，返回文件数"""
+    table = MediaFile.__table__
+    now = datetime.utcnow()
+    condition = db.and_(table.c.user_id == user_id, table.c.deleted_at.isnot(None), table.c.purge_at > now)
+    if file_ids is None:
+        count = db.session.execute(table.update().where(condition).values(purge_at=now)).rowcount
+    else:
+        count = 0
+        for chunk in _chunks(file_ids):
+            count += db.session.execute(
+                table.update().where(condition, table.c.id.in_(chunk)).values(purge_at=now)
+            ).rowcount
+    db.session.commit()
+    return count
+
 @app.route('/api/files/<int:file_id>', methods=['DELETE'])
 @login_required
 def delete_file(file_id):
-    media_file = MediaFile.query.filter_by(id=file_id, user_id=current_user.id).first_or_404()
-    
-    # 删除本地文件
-    if media_file.storage_type == 'local' and os.path.exists(media_file.file_path):
-        os.remove(media_file.file_path)
-    
-    # 删除缩略图
-    if media_file.thumbnail_path and os.path.exists(media_file.thumbnail_path):
-        os.remove(media_file.thumbnail_path)
-    
-    # 从数据库删除记录
-    db.session.delete(media_file)
-    db.session.commit()
+    media_file = MediaFile.query.filter_by(id=file_id, user_id=current_user.id, deleted_at=None).first_or_404()
+    move_files_to_trash(current_user.id, [media_file.id])
+    return jsonify({'message': '文件已移入回收站'})
+
+@app.route('/api/files/batch-delete', methods=['POST'])
+@login_required
+def batch_delete_files():
+    ids = parse_file_ids(request.get_json(silent=True))
+    if ids is None:
+        return jsonify({'error': 'ids 必须是文件ID列表'}), 400
+    moved = move_files_to_trash(current_user.id, ids)
+    return jsonify({'message': f'已将 {len(moved)} 个文件移入回收站', 'ids': moved})
+
+# 回收站列表可返回的字段：文件列表字段加上删除时间和永久删除时间
+TRASH_LIST_FIELDS = FieldSet(dict(
+    FILE_LIST_FIELDS.fields,
+    deleted_at=((MediaFile.deleted_at,), lambda f: f.deleted_at.isoformat()),
+    purge_at=((MediaFile.purge_at,), lambda f: f.purge_at.isoformat()),
+))
+
+@app.route('/api/trash')
+@login_required
+def list_trash():
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    try:
+        fields = TRASH_LIST_FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # 已到期等待清理的文件不再显示
+    query = MediaFile.query.filter(
+        MediaFile.user_id == current_user.id,
+        MediaFile.deleted_at.isnot(None),
+        MediaFile.purge_at > datetime.utcnow()
+    ).order_by(MediaFile.deleted_at.desc(), MediaFile.id.desc())
+    files = query.with_entities(*TRASH_LIST_FIELDS.columns(fields)).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
     
-    return jsonify({'message': '文件删除成功'})
+    return jsonify({
+        'files': [TRASH_LIST_FIELDS.serialize(f, fields) for f in files.items],
+        'total': files.total,
+        'pages': files.pages,
+        'current_page': page,
+        'retention_days': app.config.get('TRASH_RETENTION_DAYS', 30)
+    })
+
+@app.route('/api/trash/<int:file_id>/restore', methods=['POST'])
+@login_required
+def restore_file(file_id):
+    if not restore_files_from_trash(current_user.id, [file_id]):
+        return jsonify({'error': '回收站中没有该文件'}), 404
+    return jsonify({'message': '文件已恢复'})
+
+@app.route('/api/trash/restore', methods=['POST'])
+@login_required
+def batch_restore_files():
+    ids = parse_file_ids(request.get_json(silent=True))
+    if ids is None:
+        return jsonify({'error': 'ids 必须是文件ID列表'}), 400
+    restored = restore_files_from_trash(current_user.id, ids)
+    return jsonify({'message': f'已恢复 {len(restored)} 个文件', 'ids': restored})
+
+@app.route('/api/trash/<int:file_id>', methods=['DELETE'])
+@login_required
+def purge_file(file_id):
+    if not purge_files_now(current_user.id, [file_id]):
+        return jsonify({'error': '回收站中没有该文件'}), 404
+    return jsonify({'message': '文件将在下次清理时永久删除'})
+
+@app.route('/api/trash', methods=['DELETE'])
+@login_required
+def empty_trash():
+    count = purge_files_now(current_user.id)
+    return jsonify({'message': f'已清空回收站，{count} 个文件将在下次清理时永久删除', 'count': count})
 
 # 文件分享功能
 @app.route('/api/files/<int:file_id>/share', methods=['POST'])
 @login_required
 def create_share_link(file_id):
-    media_file = MediaFile.query.filter_by(id=file_id, user_id=current_user.id).first_or_404()
+    media_file = MediaFile.query.filter_by(id=file_id, user_id=current_user.id, deleted_at=None).first_or_404()
     
     data = request.get_json() or {}
     expires_hours = data.get('expires_hours', 168)  # 默认7天
@@ -1488,7 +2035,8 @@ def list_share_links(file_id):
             'share_url': url_for('shared_file', token=s.token, _external=True, _scheme='https' if request.is_secure or request.headers.get('X-Forwarded-Proto') == 'https' else None),
             'created_time': s.created_time.isoformat(),
             'expires_at': s.expires_at.isoformat(),
-            'access_count': s.access_count,
+            # 数据库中的次数包含预占未使用的部分（只能扣除本进程的），写回缓冲中的次数尚未计入
+            'access_count': s.access_count + share_access_counter.pending(s.id) - share_access_counter.reserved(s.id),
             'max_access': s.max_access,
             'is_expired': s.expires_at < datetime.utcnow()
         } for s in shares]
@@ -1504,74 +2052,190 @@ def delete_share_link(share_id):
         return jsonify({'error': '无权限删除此分享链接'}), 403
     
     share_link.is_active = False
+    # 同一事务中递增版本号，使各worker缓存的分享链接失效
+    CacheVersion.bump('share_link')
     db.session.commit()
+    share_link_cache.pop(share_link.token)
+    share_access_counter.discard(share_link.id)
     
     return jsonify({'message': '分享链接已删除'})
 
+def load_share_link(token):
+    """查询有效的分享链接及其文件信息（一次联表查询），不存在时返回None"""
+    row = db.session.query(
+        ShareLink.id, ShareLink.token, ShareLink.created_time, ShareLink.expires_at,
+        ShareLink.access_count, ShareLink.max_access,
+        MediaFile.id.label('file_id'), MediaFile.original_filename, MediaFile.file_type,
+        MediaFile.mime_type, MediaFile.file_size, MediaFile.storage_type, MediaFile.file_path,
+        MediaFile.remote_storage, MediaFile.remote_path, MediaFile.description
+    ).join(MediaFile, ShareLink.file_id == MediaFile.id).filter(
+        ShareLink.token == token, ShareLink.is_active == True, MediaFile.deleted_at.is_(None)
+    ).first()
+    if row is None:
+        return None
+    return SimpleNamespace(
+        id=row.id, token=row.token, created_time=row.created_time, expires_at=row.expires_at,
+        access_count=row.access_count, max_access=row.max_access,
+        file=SimpleNamespace(
+            id=row.file_id, original_filename=row.original_filename, file_type=row.file_type,
+            mime_type=row.mime_type, file_size=row.file_size, storage_type=row.storage_type,
+            file_path=row.file_path, remote_storage=row.remote_storage, remote_path=row.remote_path,
+            description=row.description
+        )
+    )
+
+def load_share_link_limited(token):
+    """缓存未命中时按客户端IP限流后再查询：枚举随机令牌的请求每次都会落到数据库"""
+    key = f'shared_file_miss:{client_ip()}'
+    limit = app.config.get('SHARE_LINK_MISS_RATE_LIMIT', 30)
+    result = rate_limiter.peek(key, limit, 60)
+    if not result.allowed:
+        raise TooManyRequests(retry_after=int(result.retry_after) + 1)
+    share_link = load_share_link(token)
+    if share_link is None:
+        rate_limiter.hit(key, limit, 60)
+    return share_link
+
+# 分享链接解析缓存：token -> 链接与文件信息；无效令牌在单独的小容量LRU中做负缓存，
+# 链接删除时通过版本号通知其他worker
+share_link_cache = TTLCache(
+    maxsize=app.config.get('SHARE_LINK_CACHE_SIZE', 10000),
+    ttl=app.config.get('SHARE_LINK_CACHE_TTL', 60.0),
+    negative_ttl=app.config.get('SHARE_LINK_NEGATIVE_CACHE_TTL', 30.0),
+    negative_maxsize=app.config.get('SHARE_LINK_NEGATIVE_CACHE_SIZE', 1000),
+    version_getter=lambda: CacheVersion.get_version('share_link')
+)
+
+def flush_share_access_counts(counts):
+    """批量写入分享链接的访问次数增量 {share_link_id: 增量}"""
+    table = ShareLink.__table__
+    stmt = table.update().where(table.c.id == db.bindparam('link_id')).values(
+        access_count=table.c.access_count + db.bindparam('amount')
+    )
+    with app.app_context():
+        db.session.execute(stmt, [{'link_id': link_id, 'amount': amount} for link_id, amount in counts.items()])
+        db.session.commit()
+
+def reserve_share_accesses(link_id, amount):
+    """原子地预占访问次数：只有预占后不超过上限时才会更新成功"""
+    with app.app_context():
+        result = db.session.execute(
+            db.update(ShareLink)
+            .where(ShareLink.id == link_id, ShareLink.access_count + amount <= ShareLink.max_access)
+            .values(access_count=ShareLink.access_count + amount)
+        )
+        db.session.commit()
+        return result.rowcount > 0
+
+def release_share_accesses(counts):
+    """归还未用完的预占次数"""
+    flush_share_access_counts({link_id: -amount for link_id, amount in counts.items()})
+
+# 分享链接访问计数：无限制链接的计数在内存中累加、批量落库；有上限的链接通过预占保证不超限
+share_access_counter = ReservingCounter(
+    flush_fn=flush_share_access_counts,
+    reserve_fn=reserve_share_accesses,
+    release_fn=release_share_accesses,
+    interval=app.config.get('SHARE_COUNTER_FLUSH_INTERVAL', 5.0),
+    block_size=app.config.get('SHARE_COUNTER_RESERVATION_BLOCK', 10)
+)
+
 @app.route('/shared/<token>')
 def shared_file(token):
-    share_link = ShareLink.query.filter_by(token=token, is_active=True).first_or_404()
+    share_link = share_link_cache.get(token, load_share_link_limited)
+    if share_link is None:
+        abort(404)
     
     # 检查链接是否过期
     if share_link.expires_at < datetime.utcnow():
         return render_template('error.html', error='分享链接已过期'), 410
     
-    # 检查访问次数限制
-    if share_link.max_access > 0 and share_link.access_count >= share_link.max_access:
-        return render_template('error.html', error='分享链接访问次数已达上限'), 410
+    media_file = share_link.file
     
-    # 增加访问次数
-    share_link.access_count += 1
-    db.session.commit()
+    # 图片和视频直接返回文件；其他文件类型先显示下载页面，下载按钮带 download=1。
+    # 下载页面本身不计访问次数，每次分享使用只在真正返回文件时计一次
+    download = request.args.get('download') == '1'
+    if media_file.file_type not in ['image', 'video'] and not download:
+        if 0 < share_link.max_access <= share_link.access_count:
+            return render_template('error.html', error='分享链接访问次数已达上限'), 410
+        return render_template('shared_file.html', file=media_file, share_link=share_link)
     
-    media_file = share_link.file
+    # 记录访问次数并检查访问次数限制（写入缓冲，不在请求中提交）
+    if not share_access_counter.acquire(share_link.id, share_link.max_access, share_link.access_count):
+        return render_template('error.html', error='分享链接访问次数已达上限'), 410
+    file_access_counter.increment(media_file.id)
     
-    # 如果是图片或视频，直接返回文件
-    if media_file.file_type in ['image', 'video']:
-        try:
-            if media_file.storage_type == 'local':
-                return send_file(media_file.file_path)
+    try:
+        storage_type, file_path = resolve_file_location(media_file)
+        if storage_type == 'local':
+            if download:
+                return send_file(file_path, as_attachment=True, download_name=media_file.original_filename)
+            return send_file(file_path)
+        else:
+            # 对于云存储文件，使用storage_manager生成访问URL
+            storage = storage_manager.get_storage(storage_type)
+            if not storage:
+                return render_template('error.html', error=f'不支持的存储类型: {storage_type}'), 500
+            
+            response = cloud_file_response(storage, storage_type, file_path, media_file)
+            if response is not None:
+                return response
             else:
-                # 对于云存储文件，使用storage_manager生成访问URL
-                storage = storage_manager.get_storage(media_file.storage_type)
-                if not storage:
-                    return render_template('error.html', error=f'不支持的存储类型: {media_file.storage_type}'), 500
-                
-                url = storage.get_file_url(media_file.file_path)
-                if url:
-                    return redirect(url)
-                else:
-                    return render_template('error.html', error='无法生成文件访问URL'), 500
-        except Exception as e:
-            return render_template('error.html', error=f'文件访问失败: {str(e)}'), 500
-    else:
-        # 对于其他文件类型，显示下载页面
-        return render_template('shared_file.html', file=media_file, share_link=share_link)
+                return render_template('error.html', error='无法生成文件访问URL'), 500
+    except Exception as e:
+        return render_template('error.html', error=f'文件访问失败: {str(e)}'), 500
 
 # 笔记相关路由
+NOTE_EXCERPT_LENGTH = 200
+
+def note_excerpt(note):
+    """笔记摘要：超过长度时截断并加省略号"""
+    if len(note.excerpt) > NOTE_EXCERPT_LENGTH:
+        return note.excerpt[:NOTE_EXCERPT_LENGTH] + '...'
+    return note.excerpt
+
+# 笔记列表接口可返回的字段；摘要在数据库中截取（多取一个字符用于判断是否需要省略号）
+NOTE_LIST_FIELDS = FieldSet({
+    'id': ((Note.id,), lambda n: n.id),
+    'title': ((Note.title,), lambda n: n.title),
+    'content': ((db.func.substr(Note.content, 1, NOTE_EXCERPT_LENGTH + 1).label('excerpt'),), note_excerpt),
+    'created_time': ((Note.created_time,), lambda n: n.created_time.isoformat()),
+    'updated_time': ((Note.updated_time,), lambda n: n.updated_time.isoformat()),
+    'tags': ((Note.tags,), lambda n: n.tags.split(',') if n.tags else []),
+})
+
 @app.route('/api/notes', methods=['GET'])
 @login_required
 def list_notes():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
-    
-    notes = Note.query.filter_by(user_id=current_user.id).order_by(Note.updated_time.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
-    
-    return jsonify({
-        'notes': [{
-            'id': n.id,
-            'title': n.title,
-            'content': n.content[:200] + '...' if len(n.content) > 200 else n.content,
-            'created_time': n.created_time.isoformat(),
-            'updated_time': n.updated_time.isoformat(),
-            'tags': n.tags.split(',') if n.tags else []
-        } for n in notes.items],
+    try:
+        fields = NOTE_LIST_FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = Note.query.filter_by(user_id=current_user.id)
+    
+    # 结果集摘要（数量 + 最近更新时间 + 最大ID）作为ETag
+    total, latest_time, latest_id = query.with_entities(
+        db.func.count(Note.id), db.func.max(Note.updated_time), db.func.max(Note.id)
+    ).one()
+    etag = weak_etag(current_user.id, request.full_path, total, latest_time, latest_id)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    
+    # 摘要在数据库中截取，完整的笔记内容不会被读出
+    notes = query.order_by(Note.updated_time.desc()).with_entities(
+        *NOTE_LIST_FIELDS.columns(fields)
+    ).paginate(page=page, per_page=per_page, error_out=False, count=False)
+    notes.total = total
+    
+    return set_list_etag(jsonify({
+        'notes': [NOTE_LIST_FIELDS.serialize(n, fields) for n in notes.items],
         'total': notes.total,
         'pages': notes.pages,
         'current_page': page
-    })
+    }), etag)
 
 @app.route('/api/notes', methods=['POST'])
 @login_required
@@ -1639,32 +2303,51 @@ def delete_note(note_id):
     return jsonify({'message': '笔记删除成功'})
 
 # 聊天记录模块 API
+# 聊天记录列表接口可返回的字段
+CHAT_MESSAGE_LIST_FIELDS = FieldSet({
+    'id': ((ChatMessage.id,), lambda m: m.id),
+    'message_type': ((ChatMessage.message_type,), lambda m: m.message_type),
+    'content': ((ChatMessage.content,), lambda m: m.content),
+    'file_name': ((ChatMessage.file_name,), lambda m: m.file_name),
+    'file_size': ((ChatMessage.file_size,), lambda m: m.file_size),
+    'file_path': ((ChatMessage.file_path,), lambda m: m.file_path),
+    'thumbnail_path': ((ChatMessage.thumbnail_path,), lambda m: m.thumbnail_path),
+    'has_thumbnail': ((ChatMessage.thumbnail_path,), lambda m: m.thumbnail_path is not None),
+    'created_time': ((ChatMessage.created_time,), lambda m: m.created_time.isoformat()),
+})
+
 @app.route('/api/chat/messages')
 @login_required
 def get_chat_messages():
     """获取聊天记录列表"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 50, type=int)
-    
-    messages = ChatMessage.query.filter_by(user_id=current_user.id).order_by(
-        ChatMessage.created_time.desc()
-    ).paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'messages': [{
-            'id': m.id,
-            'message_type': m.message_type,
-            'content': m.content,
-            'file_name': m.file_name,
-            'file_size': m.file_size,
-            'file_path': m.file_path,
-            'thumbnail_path': m.thumbnail_path,
-            'created_time': m.created_time.isoformat()
-        } for m in messages.items],
+    try:
+        fields = CHAT_MESSAGE_LIST_FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = ChatMessage.query.filter_by(user_id=current_user.id)
+    
+    # 结果集摘要（数量 + 最新消息时间 + 最大ID）作为ETag
+    total, latest_time, latest_id = query.with_entities(
+        db.func.count(ChatMessage.id), db.func.max(ChatMessage.created_time), db.func.max(ChatMessage.id)
+    ).one()
+    etag = weak_etag(current_user.id, request.full_path, total, latest_time, latest_id)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    
+    messages = query.order_by(ChatMessage.created_time.desc()).with_entities(
+        *CHAT_MESSAGE_LIST_FIELDS.columns(fields)
+    ).paginate(page=page, per_page=per_page, error_out=False, count=False)
+    messages.total = total
+    
+    return set_list_etag(jsonify({
+        'messages': [CHAT_MESSAGE_LIST_FIELDS.serialize(m, fields) for m in messages.items],
         'total': messages.total,
         'pages': messages.pages,
         'current_page': page
-    })
+    }), etag)
 
 @app.route('/api/chat/messages', methods=['POST'])
 @login_required
@@ -1816,9 +2499,163 @@ def delete_chat_message(message_id):
     
     return jsonify({'message': '消息删除成功'})
 
+# 增量同步
+@app.route('/api/changes')
+@login_required
+def list_changes():
+    """返回序号大于 since 的变更记录；since 早于已清理的日志时返回 reset，客户端需要全量刷新"""
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 1000)
+    
+    rows, latest, has_more, reset = query_changes(current_user.id, since, limit)
+    return jsonify({
+        'changes': [serialize_change(row) for row in rows],
+        'next': rows[-1].seq if rows else max(since, latest),
+        'latest': latest,
+        'has_more': has_more,
+        'reset': reset
+    })
+
+def query_changes(user_id, since, limit):
+    """读取用户序号大于 since 的变更，返回 (记录, 最新序号, 是否还有更多, 是否需要全量刷新)"""
+    query = ChangeLog.query.filter(ChangeLog.user_id == user_id)
+    latest = query.with_entities(db.func.max(ChangeLog.seq)).scalar() or 0
+    
+    # since 之后的部分日志已被清理（包括整个日志都已清空的情况），无法增量同步
+    pruned = db.session.query(SystemConfig.config_value).filter_by(config_key=CHANGE_LOG_PRUNED_KEY).scalar()
+    if since > 0 and pruned and since < int(pruned):
+        return [], latest, False, True
+    
+    rows = query.filter(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit + 1).all()
+    return rows[:limit], latest, len(rows) > limit, False
+
+@app.route('/api/events')
+@login_required
+def event_stream():
+    """Server-Sent Events：推送当前用户的文件、笔记、聊天消息变更
+    
+    断线重连时浏览器会带上 Last-Event-ID，先补发错过的变更；错过太多或日志已清理时发送 reset 事件。
+    连接持续 EVENT_STREAM_MAX_DURATION 秒后主动结束，由客户端自动重连。
+    """
+    # 未启用时返回 204，浏览器收到后不再重连（旧页面也不会占用 worker）
+    if not app.config.get('LIVE_UPDATES_ENABLED', True):
+        return '', 204
+    
+    user_id = current_user.id
+    heartbeat = app.config.get('EVENT_HEARTBEAT_INTERVAL', 15)
+    max_duration = app.config.get('EVENT_STREAM_MAX_DURATION', 300)
+    
+    # 先订阅再补发，避免两者之间的变更丢失；重复的事件按序号跳过
+    subscription = event_hub.subscribe(user_id)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        if last_event_id and last_event_id.isdigit():
+            replay, latest, has_more, reset = query_changes(user_id, int(last_event_id), 500)
+            reset = reset or has_more
+        else:
+            replay, latest, reset = [], latest_change_seq(), False
+        replay = [serialize_change(row) for row in replay]
+    except Exception:
+        event_hub.unsubscribe(subscription)
+        raise
+    finally:
+        # 长连接期间不占用数据库连接
+        db.session.remove()
+    
+    def generate():
+        cursor = latest
+        deadline = time.monotonic() + max_duration
+        try:
+            yield format_event(retry=3000)
+            if reset:
+                yield format_event({'latest': cursor}, 'reset', event_id=cursor)
+            else:
+                for change in replay:
+                    yield format_event(change, 'change', event_id=change['seq'])
+                yield format_event({'latest': cursor}, 'ready', event_id=cursor)
+            
+            while time.monotonic() < deadline:
+                if subscription.overflowed:
+                    yield format_event({'latest': cursor}, 'reset', event_id=cursor)
+                    break
+                change = subscription.get(timeout=heartbeat)
+                if change is None:
+                    yield format_event(comment='keepalive')
+                    continue
+                if change['seq'] <= cursor:
+                    continue
+                cursor = change['seq']
+                change = {key: value for key, value in change.items() if key != 'user_id'}
+                yield format_event(change, 'change', event_id=cursor)
+        finally:
+            event_hub.unsubscribe(subscription)
+    
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 禁止 nginx 缓冲事件流
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# API令牌管理
+def require_session_auth():
+    """令牌管理只允许通过浏览器会话操作，避免用令牌签发新令牌"""
+    if getattr(g, 'api_token', None) is not None:
+        abort(403)
+
+@app.route('/api/tokens', methods=['POST'])
+@login_required
+def create_token():
+    require_session_auth()
+    data = request.get_json(silent=True) or {}
+    try:
+        token, claims = create_api_token(current_user.id, data.get('scopes'), data.get('expires_in'), data.get('name'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    log_user_action("签发API令牌", user_id=current_user.id, ip_address=request.remote_addr,
+                    details=f"jti={claims['jti']} scope={claims['scope']}")
+    return jsonify({
+        'token': token,
+        'jti': claims['jti'],
+        'scopes': claims['scope'].split(),
+        'expires_at': claims['exp'].isoformat()
+    }), 201
+
+@app.route('/api/tokens/<jti>', methods=['DELETE'])
+@login_required
+def revoke_token(jti):
+    """吊销单个令牌（令牌本身也可以吊销自己）"""
+    token = getattr(g, 'api_token', None)
+    if token is not None and token['jti'] != jti:
+        abort(403)
+    
+    if not db.session.get(RevokedToken, jti):
+        # 令牌未在服务端保存，按最长有效期保留吊销记录
+        expires_at = datetime.utcnow() + timedelta(seconds=app.config.get('API_TOKEN_MAX_TTL', 365 * 86400))
+        db.session.add(RevokedToken(jti=jti, user_id=current_user.id, expires_at=expires_at))
+    # 顺带清理已经过期的吊销记录
+    RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    CacheVersion.bump('api_token')
+    db.session.commit()
+    token_revocation_cache.invalidate()
+    
+    return jsonify({'message': '令牌已吊销'})
+
+@app.route('/api/tokens/revoke-all', methods=['POST'])
+@login_required
+def revoke_all_tokens():
+    """吊销此前签发的全部令牌（递增令牌纪元）"""
+    require_session_auth()
+    CacheVersion.bump('api_token_epoch')
+    CacheVersion.bump('api_token')
+    db.session.commit()
+    token_revocation_cache.invalidate()
+    
+    log_user_action("吊销全部API令牌", user_id=current_user.id, ip_address=request.remote_addr)
+    return jsonify({'message': '已吊销全部令牌'})
+
 if __name__ == '__main__':
-    with app.app_context():
-        # 使用统一的数据库初始化函数
-        init_database()
+    # 使用统一的启动初始化
+    bootstrap()
     
     app.run(debug=True, host='0.0.0.0', port=8080)
@@ -0,0 +1,240 @@
+"""
+异步存储接口
+与 cloud_storage 中的同步接口并行提供 async 版本的上传/下载/删除/查询/列出操作，
+以及限制并发数的批量操作，供迁移、校验、清理等维护任务同时发起大量存储请求。
+
+坚果云（WebDAV）使用 aiohttp 原生异步实现；其他云厂商没有异步SDK，
+在线程池中调用同步客户端（共享 CloudStorageManager 中的连接池）。
+未安装 aiohttp 时 WebDAV 也回退到线程池实现。
+"""
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from cloud_storage import (CloudStorageBase, storage_manager, parse_propfind,
+                           STORAGE_CONNECT_TIMEOUT, STORAGE_READ_TIMEOUT)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# 批量操作默认的并发数
+DEFAULT_CONCURRENCY = int(os.getenv('STORAGE_ASYNC_CONCURRENCY', '32'))
+
+
+class AsyncStorage(ABC):
+    """异步存储接口；返回值约定与同步接口相同"""
+
+    @abstractmethod
+    async def upload_file(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
+        pass
+
+    @abstractmethod
+    async def download_file(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
+        pass
+
+    @abstractmethod
+    async def delete_file(self, remote_path: str) -> Tuple[bool, str]:
+        pass
+
+    @abstractmethod
+    async def head_file(self, remote_path: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    async def list_files(self, prefix: str = '') -> List[dict]:
+        pass
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class ExecutorStorage(AsyncStorage):
+    """在线程池中执行同步存储客户端的操作"""
+
+    def __init__(self, storage: CloudStorageBase, max_workers: int = DEFAULT_CONCURRENCY):
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='storage-io')
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def upload_file(self, local_path, remote_path):
+        return await self._run(self.storage.upload_file, local_path, remote_path)
+
+    async def download_file(self, remote_path, local_path):
+        return await self._run(self.storage.download_file, remote_path, local_path)
+
+    async def delete_file(self, remote_path):
+        return await self._run(self.storage.delete_file, remote_path)
+
+    async def head_file(self, remote_path):
+        return await self._run(self.storage.head_file, remote_path)
+
+    async def list_files(self, prefix=''):
+        return await self._run(lambda: list(self.storage.list_files(prefix)))
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class AsyncWebDAVStorage(AsyncStorage):
+    """基于 aiohttp 的 WebDAV 客户端（坚果云），所有请求共享一个连接池"""
+
+    def __init__(self, config: dict, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 300):
+        self.config = config
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._session = None
+
+    def _url(self, remote_path: str) -> str:
+        return f"{self.config['webdav_url']}/{remote_path}"
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(self.config['username'], self.config['password']),
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=STORAGE_CONNECT_TIMEOUT,
+                                              sock_read=STORAGE_READ_TIMEOUT),
+            )
+        return self._session
+
+    async def upload_file(self, local_path, remote_path):
+        try:
+            with open(local_path, 'rb') as f:
+                async with self._get_session().put(self._url(remote_path), data=f) as response:
+                    if response.status in (200, 201, 204):
+                        return True, "上传成功"
+                    return False, f"上传失败: {response.status}"
+        except Exception as e:
+            return False, str(e)
+
+    async def download_file(self, remote_path, local_path):
+        try:
+            async with self._get_session().get(self._url(remote_path)) as response:
+                if response.status != 200:
+                    return False, f"下载失败: {response.status}"
+                with open(local_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(1024 * 1024):
+                        f.write(chunk)
+            return True, "下载成功"
+        except Exception as e:
+            return False, str(e)
+
+    async def delete_file(self, remote_path):
+        try:
+            async with self._get_session().delete(self._url(remote_path)) as response:
+                if response.status in (200, 204):
+                    return True, "删除成功"
+                return False, f"删除失败: {response.status}"
+        except Exception as e:
+            return False, str(e)
+
+    async def head_file(self, remote_path):
+        async with self._get_session().head(self._url(remote_path)) as response:
+            if response.status == 404:
+                return None
+            response.raise_for_status()
+            return {'key': remote_path, 'size': int(response.headers.get('Content-Length', 0)),
+                    'etag': response.headers.get('ETag', '').strip('"') or None}
+
+    async def list_files(self, prefix=''):
+        """逐级 PROPFIND 列出目录，同一层的子目录并发列出"""
+        results = []
+
+        async def walk(directory):
+            url = self._url(f"{directory}/") if directory else f"{self.config['webdav_url']}/"
+            async with self._get_session().request('PROPFIND', url, headers={'Depth': '1'}) as response:
+                if response.status == 404:
+                    return
+                if response.status != 207:
+                    raise IOError(f"列出文件失败: HTTP {response.status}")
+                body = await response.read()
+            subdirectories = []
+            for entry in parse_propfind(body, self.config['webdav_url']):
+                if entry['key'].rstrip('/') == directory:
+                    continue
+                if entry.pop('is_dir'):
+                    subdirectories.append(entry['key'].rstrip('/'))
+                else:
+                    results.append(entry)
+            await asyncio.gather(*(walk(sub) for sub in subdirectories))
+
+        await walk(prefix.rstrip('/'))
+        return results
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def get_async_storage(provider: str, config: dict, concurrency: int = DEFAULT_CONCURRENCY) -> Optional[AsyncStorage]:
+    """创建异步存储客户端；需要在事件循环中使用并在结束时 close()（或使用 async with）"""
+    if provider == 'jianguoyun' and aiohttp is not None:
+        return AsyncWebDAVStorage(config, concurrency)
+    storage = storage_manager.get_storage_client(provider, config)
+    if storage is None:
+        return None
+    return ExecutorStorage(storage, concurrency)
+
+
+async def gather_bounded(func: Callable[[Any], Awaitable], items: Iterable, concurrency: int = DEFAULT_CONCURRENCY,
+                         return_exceptions: bool = True) -> list:
+    """对每个元素调用 func，最多 concurrency 个同时进行，按输入顺序返回结果
+
+    return_exceptions 为 True 时单个失败不影响其他元素，异常对象作为该元素的结果返回。
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=return_exceptions)
+
+
+async def batch_delete(storage: AsyncStorage, remote_paths: Iterable[str],
+                       concurrency: int = DEFAULT_CONCURRENCY) -> list:
+    """批量删除，返回 [(remote_path, 是否成功, 消息)]"""
+    remote_paths = list(remote_paths)
+    results = await gather_bounded(storage.delete_file, remote_paths, concurrency)
+    return [(path, *_as_result(result)) for path, result in zip(remote_paths, results)]
+
+
+async def batch_upload(storage: AsyncStorage, pairs: Iterable[Tuple[str, str]],
+                       concurrency: int = DEFAULT_CONCURRENCY) -> list:
+    """批量上传 [(local_path, remote_path)]，返回 [(remote_path, 是否成功, 消息)]"""
+    pairs = list(pairs)
+    results = await gather_bounded(lambda pair: storage.upload_file(*pair), pairs, concurrency)
+    return [(remote, *_as_result(result)) for (_, remote), result in zip(pairs, results)]
+
+
+async def batch_head(storage: AsyncStorage, remote_paths: Iterable[str],
+                     concurrency: int = DEFAULT_CONCURRENCY) -> dict:
+    """批量查询元数据，返回 {remote_path: 元数据 / None（不存在） / 异常}"""
+    remote_paths = list(remote_paths)
+    results = await gather_bounded(storage.head_file, remote_paths, concurrency)
+    return dict(zip(remote_paths, results))
+
+
+def _as_result(result) -> Tuple[bool, str]:
+    if isinstance(result, BaseException):
+        return False, str(result)
+    return result
+
+
+def run(coro):
+    """在同步代码（命令行脚本、后台线程）中执行异步批量操作"""
+    return asyncio.run(coro)
@@ -0,0 +1,73 @@
+"""
+后台定期任务
+每个 gunicorn worker 都会启动同样的定时线程（分享链接清理、冷热分层、回收站清理），
+同一数据库的各个 worker 通过文件锁互斥，并在锁文件中记录上次开始执行的时间：
+距上次执行不足一个间隔时跳过，因此不论有多少个 worker，每个任务每个间隔只执行一次。
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def lock_path(app, name: str) -> str:
+    """同一数据库的所有 worker 共用一个锁文件"""
+    digest = hashlib.sha1(app.config['SQLALCHEMY_DATABASE_URI'].encode('utf-8')).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'solocloud-{name}-{digest}.lock')
+
+
+def run_exclusive(app, name: str, func: Callable, interval: float = 0, **kwargs):
+    """加文件锁在应用上下文中执行 func(**kwargs)
+
+    其他进程正在执行，或距上次开始执行不足 interval 秒时跳过并返回 None。
+    """
+    if fcntl is None:
+        with app.app_context():
+            return func(**kwargs)
+    # 'a+' 打开不会在加锁前清空上次执行时间
+    with open(lock_path(app, name), 'a+') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return None
+        lock_file.seek(0)
+        try:
+            last_run = float(lock_file.read().strip() or 0)
+        except ValueError:
+            last_run = 0.0
+        now = time.time()
+        if interval > 0 and 0 <= now - last_run < interval:
+            return None
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(now))
+        lock_file.flush()
+        with app.app_context():
+            return func(**kwargs)
+
+
+def start_periodic(app, name: str, interval: float, func: Callable,
+                   on_result: Optional[Callable] = None, **kwargs) -> threading.Thread:
+    """启动后台线程，每 interval 秒尝试执行一次 func；本次执行了时把结果交给 on_result"""
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                result = run_exclusive(app, name, func, interval, **kwargs)
+                if result is not None and on_result is not None:
+                    on_result(result)
+            except Exception as e:
+                app.logger.error(f"后台任务 {name} 执行失败: {e}")
+
+    thread = threading.Thread(target=loop, name=f'background-{name}', daemon=True)
+    thread.start()
+    return thread
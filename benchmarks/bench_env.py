@@ -0,0 +1,33 @@
+"""
+基准测试公共工具：在临时目录中准备隔离的应用运行环境
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_env(workdir):
+    """返回指向临时目录的数据库、上传目录和日志配置"""
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    return {
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'data', 'bench.db')}",
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'LOG_FILE': os.path.join(workdir, 'logs', 'SoloCloud.log'),
+        'RATE_LIMIT_STORAGE': os.path.join(workdir, 'data', 'ratelimit.db'),
+        'EVENT_NOTIFY_FILE': os.path.join(workdir, 'data', 'events.notify'),
+    }
+
+
+def load_app(workdir=None):
+    """在当前进程中以隔离环境导入应用并完成初始化，返回 (app模块, 工作目录)"""
+    workdir = workdir or tempfile.mkdtemp(prefix='solocloud-bench-')
+    os.environ.update(app_env(workdir))
+    os.chdir(workdir)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import app as app_module
+    app_module.bootstrap()
+    return app_module, workdir
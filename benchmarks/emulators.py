@@ -0,0 +1,648 @@
+"""
+云存储服务模拟器
+在本机启动与各云厂商接口兼容的测试服务器，供基准测试和回归测试在没有真实账号时使用:
+  s3:     S3/OSS/COS 风格的对象接口（路径风格），PUT/GET/HEAD/DELETE、列出对象、批量删除、分块上传
+  qiniu:  七牛表单上传、stat/delete/batch/list 管理接口和下载
+  webdav: 坚果云风格的 WebDAV，PUT/GET/HEAD/DELETE/PROPFIND/MKCOL
+
+每个模拟器都可以注入故障（运行中也可以修改 emulator.faults）:
+  latency/jitter  每个请求返回前的延迟（秒）
+  bandwidth       每个连接的收发速率上限（字节/秒，0表示不限速）
+  error_rate      按概率返回 503
+  drop_rate       按概率不返回响应直接断开连接
+  fail_next       接下来固定 N 个请求返回 503，便于复现重试和熔断
+
+使用方法:
+  with Emulator('s3', tls=True, latency=0.02) as emulator:
+      provider, config = emulator.storage_config('aliyun_oss')
+      storage = CloudStorageManager().get_storage_client(provider, config)
+      emulator.attach(provider, storage)
+"""
+
+import base64
+import hashlib
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+
+BUCKET = 'solocloud-bench'
+# 限速时每次收发的数据块大小
+THROTTLE_CHUNK = 64 * 1024
+
+
+class FaultSettings:
+    """故障注入参数，所有连接共享"""
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=0, error_rate=0.0, drop_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.fail_next = 0
+        self._lock = threading.Lock()
+
+    def take_forced_failure(self) -> bool:
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+            return False
+
+
+class ObjectStore:
+    """内存中的对象存储：{key: (数据, etag, 修改时间)}，以及未完成的分块上传"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def put(self, key, data):
+        etag = hashlib.md5(data).hexdigest()
+        with self.lock:
+            self.objects[key] = (data, etag, time.time())
+        return etag
+
+    def get(self, key):
+        with self.lock:
+            return self.objects.get(key)
+
+    def delete(self, key) -> bool:
+        with self.lock:
+            return self.objects.pop(key, None) is not None
+
+    def list(self, prefix=''):
+        with self.lock:
+            return sorted((key, value) for key, value in self.objects.items() if key.startswith(prefix))
+
+
+class EmulatorHandler(BaseHTTPRequestHandler):
+    """公共部分：故障注入、限速收发"""
+    protocol_version = 'HTTP/1.1'
+    # 响应头和正文分两次写出，不关闭 Nagle 算法会与客户端的延迟确认叠加出约 40ms 的额外延迟
+    disable_nagle_algorithm = True
+    store: ObjectStore = None
+    faults: FaultSettings = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def parse_request(self):
+        # 请求头解析完、分发到 do_<METHOD> 之前注入延迟和故障
+        if not super().parse_request():
+            return False
+        with self.store.lock:
+            self.store.requests += 1
+        faults = self.faults
+        delay = faults.latency + (random.uniform(0, faults.jitter) if faults.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if faults.drop_rate and random.random() < faults.drop_rate:
+            self.close_connection = True
+            self.connection.close()
+            return False
+        if faults.take_forced_failure() or (faults.error_rate and random.random() < faults.error_rate):
+            self._read_body()
+            self._reply(503, b'Service Unavailable (injected)', 'text/plain')
+            return False
+        return True
+
+    def _throttled_read(self, length):
+        bandwidth = self.faults.bandwidth
+        if not bandwidth:
+            return self.rfile.read(length)
+        chunks = []
+        while length > 0:
+            chunk = self.rfile.read(min(THROTTLE_CHUNK, length))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            length -= len(chunk)
+            time.sleep(len(chunk) / bandwidth)
+        return b''.join(chunks)
+
+    def _throttled_write(self, data):
+        bandwidth = self.faults.bandwidth
+        if not bandwidth:
+            self.wfile.write(data)
+            return
+        view = memoryview(data)
+        for offset in range(0, len(view), THROTTLE_CHUNK):
+            chunk = view[offset:offset + THROTTLE_CHUNK]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / bandwidth)
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self._throttled_read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        return self._throttled_read(int(self.headers.get('Content-Length', 0)))
+
+    def _reply(self, status, body=b'', content_type='application/octet-stream', headers=None, head=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body and not head:
+            self._throttled_write(body)
+
+    def _object_headers(self, entry):
+        data, etag, mtime = entry
+        return {'ETag': f'"{etag}"', 'Last-Modified': formatdate(mtime, usegmt=True)}
+
+
+class S3Handler(EmulatorHandler):
+    """S3/OSS/COS 风格的对象接口，路径风格 /<bucket>/<key>，也接受不带 bucket 的 /<key>（COS 自定义域名）"""
+
+    def _target(self):
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path).lstrip('/')
+        if path == BUCKET or path.startswith(BUCKET + '/'):
+            path = path[len(BUCKET) + 1:]
+        return path, parse_qs(parsed.query, keep_blank_values=True)
+
+    def _reply(self, status, body=b'', content_type='application/octet-stream', headers=None, head=False):
+        request_id = uuid.uuid4().hex
+        headers = dict(headers or {}, **{'x-oss-request-id': request_id, 'x-cos-request-id': request_id})
+        super()._reply(status, body, content_type, headers, head)
+
+    def _xml(self, status, root):
+        body = b'<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root)
+        self._reply(status, body, 'application/xml')
+
+    def _error(self, status, code):
+        root = ET.Element('Error')
+        ET.SubElement(root, 'Code').text = code
+        ET.SubElement(root, 'Message').text = code
+        ET.SubElement(root, 'RequestId').text = uuid.uuid4().hex
+        self._xml(status, root)
+
+    def do_PUT(self):
+        key, query = self._target()
+        data = self._read_body()
+        if 'uploadId' in query:
+            upload_id = query['uploadId'][0]
+            with self.store.lock:
+                parts = self.store.uploads.get(upload_id)
+                if parts is None:
+                    return self._error(404, 'NoSuchUpload')
+                parts[int(query['partNumber'][0])] = data
+            return self._reply(200, headers={'ETag': f'"{hashlib.md5(data).hexdigest()}"'})
+        etag = self.store.put(key, data)
+        self._reply(200, headers={'ETag': f'"{etag}"'})
+
+    def do_POST(self):
+        key, query = self._target()
+        body = self._read_body()
+        if not key and 'delete' in query:
+            return self._delete_objects(body)
+        if 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            with self.store.lock:
+                self.store.uploads[upload_id] = {}
+            root = ET.Element('InitiateMultipartUploadResult')
+            ET.SubElement(root, 'Bucket').text = BUCKET
+            ET.SubElement(root, 'Key').text = key
+            ET.SubElement(root, 'UploadId').text = upload_id
+            return self._xml(200, root)
+        if 'uploadId' in query:
+            with self.store.lock:
+                parts = self.store.uploads.pop(query['uploadId'][0], None)
+            if parts is None:
+                return self._error(404, 'NoSuchUpload')
+            numbers = [int(node.text) for node in ET.fromstring(body).iter() if node.tag.endswith('PartNumber')]
+            if any(number not in parts for number in numbers):
+                return self._error(400, 'InvalidPart')
+            etag = self.store.put(key, b''.join(parts[number] for number in sorted(numbers)))
+            root = ET.Element('CompleteMultipartUploadResult')
+            ET.SubElement(root, 'Bucket').text = BUCKET
+            ET.SubElement(root, 'Key').text = key
+            ET.SubElement(root, 'ETag').text = f'"{etag}"'
+            return self._xml(200, root)
+        self._error(400, 'InvalidRequest')
+
+    def _delete_objects(self, body):
+        """批量删除：不存在的对象同样算删除成功；Quiet 模式只返回失败项"""
+        request = ET.fromstring(body)
+        quiet = any(node.tag.endswith('Quiet') and (node.text or '').lower() == 'true' for node in request.iter())
+        root = ET.Element('DeleteResult')
+        for node in request.iter():
+            if node.tag.endswith('Key'):
+                self.store.delete(node.text)
+                if not quiet:
+                    ET.SubElement(ET.SubElement(root, 'Deleted'), 'Key').text = node.text
+        self._xml(200, root)
+
+    def do_GET(self, head=False):
+        key, query = self._target()
+        if not key:
+            return self._bucket_get(query, head)
+        entry = self.store.get(key)
+        if entry is None:
+            return self._error(404, 'NoSuchKey') if not head else self._reply(404, head=True)
+        self._reply(200, entry[0], headers=self._object_headers(entry), head=head)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def _bucket_get(self, query, head):
+        if head:
+            return self._reply(200, head=True)
+        if 'bucketInfo' in query:
+            root = ET.Element('BucketInfo')
+            bucket = ET.SubElement(root, 'Bucket')
+            for tag, text in (('Name', BUCKET), ('CreationDate', '2024-01-01T00:00:00.000Z'),
+                              ('StorageClass', 'Standard'), ('ExtranetEndpoint', '127.0.0.1'),
+                              ('IntranetEndpoint', '127.0.0.1'), ('Location', 'emulator')):
+                ET.SubElement(bucket, tag).text = text
+            owner = ET.SubElement(bucket, 'Owner')
+            ET.SubElement(owner, 'DisplayName').text = 'bench'
+            ET.SubElement(owner, 'ID').text = 'bench'
+            ET.SubElement(ET.SubElement(bucket, 'AccessControlList'), 'Grant').text = 'private'
+            return self._xml(200, root)
+        if 'uploads' in query:
+            root = ET.Element('ListMultipartUploadsResult')
+            ET.SubElement(root, 'Bucket').text = BUCKET
+            ET.SubElement(root, 'IsTruncated').text = 'false'
+            return self._xml(200, root)
+        prefix = query.get('prefix', [''])[0]
+        marker = query.get('marker', [''])[0]
+        limit = int(query.get('max-keys', ['1000'])[0])
+        entries = [(key, value) for key, value in self.store.list(prefix) if key > marker]
+        root = ET.Element('ListBucketResult')
+        ET.SubElement(root, 'Name').text = BUCKET
+        ET.SubElement(root, 'Prefix').text = prefix
+        ET.SubElement(root, 'Marker').text = marker
+        ET.SubElement(root, 'MaxKeys').text = str(limit)
+        ET.SubElement(root, 'IsTruncated').text = 'true' if len(entries) > limit else 'false'
+        if len(entries) > limit:
+            ET.SubElement(root, 'NextMarker').text = entries[limit - 1][0]
+        for key, (data, etag, mtime) in entries[:limit]:
+            contents = ET.SubElement(root, 'Contents')
+            ET.SubElement(contents, 'Key').text = key
+            ET.SubElement(contents, 'LastModified').text = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(mtime))
+            ET.SubElement(contents, 'ETag').text = f'"{etag}"'
+            ET.SubElement(contents, 'Type').text = 'Normal'
+            ET.SubElement(contents, 'Size').text = str(len(data))
+            ET.SubElement(contents, 'StorageClass').text = 'Standard'
+        self._xml(200, root)
+
+    def do_DELETE(self):
+        key, query = self._target()
+        if 'uploadId' in query:
+            with self.store.lock:
+                self.store.uploads.pop(query['uploadId'][0], None)
+        else:
+            self.store.delete(key)
+        # S3 语义：删除不存在的对象同样返回 204
+        self._reply(204)
+
+
+class QiniuHandler(EmulatorHandler):
+    """七牛接口：POST / 表单上传，/stat/ /delete/ /list /buckets 管理接口，GET /<key> 下载"""
+
+    def _json(self, status, value):
+        body = json.dumps(value).encode('utf-8')
+        self._reply(status, body, 'application/json', headers={'X-Reqid': uuid.uuid4().hex})
+
+    @staticmethod
+    def _entry_key(encoded):
+        bucket, _, key = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode('utf-8').partition(':')
+        return key
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._read_body()
+        if path == '/':
+            return self._form_upload(body)
+        operation, _, argument = path.lstrip('/').partition('/')
+        if operation == 'stat':
+            return self._stat(argument)
+        if operation == 'delete':
+            key = self._entry_key(argument.split('/')[0])
+            if not self.store.delete(key):
+                return self._json(612, {'error': 'no such file or directory'})
+            return self._json(200, {})
+        if operation == 'buckets':
+            return self._json(200, [BUCKET])
+        if operation == 'batch':
+            return self._batch(parse_qs(body.decode('utf-8')).get('op', []))
+        self._json(400, {'error': f'unsupported operation {operation}'})
+
+    def _batch(self, operations):
+        """批量操作（只支持 delete），全部成功返回 200，部分失败返回 298"""
+        results = []
+        for operation in operations:
+            name, _, argument = operation.lstrip('/').partition('/')
+            if name != 'delete':
+                results.append({'code': 400, 'data': {'error': f'unsupported operation {name}'}})
+            elif self.store.delete(self._entry_key(argument)):
+                results.append({'code': 200})
+            else:
+                results.append({'code': 612, 'data': {'error': 'no such file or directory'}})
+        self._json(200 if all(result['code'] == 200 for result in results) else 298, results)
+
+    def _form_upload(self, body):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            fields[part.get_param('name', header='content-disposition')] = part.get_payload(decode=True)
+        if 'file' not in fields or 'key' not in fields:
+            return self._json(400, {'error': 'file or key missing'})
+        key = fields['key'].decode('utf-8')
+        etag = self.store.put(key, fields['file'])
+        self._json(200, {'hash': etag, 'key': key})
+
+    def _stat(self, encoded):
+        entry = self.store.get(self._entry_key(encoded))
+        if entry is None:
+            return self._json(612, {'error': 'no such file or directory'})
+        data, etag, mtime = entry
+        self._json(200, {'fsize': len(data), 'hash': etag, 'mimeType': 'application/octet-stream',
+                         'putTime': int(mtime * 10000000)})
+
+    def do_GET(self, head=False):
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        if path.startswith('/stat/'):
+            return self._stat(path[len('/stat/'):])
+        if path == '/buckets':
+            return self._json(200, [BUCKET])
+        if path == '/list':
+            query = parse_qs(parsed.query)
+            prefix = query.get('prefix', [''])[0]
+            marker = query.get('marker', [''])[0]
+            limit = int(query.get('limit', ['1000'])[0])
+            entries = [(key, value) for key, value in self.store.list(prefix) if key > marker]
+            items = [{'key': key, 'fsize': len(data), 'hash': etag, 'putTime': int(mtime * 10000000)}
+                     for key, (data, etag, mtime) in entries[:limit]]
+            result = {'items': items}
+            if len(entries) > limit:
+                result['marker'] = items[-1]['key']
+            return self._json(200, result)
+        entry = self.store.get(path.lstrip('/'))
+        if entry is None:
+            return self._json(404, {'error': 'Document not found'})
+        self._reply(200, entry[0], headers=self._object_headers(entry), head=head)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+
+class WebDAVHandler(EmulatorHandler):
+    """WebDAV：对象按完整路径存放
+    默认 PUT 时自动创建父目录；strict_collections 为 True 时与坚果云一致，父目录需要先 MKCOL，否则返回 409"""
+
+    ROOT = '/dav'
+
+    def _key(self):
+        path = unquote(urlparse(self.path).path)
+        if path.startswith(self.ROOT):
+            path = path[len(self.ROOT):]
+        return path.strip('/')
+
+    def _collections(self):
+        return self.server.collections
+
+    def do_MKCOL(self):
+        key = self._key()
+        self._read_body()
+        parent = os.path.dirname(key)
+        with self.store.lock:
+            if key in self._collections() or key in self.store.objects:
+                return self._reply(405)
+            if parent and parent not in self._collections():
+                return self._reply(409)
+            self._collections().add(key)
+        self._reply(201)
+
+    def do_PUT(self):
+        key = self._key()
+        data = self._read_body()
+        parent = os.path.dirname(key)
+        with self.store.lock:
+            if parent and parent not in self._collections():
+                if self.server.strict_collections:
+                    return self._reply(409)
+                while parent:
+                    self._collections().add(parent)
+                    parent = os.path.dirname(parent)
+        existed = self.store.get(key) is not None
+        etag = self.store.put(key, data)
+        self._reply(204 if existed else 201, headers={'ETag': f'"{etag}"'})
+
+    def do_GET(self, head=False):
+        entry = self.store.get(self._key())
+        if entry is None:
+            return self._reply(404, head=head)
+        self._reply(200, entry[0], headers=self._object_headers(entry), head=head)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_DELETE(self):
+        key = self._key()
+        if self.store.delete(key):
+            return self._reply(204)
+        with self.store.lock:
+            if key not in self._collections():
+                return self._reply(404)
+            self._collections().discard(key)
+            for child in [k for k in self.store.objects if k.startswith(key + '/')]:
+                del self.store.objects[child]
+        self._reply(204)
+
+    def do_PROPFIND(self):
+        key = self._key()
+        self._read_body()
+        depth = self.headers.get('Depth', '1')
+        with self.store.lock:
+            objects = dict(self.store.objects)
+            collections = set(self._collections())
+        if key and key not in collections and key not in objects:
+            return self._reply(404)
+
+        responses = []
+        if key in objects:
+            responses.append(self._propfind_entry(key, objects[key]))
+        else:
+            responses.append(self._propfind_entry(key, None))
+            if depth != '0':
+                prefix = f"{key}/" if key else ''
+                for name in sorted(collections):
+                    if name.startswith(prefix) and '/' not in name[len(prefix):]:
+                        responses.append(self._propfind_entry(name, None))
+                for name, entry in sorted(objects.items()):
+                    if name.startswith(prefix) and '/' not in name[len(prefix):]:
+                        responses.append(self._propfind_entry(name, entry))
+        body = ('<?xml version="1.0" encoding="utf-8"?><d:multistatus xmlns:d="DAV:">'
+                + ''.join(responses) + '</d:multistatus>').encode('utf-8')
+        self._reply(207, body, 'application/xml; charset=utf-8')
+
+    def _propfind_entry(self, key, entry):
+        href = quote(f"{self.ROOT}/{key}" + ('/' if entry is None else ''))
+        if entry is None:
+            prop = '<d:resourcetype><d:collection/></d:resourcetype>'
+        else:
+            data, etag, mtime = entry
+            prop = (f'<d:resourcetype/><d:getcontentlength>{len(data)}</d:getcontentlength>'
+                    f'<d:getetag>"{etag}"</d:getetag>'
+                    f'<d:getlastmodified>{formatdate(mtime, usegmt=True)}</d:getlastmodified>')
+        return (f'<d:response><d:href>{escape(href)}</d:href><d:propstat><d:prop>{prop}</d:prop>'
+                f'<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>')
+
+
+class EmulatorServer(ThreadingHTTPServer):
+    # 默认的监听队列只有 5，高并发时新连接要等 SYN 重传（约1秒）
+    request_queue_size = 128
+    daemon_threads = True
+
+
+HANDLERS = {'s3': S3Handler, 'qiniu': QiniuHandler, 'webdav': WebDAVHandler}
+# 每个存储提供商对应的模拟器类型
+PROVIDER_EMULATORS = {'aliyun_oss': 's3', 'tencent_cos': 's3', 'qiniu': 'qiniu', 'jianguoyun': 'webdav'}
+
+
+def make_certificate(workdir):
+    """用 openssl 生成 localhost / 127.0.0.1 的自签名证书"""
+    cert = os.path.join(workdir, 'cert.pem')
+    key = os.path.join(workdir, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-keyout', key, '-out', cert, '-subj', '/CN=localhost',
+        '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1',
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+class Emulator:
+    """在后台线程中运行的模拟服务器
+
+    tls=True 时使用自签名证书，并设置 REQUESTS_CA_BUNDLE 让基于 requests 的 SDK 信任它。
+    """
+
+    def __init__(self, kind, tls=True, strict_collections=False, **faults):
+        if kind not in HANDLERS:
+            raise ValueError(f"未知的模拟器类型: {kind}")
+        self.kind = kind
+        self.tls = tls
+        self.strict_collections = strict_collections
+        self.store = ObjectStore()
+        self.faults = FaultSettings(**faults)
+        self.server = None
+        self.ca_bundle = None
+        self._workdir = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def url(self):
+        return f"{'https' if self.tls else 'http'}://127.0.0.1:{self.port}"
+
+    def start(self):
+        handler = type(f'Bound{HANDLERS[self.kind].__name__}', (HANDLERS[self.kind],),
+                       {'store': self.store, 'faults': self.faults})
+        self.server = EmulatorServer(('127.0.0.1', 0), handler)
+        self.server.collections = set()
+        self.server.strict_collections = self.strict_collections
+        if self.tls:
+            self._workdir = tempfile.mkdtemp(prefix='solocloud-emulator-')
+            cert, key = make_certificate(self._workdir)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert, key)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+            self.ca_bundle = os.environ['REQUESTS_CA_BUNDLE'] = cert
+        threading.Thread(target=self.server.serve_forever, name=f'emulator-{self.kind}', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._workdir:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+            self._workdir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def storage_config(self, provider):
+        """返回 (provider, 指向本模拟器的存储配置)"""
+        if PROVIDER_EMULATORS.get(provider) != self.kind:
+            raise ValueError(f"{provider} 不能使用 {self.kind} 模拟器")
+        if provider == 'aliyun_oss':
+            # IP 形式的 endpoint 由 SDK 自动使用路径风格 /<bucket>/<key>
+            config = {'access_key_id': 'bench', 'access_key_secret': 'bench',
+                      'endpoint': self.url, 'bucket_name': BUCKET}
+        elif provider == 'tencent_cos':
+            config = {'secret_id': 'bench', 'secret_key': 'bench', 'region': 'ap-bench',
+                      'bucket_name': f'{BUCKET}-1250000000'}
+        elif provider == 'qiniu':
+            config = {'access_key': 'bench', 'secret_key': 'bench', 'bucket_name': BUCKET,
+                      'domain': f'127.0.0.1:{self.port}'}
+        else:
+            config = {'webdav_url': f'{self.url}/dav', 'username': 'bench', 'password': 'bench'}
+        return provider, config
+
+    def attach(self, provider, storage):
+        """把无法通过配置指向模拟器的 SDK 接到本模拟器上；在第一次使用 storage 之前调用"""
+        if provider == 'tencent_cos':
+            # COS 的域名由 Region 拼出，改为使用自定义域名（路径中不含 bucket）
+            target = getattr(storage, 'storage', storage)
+            original = target._create_client
+            scheme = 'https' if self.tls else 'http'
+            domain = f'127.0.0.1:{self.port}'
+
+            def create_client():
+                client = original()
+                client._conf._domain = domain
+                client._conf._scheme = scheme
+                return client
+
+            target._create_client = create_client
+        elif provider == 'qiniu':
+            # 七牛 SDK 的上传、管理域名是进程级配置；它的 Session 直接发送请求，不读取 REQUESTS_CA_BUNDLE
+            from qiniu import Region, config as qiniu_config
+            from qiniu.http import qn_http_client
+            qn_http_client.session.verify = self.ca_bundle or True
+            url = self.url
+            qiniu_config.set_default(
+                default_zone=Region(up_host=url, up_host_backup=url, io_host=url, rs_host=url, rsf_host=url,
+                                    api_host=url),
+                default_rs_host=url, default_rsf_host=url, default_uc_host=url, default_api_host=url,
+                default_upload_threshold=1 << 40,
+            )
+        return storage
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+JSON序列化基准测试
+对比 Flask 默认编码方式与 api_response 中各可用编码器序列化 1000 行列表数据的耗时，
+以及 fields= 只返回界面所需字段时的耗时
+
+使用方法:
+    python benchmarks/json_encoding_benchmark.py [--rows 1000] [--repeat 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_response import available_encoders, make_encoder, json_default
+
+# 文件网格视图实际使用的字段（与 static/app.js 中 FILE_LIST_FIELDS 一致）
+GRID_FIELDS = ('id', 'original_filename', 'file_type', 'file_size', 'upload_time', 'has_thumbnail')
+
+
+def file_rows(count):
+    """构造与 /api/files 响应相同结构的数据"""
+    now = datetime.utcnow().isoformat()
+    return [{
+        'id': i,
+        'filename': f'{i:032x}.jpg',
+        'original_filename': f'旅行照片_{i}.jpg',
+        'file_type': 'image',
+        'file_size': 1024 * i,
+        'storage_type': 'local',
+        'upload_time': now,
+        'description': '',
+        'thumbnail_path': f'/app/uploads/thumbnails/thumb_{i:032x}.jpg',
+        'has_thumbnail': True,
+    } for i in range(count)]
+
+
+def flask_default(obj):
+    """Flask DefaultJSONProvider 在非调试模式下的编码方式"""
+    return json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON序列化基准测试')
+    parser.add_argument('--rows', type=int, default=1000, help='每次序列化的行数')
+    parser.add_argument('--repeat', type=int, default=200, help='重复次数')
+    args = parser.parse_args()
+
+    full = {'files': file_rows(args.rows), 'total': args.rows, 'pages': 1, 'current_page': 1}
+    sparse = dict(full, files=[{k: row[k] for k in GRID_FIELDS} for row in full['files']])
+
+    encoders = [('flask默认', flask_default)]
+    for name in available_encoders():
+        encoders.append((name, make_encoder(name, json_default)[1]))
+
+    scale = 1000 / args.rows
+    print(f"{args.rows} 行, 重复 {args.repeat} 次, 以下为每 1000 行的平均耗时")
+    print(f"{'编码器':<10}{'全部字段':>14}{'网格字段':>14}{'响应大小(全部/网格)':>26}")
+    for name, encode in encoders:
+        full_time = timeit.timeit(lambda: encode(full), number=args.repeat) / args.repeat * scale
+        sparse_time = timeit.timeit(lambda: encode(sparse), number=args.repeat) / args.repeat * scale
+        print(f"{name:<12}{full_time * 1e6:>10.0f} µs{sparse_time * 1e6:>11.0f} µs"
+              f"{len(encode(full)) / 1024:>14.1f} KB / {len(encode(sparse)) / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+列表接口查询基准测试
+对比完整ORM对象查询与列投影查询在大分页（默认10000行）下的耗时，
+覆盖 list_files、list_notes、get_chat_messages 三个接口使用的查询
+
+使用方法:
+    python benchmarks/list_projection_benchmark.py [--rows 10000] [--note-size 8000]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_env import load_app
+
+
+def seed(appmod, rows, note_size):
+    """写入测试数据"""
+    db = appmod.db
+    user = appmod.User(username='bench', email='bench@SoloCloud.local')
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.commit()
+    now = datetime.utcnow()
+    body = ('SoloCloud 笔记内容 ' * (note_size // 15 + 1))[:note_size]
+    db.session.execute(appmod.Note.__table__.insert(), [
+        {'title': f'笔记 {i}', 'content': body, 'tags': 'bench,note', 'user_id': user.id,
+         'created_time': now, 'updated_time': now} for i in range(rows)
+    ])
+    db.session.execute(appmod.MediaFile.__table__.insert(), [
+        {'filename': f'{i:032x}.jpg', 'original_filename': f'photo_{i}.jpg', 'file_type': 'image',
+         'mime_type': 'image/jpeg', 'file_size': 1024 * i, 'storage_type': 'local',
+         'file_path': f'uploads/images/{i:032x}.jpg', 'thumbnail_path': f'uploads/thumbnails/thumb_{i:032x}.jpg',
+         'upload_time': now, 'description': '', 'user_id': user.id} for i in range(rows)
+    ])
+    db.session.execute(appmod.ChatMessage.__table__.insert(), [
+        {'message_type': 'text', 'content': f'消息 {i} ' * 20, 'created_time': now, 'user_id': user.id}
+        for i in range(rows)
+    ])
+    db.session.commit()
+    return user.id
+
+
+def timed(session, fn, repeat):
+    """返回多次执行的中位耗时；每次执行前清空会话，避免命中身份映射"""
+    samples = []
+    for _ in range(repeat):
+        session.expunge_all()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列表接口查询基准测试')
+    parser.add_argument('--rows', type=int, default=10000, help='每页行数（同时也是测试数据量）')
+    parser.add_argument('--note-size', type=int, default=8000, help='每条笔记正文的字符数')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量的重复次数')
+    args = parser.parse_args()
+
+    appmod, workdir = load_app()
+    MediaFile, Note, ChatMessage = appmod.MediaFile, appmod.Note, appmod.ChatMessage
+    try:
+        with appmod.app.app_context():
+            user_id = seed(appmod, args.rows, args.note_size)
+            limit = args.rows
+
+            cases = {
+                'files': (
+                    lambda: [(f.id, f.original_filename, f.upload_time.isoformat(), f.thumbnail_path)
+                             for f in MediaFile.query.filter_by(user_id=user_id)
+                             .order_by(MediaFile.upload_time.desc()).limit(limit).all()],
+                    lambda: [(f.id, f.original_filename, f.upload_time.isoformat(), f.thumbnail_path)
+                             for f in MediaFile.query.filter_by(user_id=user_id)
+                             .order_by(MediaFile.upload_time.desc())
+                             .with_entities(*appmod.FILE_LIST_FIELDS.columns(appmod.FILE_LIST_FIELDS.fields)).limit(limit).all()],
+                ),
+                'notes': (
+                    lambda: [(n.id, n.content[:200]) for n in Note.query.filter_by(user_id=user_id)
+                             .order_by(Note.updated_time.desc()).limit(limit).all()],
+                    lambda: [(n.id, n.excerpt[:200]) for n in Note.query.filter_by(user_id=user_id)
+                             .order_by(Note.updated_time.desc())
+                             .with_entities(*appmod.NOTE_LIST_FIELDS.columns(appmod.NOTE_LIST_FIELDS.fields)).limit(limit).all()],
+                ),
+                'chat': (
+                    lambda: [(m.id, m.content, m.created_time.isoformat()) for m in
+                             ChatMessage.query.filter_by(user_id=user_id)
+                             .order_by(ChatMessage.created_time.desc()).limit(limit).all()],
+                    lambda: [(m.id, m.content, m.created_time.isoformat()) for m in
+                             ChatMessage.query.filter_by(user_id=user_id)
+                             .order_by(ChatMessage.created_time.desc())
+                             .with_entities(*appmod.CHAT_MESSAGE_LIST_FIELDS.columns(appmod.CHAT_MESSAGE_LIST_FIELDS.fields)).limit(limit).all()],
+                ),
+            }
+
+            print(f"{args.rows} 行/页, 笔记正文 {args.note_size} 字符, 取 {args.repeat} 次中位数")
+            for name, (orm_fetch, projected_fetch) in cases.items():
+                orm = timed(appmod.db.session, orm_fetch, args.repeat)
+                projected = timed(appmod.db.session, projected_fetch, args.repeat)
+                print(f"  {name:<6} ORM {orm * 1000:8.1f} ms   列投影 {projected * 1000:8.1f} ms   "
+                      f"加速 {orm / projected:4.1f}x")
+    finally:
+        os.chdir('/')
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
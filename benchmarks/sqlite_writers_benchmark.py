@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+SQLite 并发写入基准测试
+模拟多个 gunicorn worker 同时写入元数据（类似批量上传），
+对比默认配置与 sqlite_profile 中的生产配置的吞吐量和锁冲突次数
+
+使用方法:
+    python benchmarks/sqlite_writers_benchmark.py [--writers 5] [--transactions 400]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_profile import DEFAULT_SQLITE_PRAGMAS, apply_pragmas
+
+SCHEMA = '''
+CREATE TABLE media_file (
+    id INTEGER PRIMARY KEY,
+    filename VARCHAR(255) NOT NULL,
+    original_filename VARCHAR(255) NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_path VARCHAR(500) NOT NULL,
+    upload_time DATETIME
+)
+'''
+
+
+def writer(db_path, pragmas, transactions, reads_per_write, start_event, result_queue):
+    """单个写入进程：每个事务先读后写，与上传请求的访问模式类似"""
+    conn = sqlite3.connect(db_path, timeout=5)
+    if pragmas:
+        apply_pragmas(conn, pragmas)
+    start_event.wait()
+    committed = locked = 0
+    started = time.perf_counter()
+    for i in range(transactions):
+        try:
+            for _ in range(reads_per_write):
+                conn.execute('SELECT count(*) FROM media_file').fetchone()
+            conn.execute(
+                'INSERT INTO media_file (filename, original_filename, file_size, file_path, upload_time) '
+                "VALUES (?, ?, ?, ?, datetime('now'))",
+                (f'{os.getpid()}_{i}.jpg', f'photo_{i}.jpg', 1024 * i, f'uploads/images/{os.getpid()}_{i}.jpg')
+            )
+            conn.commit()
+            committed += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            conn.rollback()
+            locked += 1
+    result_queue.put((committed, locked, time.perf_counter() - started))
+    conn.close()
+
+
+def run_profile(name, pragmas, writers, transactions, reads_per_write):
+    workdir = tempfile.mkdtemp(prefix='solocloud-sqlite-')
+    db_path = os.path.join(workdir, 'bench.db')
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute(SCHEMA)
+        conn.commit()
+        conn.close()
+
+        start_event = multiprocessing.Event()
+        result_queue = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=writer, args=(db_path, pragmas, transactions, reads_per_write,
+                                                         start_event, result_queue))
+            for _ in range(writers)
+        ]
+        for p in procs:
+            p.start()
+        started = time.perf_counter()
+        start_event.set()
+        results = [result_queue.get() for _ in procs]
+        elapsed = time.perf_counter() - started
+        for p in procs:
+            p.join()
+
+        committed = sum(r[0] for r in results)
+        locked = sum(r[1] for r in results)
+        print(f"{name:<10} 提交 {committed:>6} 个事务, 锁冲突 {locked:>5} 次, "
+              f"耗时 {elapsed:6.2f}s, 吞吐量 {committed / elapsed:8.1f} 事务/秒")
+        return committed / elapsed
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 并发写入基准测试')
+    parser.add_argument('--writers', type=int, default=multiprocessing.cpu_count() * 2 + 1,
+                        help='并发写入进程数（默认与 gunicorn worker 数相同）')
+    parser.add_argument('--transactions', type=int, default=400, help='每个进程的事务数')
+    parser.add_argument('--reads', type=int, default=2, help='每个事务中写入前的读取次数')
+    args = parser.parse_args()
+
+    print(f"{args.writers} 个写入进程, 每个 {args.transactions} 个事务")
+    baseline = run_profile('默认配置', None, args.writers, args.transactions, args.reads)
+    tuned = run_profile('生产配置', DEFAULT_SQLITE_PRAGMAS, args.writers, args.transactions, args.reads)
+    print(f"吞吐量提升: {tuned / baseline:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
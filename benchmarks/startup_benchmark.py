@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+SoloCloud 启动性能基准测试
+测量应用导入耗时、重量级模块是否被提前加载，以及 gunicorn 各 worker 的内存占用(RSS/PSS)
+
+使用方法:
+    python benchmarks/startup_benchmark.py [--workers 3] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['cv2', 'numpy', 'PIL.Image', 'oss2', 'qcloud_cos', 'qiniu']
+
+IMPORT_PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    'import_seconds': elapsed,
+    'rss_kb': rss_kb,
+    'loaded': [m for m in %r if m in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def make_env(workdir):
+    """构造隔离的运行环境，避免污染真实数据目录"""
+    env = os.environ.copy()
+    env.update({
+        'PYTHONPATH': ROOT,
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'data', 'bench.db')}",
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'LOG_FILE': os.path.join(workdir, 'logs', 'SoloCloud.log'),
+    })
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    return env
+
+
+def measure_import(workdir, env, runs):
+    """在全新解释器中多次导入 app，统计耗时"""
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', IMPORT_PROBE], cwd=workdir, env=env,
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    times = [r['import_seconds'] for r in results]
+    print("== 应用导入 ==")
+    print(f"  导入耗时: 中位数 {statistics.median(times) * 1000:.1f} ms, "
+          f"最小 {min(times) * 1000:.1f} ms, 最大 {max(times) * 1000:.1f} ms ({runs} 次)")
+    print(f"  导入后 RSS: {results[-1]['rss_kb'] / 1024:.1f} MB")
+    print(f"  已提前加载的重量级模块: {', '.join(results[-1]['loaded']) or '无'}")
+
+
+def read_memory(pid):
+    """读取进程的 RSS 与 PSS（PSS 按共享页面均摊，更能反映 fork 后的真实占用）"""
+    rss = pss = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1])
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def measure_workers(workdir, env, workers):
+    """启动 gunicorn，请求若干次后统计 master 与各 worker 的内存"""
+    port = free_port()
+    cmd = [
+        sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py'),
+        '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+        '--access-logfile', os.devnull, '--error-logfile', os.path.join(workdir, 'gunicorn.log'),
+        '--pid', os.path.join(workdir, 'gunicorn.pid'), 'app:app',
+    ]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env)
+    try:
+        ready = None
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1).read()
+                ready = time.perf_counter() - started
+                break
+            except OSError:
+                time.sleep(0.1)
+        if ready is None:
+            print("gunicorn 启动失败，详见", os.path.join(workdir, 'gunicorn.log'))
+            return
+        # 让每个 worker 都有机会处理请求
+        for _ in range(workers * 10):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=5).read()
+
+        children = []
+        with open(f'/proc/{proc.pid}/task/{proc.pid}/children') as f:
+            children = [int(pid) for pid in f.read().split()]
+
+        print(f"== gunicorn ({workers} workers) ==")
+        print(f"  启动到首个健康检查响应: {ready * 1000:.0f} ms")
+        rss, pss = read_memory(proc.pid)
+        print(f"  master pid {proc.pid}: RSS {rss / 1024:.1f} MB, PSS {pss / 1024:.1f} MB")
+        total_pss = pss
+        for pid in children:
+            rss, pss = read_memory(pid)
+            total_pss += pss
+            print(f"  worker pid {pid}: RSS {rss / 1024:.1f} MB, PSS {pss / 1024:.1f} MB")
+        print(f"  PSS 合计: {total_pss / 1024:.1f} MB")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SoloCloud 启动性能基准测试')
+    parser.add_argument('--workers', type=int, default=3, help='gunicorn worker 数量')
+    parser.add_argument('--runs', type=int, default=5, help='导入耗时测量次数')
+    parser.add_argument('--skip-gunicorn', action='store_true', help='只测量导入耗时')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='solocloud-startup-')
+    try:
+        env = make_env(workdir)
+        measure_import(workdir, env, args.runs)
+        if not args.skip_gunicorn:
+            measure_workers(workdir, env, args.workers)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+存储客户端复用基准测试
+
+在本机启动 HTTPS WebDAV 模拟器（见 emulators.py，自签名证书），对坚果云（WebDAV）适配器分别测量:
+  before: 每次操作新建客户端（每次都要重新建立TCP和TLS连接）
+  after:  通过 CloudStorageManager 注册表复用同一个客户端（keep-alive 连接池）
+
+使用方法:
+  python benchmarks/storage_client_benchmark.py [--ops 200] [--size 4096]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from emulators import Emulator
+
+
+def run(get_client, local_path, ops):
+    """交替执行上传和删除，返回每次操作的耗时（毫秒）"""
+    timings = []
+    for i in range(ops):
+        remote_path = f'bench/{i}.bin'
+        for operation in ('upload', 'delete'):
+            client = get_client()
+            started = time.perf_counter()
+            if operation == 'upload':
+                ok, message = client.upload_file(local_path, remote_path)
+            else:
+                ok, message = client.delete_file(remote_path)
+            timings.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                raise RuntimeError(f'{operation} 失败: {message}')
+    return timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {name:<8} 平均 {statistics.mean(timings):7.2f} ms   中位数 {statistics.median(timings):7.2f} ms   "
+          f"p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='存储客户端复用基准测试')
+    parser.add_argument('--ops', type=int, default=200, help='上传+删除的轮数')
+    parser.add_argument('--size', type=int, default=4096, help='上传文件大小（字节）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='solocloud-storage-bench-')
+    # 模拟器使用自签名证书，并设置 REQUESTS_CA_BUNDLE 让 requests 信任它
+    with Emulator('webdav', tls=True) as emulator:
+        try:
+            from cloud_storage import CloudStorageManager
+
+            local_path = os.path.join(workdir, 'payload.bin')
+            with open(local_path, 'wb') as f:
+                f.write(os.urandom(args.size))
+
+            provider, config = emulator.storage_config('jianguoyun')
+            manager = CloudStorageManager()
+
+            print(f"WebDAV over HTTPS，{args.ops} 轮上传+删除，文件 {args.size} 字节")
+            before = run(lambda: manager.get_storage_client(provider, config, cached=False), local_path, args.ops)
+            after = run(lambda: manager.get_storage_client(provider, config), local_path, args.ops)
+            report('before', before)
+            report('after', after)
+            print(f"  加速比   {statistics.mean(before) / statistics.mean(after):.1f}x")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+存储吞吐量基准测试
+对每个云存储适配器启动对应的本地模拟器（见 emulators.py），在不同并发数下依次执行
+上传、下载、删除，报告每种操作的吞吐量和 p50/p99 延迟。
+
+默认通过 CloudStorageManager 注册表获取客户端（连接池 + 容错层），与线上的调用路径一致；
+可以注入延迟、限速和故障，观察重试和熔断对吞吐量的影响。
+
+使用方法:
+  python benchmarks/storage_throughput_benchmark.py [--providers aliyun_oss,jianguoyun]
+      [--concurrency 1,8,32] [--ops 200] [--size 65536]
+      [--latency 20] [--jitter 10] [--bandwidth 10] [--error-rate 0.01] [--drop-rate 0] [--no-tls] [--raw]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from emulators import Emulator, PROVIDER_EMULATORS
+
+
+def percentile(values, fraction):
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def run_phase(operation, func, ops, concurrency):
+    """以 concurrency 个线程执行 ops 次 func(i)，返回 (总耗时秒, 每次耗时毫秒列表, 失败数, 第一条错误)"""
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            ok, message = func(i)
+        except Exception as e:
+            ok, message = False, str(e)
+        return (time.perf_counter() - started) * 1000, ok, message
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'bench-{operation}') as executor:
+        results = list(executor.map(timed, range(ops)))
+    elapsed = time.perf_counter() - started
+    failures = [message for _, ok, message in results if not ok]
+    return elapsed, [timing for timing, _, _ in results], len(failures), failures[0] if failures else ''
+
+
+def bench_provider(provider, args, workdir, payload):
+    kind = PROVIDER_EMULATORS[provider]
+    faults = {
+        'latency': args.latency / 1000,
+        'jitter': args.jitter / 1000,
+        'bandwidth': int(args.bandwidth * 1024 * 1024),
+        'error_rate': args.error_rate,
+        'drop_rate': args.drop_rate,
+    }
+    from cloud_storage import CloudStorageManager, STORAGE_POOL_SIZE
+
+    rows = []
+    with Emulator(kind, tls=not args.no_tls, **faults) as emulator:
+        _, config = emulator.storage_config(provider)
+        manager = CloudStorageManager(pool_size=args.pool_size or STORAGE_POOL_SIZE)
+        storage = manager.get_storage_client(provider, config, cached=not args.raw)
+        emulator.attach(provider, storage)
+
+        for concurrency in args.concurrency:
+            prefix = f'bench/c{concurrency}'
+            phases = (
+                ('upload', lambda i: storage.upload_file(payload, f'{prefix}/{i}.bin')),
+                ('download', lambda i: _download(storage, f'{prefix}/{i}.bin', os.path.join(workdir, f'dl-{i}'))),
+                ('delete', lambda i: storage.delete_file(f'{prefix}/{i}.bin')),
+            )
+            for operation, func in phases:
+                requests_before = emulator.store.requests
+                elapsed, timings, failures, error = run_phase(operation, func, args.ops, concurrency)
+                rows.append({
+                    'provider': provider,
+                    'concurrency': concurrency,
+                    'operation': operation,
+                    'ops_per_sec': args.ops / elapsed,
+                    'mb_per_sec': args.ops * args.size / elapsed / 1024 / 1024 if operation != 'delete' else None,
+                    'p50': percentile(timings, 0.50),
+                    'p99': percentile(timings, 0.99),
+                    'failures': failures,
+                    'requests': emulator.store.requests - requests_before,
+                    'error': error,
+                })
+        manager.invalidate()
+    return rows
+
+
+def _download(storage, remote_path, local_path):
+    try:
+        return storage.download_file(remote_path, local_path)
+    finally:
+        if os.path.exists(local_path):
+            os.remove(local_path)
+
+
+def report(rows):
+    print(f"  {'提供商':<12}{'并发':>5}  {'操作':<9}{'ops/s':>9}{'MB/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'失败':>6}{'请求数':>8}")
+    for row in rows:
+        mb = f"{row['mb_per_sec']:9.1f}" if row['mb_per_sec'] is not None else f"{'-':>9}"
+        print(f"  {row['provider']:<14}{row['concurrency']:>5}  {row['operation']:<9}{row['ops_per_sec']:9.1f}{mb}"
+              f"{row['p50']:9.2f}{row['p99']:9.2f}{row['failures']:>6}{row['requests']:>9}")
+        if row['error']:
+            print(f"      首个错误: {row['error'][:120]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='存储吞吐量基准测试（本地模拟器）')
+    parser.add_argument('--providers', default=','.join(PROVIDER_EMULATORS),
+                        help='要测试的存储提供商，逗号分隔（默认: %(default)s）')
+    parser.add_argument('--concurrency', default='1,8,32', help='并发数列表，逗号分隔（默认: %(default)s）')
+    parser.add_argument('--ops', type=int, default=200, help='每个并发数下每种操作的次数')
+    parser.add_argument('--size', type=int, default=64 * 1024, help='对象大小（字节）')
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的固定延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='额外的随机延迟上限（毫秒）')
+    parser.add_argument('--bandwidth', type=float, default=0, help='每个连接的带宽上限（MB/s，0表示不限速）')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回 503 的概率')
+    parser.add_argument('--drop-rate', type=float, default=0, help='直接断开连接的概率')
+    parser.add_argument('--pool-size', type=int, default=0, help='连接池大小（默认使用 STORAGE_POOL_SIZE）')
+    parser.add_argument('--no-tls', action='store_true', help='模拟器使用 HTTP 而不是 HTTPS')
+    parser.add_argument('--raw', action='store_true', help='不经过注册表和容错层，直接使用适配器')
+    args = parser.parse_args()
+    args.concurrency = [int(value) for value in args.concurrency.split(',') if value]
+    providers = [value for value in args.providers.split(',') if value]
+    unknown = [provider for provider in providers if provider not in PROVIDER_EMULATORS]
+    if unknown:
+        parser.error(f"没有对应模拟器的存储提供商: {', '.join(unknown)}")
+
+    # 并发数超过连接池时 urllib3 会为每个多出的连接打印警告
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+
+    workdir = tempfile.mkdtemp(prefix='solocloud-throughput-bench-')
+    try:
+        payload = os.path.join(workdir, 'payload.bin')
+        with open(payload, 'wb') as f:
+            f.write(os.urandom(args.size))
+
+        print(f"对象 {args.size} 字节，每种操作 {args.ops} 次，并发 {args.concurrency}，"
+              f"{'HTTP' if args.no_tls else 'HTTPS'}，延迟 {args.latency}±{args.jitter} ms，"
+              f"带宽 {args.bandwidth or '不限'} MB/s，错误率 {args.error_rate}，断连率 {args.drop_rate}"
+              f"{'，直接使用适配器' if args.raw else ''}")
+        for provider in providers:
+            report(bench_provider(provider, args, workdir, payload))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+进程内缓存工具
+为配置、用户、分享链接等热点数据提供基于版本号失效的进程级缓存
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+class VersionedSnapshotCache:
+    """基于版本号失效的进程级快照缓存
+
+    整份数据由 loader 一次性加载为快照，读取只需一次字典查找。
+    每隔 ttl 秒通过 version_getter 检查一次共享版本号（通常是数据库中的一行），
+    版本号变化时重新加载，从而在多个 gunicorn worker 之间同步失效。
+    """
+
+    def __init__(self, loader: Callable[[], Any], version_getter: Callable[[], Optional[int]], ttl: float = 2.0):
+        self.loader = loader
+        self.version_getter = version_getter
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self):
+        """获取当前快照，必要时检查版本号并重新加载"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.ttl:
+            return snapshot
+
+        with self._lock:
+            # 双重检查，避免并发线程重复加载
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._snapshot
+
+            version = self.version_getter()
+            if self._snapshot is None or version is None or version != self._version:
+                self._snapshot = self.loader()
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """使本进程的快照立即失效，下次读取时重新加载"""
+        with self._lock:
+            self._snapshot = None
+            self._version = None
+            self._checked_at = 0.0
+
+
+class TTLCache:
+    """带过期时间和容量上限的LRU缓存，支持负缓存
+
+    值为 None 的条目视为负缓存（例如不存在的分享令牌），使用较短的 negative_ttl，
+    并单独保存在容量为 negative_maxsize 的LRU中：大量随机key的未命中不会把有效条目挤出缓存。
+    可选的 version_getter 每隔 version_ttl 秒检查一次共享版本号，变化时清空整个缓存，
+    用于在多个 worker 之间传播失效。
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, negative_ttl: float = 30.0,
+                 version_getter: Optional[Callable[[], Optional[int]]] = None, version_ttl: float = 2.0,
+                 negative_maxsize: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.negative_maxsize = max(1, maxsize // 10) if negative_maxsize is None else negative_maxsize
+        self.version_getter = version_getter
+        self.version_ttl = version_ttl
+        self._data = OrderedDict()
+        self._negative = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader: Callable[[Any], Any]):
+        """读取缓存，未命中或已过期时调用 loader(key) 加载并缓存结果（包括 None）"""
+        self._check_version()
+        now = time.monotonic()
+        with self._lock:
+            for data in (self._data, self._negative):
+                entry = data.get(key, self._MISSING)
+                if entry is not self._MISSING and entry[0] > now:
+                    data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+            self.misses += 1
+
+        value = loader(key)
+        self.set(key, value)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """写入缓存，超过容量时淘汰同类中最久未使用的条目"""
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        data, other, maxsize = ((self._negative, self._data, self.negative_maxsize) if value is None
+                                else (self._data, self._negative, self.maxsize))
+        with self._lock:
+            other.pop(key, None)
+            data[key] = (time.monotonic() + ttl, value)
+            data.move_to_end(key)
+            while len(data) > maxsize:
+                data.popitem(last=False)
+
+    def pop(self, key):
+        """删除单个条目"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._negative.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._negative.clear()
+
+    def __len__(self):
+        return len(self._data) + len(self._negative)
+
+    def _check_version(self):
+        if self.version_getter is None or time.monotonic() - self._version_checked_at < self.version_ttl:
+            return
+        version = self.version_getter()
+        with self._lock:
+            if version is None or version != self._version:
+                self._data.clear()
+                self._negative.clear()
+                self._version = version
+            self._version_checked_at = time.monotonic()
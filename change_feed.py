@@ -0,0 +1,86 @@
+"""
+变更日志
+文件、笔记、聊天消息的新增/修改/删除在 flush 时追加到 change_log 表，
+与业务修改处于同一事务，序号单调递增；客户端通过 /api/changes?since=<seq> 增量同步。
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import event, inspect
+
+ACTIONS = ('create', 'update', 'delete')
+
+
+def register_change_tracking(session, change_table, tracked: Dict[type, str],
+                             on_commit: Optional[Callable[[], None]] = None):
+    """在会话上注册 after_flush 钩子，为 tracked 中的模型（模型类 -> 实体名）写变更记录
+
+    变更记录通过当前会话的连接直接插入，随业务修改一起提交或回滚。
+    on_commit 在写入过变更记录的事务提交后调用（用于通知实时推送）。
+    """
+
+    @event.listens_for(session, 'after_flush')
+    def record_changes(session, flush_context):
+        now = datetime.utcnow()
+        rows = []
+        for action, objects in (('create', session.new), ('update', session.dirty), ('delete', session.deleted)):
+            for obj in objects:
+                entity_type = tracked.get(type(obj))
+                if entity_type is None:
+                    continue
+                # dirty 中可能包含只被访问、没有实际修改的对象
+                if action == 'update' and not session.is_modified(obj, include_collections=False):
+                    continue
+                # 已删除对象不能再触发加载，直接读取已加载的属性
+                state = inspect(obj)
+                rows.append({
+                    'entity_type': entity_type,
+                    'entity_id': state.identity[0] if state.identity else obj.id,
+                    'action': action,
+                    'user_id': state.dict.get('user_id') if action == 'delete' else obj.user_id,
+                    'created_time': now,
+                })
+        if rows:
+            rows.sort(key=lambda row: (ACTIONS.index(row['action']), row['entity_type'], row['entity_id']))
+            session.connection().execute(change_table.insert(), rows)
+            session.info['change_log_pending'] = True
+
+    @event.listens_for(session, 'after_commit')
+    def notify_changes(session):
+        if session.info.pop('change_log_pending', False) and on_commit is not None:
+            try:
+                on_commit()
+            except Exception as e:
+                print(f"变更通知失败: {e}")
+
+    @event.listens_for(session, 'after_rollback')
+    def discard_changes(session):
+        session.info.pop('change_log_pending', None)
+
+    return record_changes
+
+
+def append_changes(session, change_table, entity_type: str, entity_ids: Iterable[int], action: str, user_id: int):
+    """为批量 SQL 更新（不经过 ORM flush 的修改）写变更记录，提交后同样通知实时推送"""
+    now = datetime.utcnow()
+    rows = [{
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'action': action,
+        'user_id': user_id,
+        'created_time': now,
+    } for entity_id in sorted(entity_ids)]
+    if rows:
+        session.connection().execute(change_table.insert(), rows)
+        session.info['change_log_pending'] = True
+
+
+def serialize_change(row) -> dict:
+    return {
+        'seq': row.seq,
+        'entity': row.entity_type,
+        'id': row.entity_id,
+        'action': row.action,
+        'time': row.created_time.isoformat(),
+    }
@@ -4,9 +4,40 @@
 """
 
 import os
+import json
+import hashlib
+import threading
+import time
 import mimetypes
 from abc import ABC, abstractmethod
-from typing import Tuple, Optional
+import shutil
+import xml.etree.ElementTree as ET
+from typing import Callable, Tuple, Optional, Iterator, List, Dict
+from urllib.parse import urlparse, unquote, quote
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from storage_resilience import ResilientStorage, TransientStorageError, is_transient, transient_status
+from cache_utils import TTLCache
+
+# 每个worker中每个存储客户端的HTTP连接池大小
+STORAGE_POOL_SIZE = int(os.getenv('STORAGE_POOL_SIZE', '10'))
+# 建立连接和等待响应（两次读取之间）的超时秒数，避免卡住的云端拖住 worker
+STORAGE_CONNECT_TIMEOUT = float(os.getenv('STORAGE_CONNECT_TIMEOUT', '5'))
+STORAGE_READ_TIMEOUT = float(os.getenv('STORAGE_READ_TIMEOUT', '60'))
+# 私有空间下载URL的签名有效期（秒，0表示使用不签名的公开URL）；距过期不足 MARGIN 秒的签名URL不再复用
+STORAGE_SIGNED_URL_EXPIRES = int(os.getenv('STORAGE_SIGNED_URL_EXPIRES', '3600'))
+STORAGE_SIGNED_URL_MARGIN = int(os.getenv('STORAGE_SIGNED_URL_MARGIN', '300'))
+# 批量删除接口单次请求的对象数上限（OSS、COS、七牛均为1000）
+BATCH_DELETE_LIMIT = 1000
+
+# 七牛SDK的超时是进程级的默认配置，导入时设置一次；SDK 直接传给 requests，可以分别指定连接和读取超时
+try:
+    from qiniu import config as qiniu_config
+    qiniu_config.set_default(connection_timeout=(STORAGE_CONNECT_TIMEOUT, STORAGE_READ_TIMEOUT))
+except ImportError:
+    pass
 
 # 云存储提供商枚举
 STORAGE_PROVIDERS = {
@@ -17,11 +48,61 @@ STORAGE_PROVIDERS = {
     'jianguoyun': '坚果云'
 }
 
+def pooled_session(pool_size: int):
+    """带 keep-alive 连接池（每个主机最多 pool_size 个连接）的 requests Session，每个客户端独享一个"""
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def http_error(message: str, status: int) -> Exception:
+    """HTTP 请求失败对应的异常：可重试的状态码（5xx 等）和没有收到响应（七牛SDK 返回 -1）为 TransientStorageError"""
+    return TransientStorageError(message) if transient_status(status) or status < 0 else IOError(message)
+
 class CloudStorageBase(ABC):
     """云存储基类"""
     
-    def __init__(self, config: dict):
+    # 是否支持生成带签名的临时下载URL（私有空间）
+    signs_urls = False
+    
+    def __init__(self, config: dict, pool_size: int = STORAGE_POOL_SIZE):
         self.config = config
+        self.pool_size = pool_size
+        self.timeout = (STORAGE_CONNECT_TIMEOUT, STORAGE_READ_TIMEOUT)
+        self._client_lock = threading.Lock()
+        self._client = None
+        # 签名URL缓存：{remote_path: (url, 签名时间)}，在过期前 STORAGE_SIGNED_URL_MARGIN 秒失效
+        margin = min(STORAGE_SIGNED_URL_MARGIN, STORAGE_SIGNED_URL_EXPIRES // 2)
+        self._signed_urls = TTLCache(maxsize=10000, ttl=max(1, STORAGE_SIGNED_URL_EXPIRES - margin))
+    
+    def _get_client(self):
+        """返回长期复用的SDK客户端，首次使用时创建（线程安全）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+    
+    def _create_client(self):
+        """创建SDK客户端，由子类实现"""
+        return None
+    
+    def close(self):
+        """释放客户端持有的连接池"""
+        client, self._client = self._client, None
+        if client is not None:
+            self._close_client(client)
+    
+    def _close_client(self, client):
+        pass
+    
+    def _failed(self, error: Exception) -> Tuple[bool, str]:
+        """把异常转换为失败结果；可重试的错误（网络错误、超时、5xx）继续抛出，由容错层重试"""
+        if is_transient(error):
+            raise error
+        return False, str(error)
     
     @abstractmethod
     def upload_file(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
@@ -38,6 +119,28 @@ class CloudStorageBase(ABC):
         """获取文件访问URL"""
         pass
     
+    def sign_url(self, remote_path: str, expires: int) -> Optional[str]:
+        """生成 expires 秒内有效的签名下载URL，由支持签名的子类实现"""
+        return None
+    
+    def get_download_url(self, remote_path: str) -> Tuple[Optional[str], int]:
+        """返回 (下载URL, 浏览器可缓存的秒数)
+        
+        支持签名的存储返回签名URL，同一对象的签名URL在缓存中复用，不必每次请求都签名；
+        可缓存秒数为该URL剩余的复用时间，其他情况返回公开URL和 0。
+        """
+        if not self.signs_urls or STORAGE_SIGNED_URL_EXPIRES <= 0:
+            return self.get_file_url(remote_path), 0
+        entry = self._signed_urls.get(remote_path, self._sign_entry)
+        if entry is None:
+            return self.get_file_url(remote_path), 0
+        url, signed_at = entry
+        return url, max(0, int(self._signed_urls.ttl - (time.monotonic() - signed_at)))
+    
+    def _sign_entry(self, remote_path: str):
+        url = self.sign_url(remote_path, STORAGE_SIGNED_URL_EXPIRES)
+        return (url, time.monotonic()) if url else None
+    
     @abstractmethod
     def is_configured(self) -> bool:
         """检查是否已正确配置"""
@@ -47,6 +150,40 @@ class CloudStorageBase(ABC):
     def test_connection(self) -> Tuple[bool, str]:
         """测试存储连接"""
         pass
+    
+    # 以下操作供迁移、校验、清理等维护任务使用：
+    # head_file 在对象不存在时返回 None，其他错误直接抛出异常，便于调用方区分
+    
+    def download_file(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
+        """把对象下载到本地文件"""
+        return False, "该存储不支持下载"
+    
+    @abstractmethod
+    def head_file(self, remote_path: str) -> Optional[dict]:
+        """获取对象元数据 {'key', 'size', 'etag'}，不存在时返回 None"""
+        pass
+    
+    @abstractmethod
+    def list_files(self, prefix: str = '') -> Iterator[dict]:
+        """按前缀列出对象，逐个产出 {'key', 'size', 'etag', 'modified'}（modified 为 Unix 时间戳，未知时为 None）"""
+        pass
+    
+    @abstractmethod
+    def stream_file(self, remote_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """逐块读取对象内容；对象不存在或请求失败时抛出异常"""
+        pass
+    
+    def delete_files(self, remote_paths: List[str]) -> Dict[str, str]:
+        """批量删除（对象不存在视为已删除），返回删除失败的 {remote_path: 错误信息}
+        
+        有批量接口的存储每次请求删除最多 BATCH_DELETE_LIMIT 个对象；整个请求失败时抛出异常。
+        """
+        failed = {}
+        for remote_path in remote_paths:
+            success, message = self.delete_file(remote_path)
+            if not success:
+                failed[remote_path] = message
+        return failed
 
 class LocalStorage(CloudStorageBase):
     """本地存储"""
@@ -62,7 +199,32 @@ class LocalStorage(CloudStorageBase):
                 return True, "删除成功"
             return True, "文件不存在"
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
+    
+    def download_file(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
+        try:
+            shutil.copyfile(remote_path, local_path)
+            return True, "下载成功"
+        except Exception as e:
+            return self._failed(e)
+    
+    def head_file(self, remote_path: str) -> Optional[dict]:
+        try:
+            stat = os.stat(remote_path)
+        except FileNotFoundError:
+            return None
+        return {'key': remote_path, 'size': stat.st_size, 'etag': None}
+    
+    def stream_file(self, remote_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        with open(remote_path, 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+    
+    def list_files(self, prefix: str = '') -> Iterator[dict]:
+        for root, _, files in os.walk(prefix or '.'):
+            for name in files:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                yield {'key': path, 'size': stat.st_size, 'etag': None, 'modified': stat.st_mtime}
     
     def get_file_url(self, remote_path: str) -> str:
         # 本地存储返回None，让Flask直接提供文件
@@ -77,53 +239,96 @@ class LocalStorage(CloudStorageBase):
 class AliyunOSSStorage(CloudStorageBase):
     """阿里云OSS存储"""
     
-    def __init__(self, config: dict):
-        super().__init__(config)
+    signs_urls = True
+    
+    def __init__(self, config: dict, pool_size: int = STORAGE_POOL_SIZE):
+        super().__init__(config, pool_size)
         try:
             import oss2
             self.oss2 = oss2
         except ImportError:
             self.oss2 = None
     
+    def _create_client(self):
+        auth = self.oss2.Auth(
+            self.config['access_key_id'],
+            self.config['access_key_secret']
+        )
+        # 未写协议的 endpoint 按 HTTPS 访问（SDK 默认 HTTP），与 get_file_url 以及签名URL一致
+        endpoint = self.config['endpoint']
+        if '://' not in endpoint:
+            endpoint = f"https://{endpoint}"
+        # 复用带连接池的Session，避免每次操作重新建立TLS连接
+        return self.oss2.Bucket(
+            auth,
+            endpoint,
+            self.config['bucket_name'],
+            session=self.oss2.Session(pool_size=self.pool_size),
+            # SDK 把它作为 requests 的 timeout，传 (连接超时, 读取超时)
+            connect_timeout=self.timeout
+        )
+    
+    def _close_client(self, bucket):
+        bucket.session.session.close()
+    
     def upload_file(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
         if not self.oss2:
             return False, "请安装oss2库: pip install oss2"
         
         try:
-            auth = self.oss2.Auth(
-                self.config['access_key_id'],
-                self.config['access_key_secret']
-            )
-            bucket = self.oss2.Bucket(
-                auth,
-                self.config['endpoint'],
-                self.config['bucket_name']
-            )
+            bucket = self._get_client()
             
             result = bucket.put_object_from_file(remote_path, local_path)
             return result.status == 200, result.request_id
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
     
     def delete_file(self, remote_path: str) -> Tuple[bool, str]:
         if not self.oss2:
             return False, "请安装oss2库"
         
         try:
-            auth = self.oss2.Auth(
-                self.config['access_key_id'],
-                self.config['access_key_secret']
-            )
-            bucket = self.oss2.Bucket(
-                auth,
-                self.config['endpoint'],
-                self.config['bucket_name']
-            )
+            bucket = self._get_client()
             
             result = bucket.delete_object(remote_path)
             return result.status == 204, "删除成功"
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
+    
+    def download_file(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
+        if not self.oss2:
+            return False, "请安装oss2库"
+        
+        try:
+            self._get_client().get_object_to_file(remote_path, local_path)
+            return True, "下载成功"
+        except Exception as e:
+            return self._failed(e)
+    
+    def head_file(self, remote_path: str) -> Optional[dict]:
+        try:
+            result = self._get_client().head_object(remote_path)
+        except self.oss2.exceptions.NotFound:
+            return None
+        return {'key': remote_path, 'size': result.content_length, 'etag': result.etag}
+    
+    def stream_file(self, remote_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        result = self._get_client().get_object(remote_path)
+        yield from iter(lambda: result.read(chunk_size), b'')
+    
+    def delete_files(self, remote_paths: List[str]) -> Dict[str, str]:
+        bucket = self._get_client()
+        failed = {}
+        for start in range(0, len(remote_paths), BATCH_DELETE_LIMIT):
+            keys = remote_paths[start:start + BATCH_DELETE_LIMIT]
+            # 不存在的对象同样出现在已删除列表中
+            deleted = set(bucket.batch_delete_objects(keys).deleted_keys)
+            failed.update((key, '未删除') for key in keys if key not in deleted)
+        return failed
+    
+    def list_files(self, prefix: str = '') -> Iterator[dict]:
+        for obj in self.oss2.ObjectIterator(self._get_client(), prefix=prefix):
+            yield {'key': obj.key, 'size': obj.size, 'etag': obj.etag, 'modified': obj.last_modified}
     
     def get_file_url(self, remote_path: str) -> str:
         # 构建OSS文件访问URL
@@ -131,6 +336,12 @@ class AliyunOSSStorage(CloudStorageBase):
         endpoint = self.config['endpoint'].replace('https://', '').replace('http://', '')
         return f"https://{bucket_name}.{endpoint}/{remote_path}"
     
+    def sign_url(self, remote_path: str, expires: int) -> Optional[str]:
+        if not self.oss2:
+            return None
+        # 签名在本地计算，不发出请求
+        return self._get_client().sign_url('GET', remote_path, expires, slash_safe=True)
+    
     def is_configured(self) -> bool:
         required_keys = ['access_key_id', 'access_key_secret', 'endpoint', 'bucket_name']
         return all(self.config.get(key) and str(self.config.get(key)).strip() for key in required_keys)
@@ -143,15 +354,7 @@ class AliyunOSSStorage(CloudStorageBase):
             return False, "配置信息不完整"
         
         try:
-            auth = self.oss2.Auth(
-                self.config['access_key_id'],
-                self.config['access_key_secret']
-            )
-            bucket = self.oss2.Bucket(
-                auth,
-                self.config['endpoint'],
-                self.config['bucket_name']
-            )
+            bucket = self._get_client()
             
             # 尝试列出bucket信息来测试连接
             bucket_info = bucket.get_bucket_info()
@@ -162,8 +365,10 @@ class AliyunOSSStorage(CloudStorageBase):
 class TencentCOSStorage(CloudStorageBase):
     """腾讯云COS存储"""
     
-    def __init__(self, config: dict):
-        super().__init__(config)
+    signs_urls = True
+    
+    def __init__(self, config: dict, pool_size: int = STORAGE_POOL_SIZE):
+        super().__init__(config, pool_size)
         try:
             from qcloud_cos import CosConfig, CosS3Client
             self.CosConfig = CosConfig
@@ -172,17 +377,27 @@ class TencentCOSStorage(CloudStorageBase):
             self.CosConfig = None
             self.CosS3Client = None
     
+    def _create_client(self):
+        config = self.CosConfig(
+            Region=self.config['region'],
+            SecretId=self.config['secret_id'],
+            SecretKey=self.config['secret_key'],
+            # SDK 把它作为 requests 的 timeout，传 (连接超时, 读取超时)
+            Timeout=self.timeout
+        )
+        # 不传 session 时 SDK 使用进程内所有客户端共享的类级 Session（连接池大小只由第一个客户端决定），
+        # 关闭它会影响正在使用的其他客户端；这里每个客户端使用自己的 Session
+        return self.CosS3Client(config, session=pooled_session(self.pool_size))
+    
+    def _close_client(self, client):
+        client._session.close()
+    
     def upload_file(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
         if not self.CosConfig:
             return False, "请安装cos-python-sdk-v5库: pip install cos-python-sdk-v5"
         
         try:
-            config = self.CosConfig(
-                Region=self.config['region'],
-                SecretId=self.config['secret_id'],
-                SecretKey=self.config['secret_key']
-            )
-            client = self.CosS3Client(config)
+            client = self._get_client()
             
             response = client.upload_file(
                 Bucket=self.config['bucket_name'],
@@ -191,19 +406,14 @@ class TencentCOSStorage(CloudStorageBase):
             )
             return True, "上传成功"
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
     
     def delete_file(self, remote_path: str) -> Tuple[bool, str]:
         if not self.CosConfig:
             return False, "请安装cos-python-sdk-v5库"
         
         try:
-            config = self.CosConfig(
-                Region=self.config['region'],
-                SecretId=self.config['secret_id'],
-                SecretKey=self.config['secret_key']
-            )
-            client = self.CosS3Client(config)
+            client = self._get_client()
             
             client.delete_object(
                 Bucket=self.config['bucket_name'],
@@ -211,13 +421,91 @@ class TencentCOSStorage(CloudStorageBase):
             )
             return True, "删除成功"
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
+    
+    def download_file(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
+        if not self.CosConfig:
+            return False, "请安装cos-python-sdk-v5库"
+        
+        try:
+            response = self._get_client().get_object(
+                Bucket=self.config['bucket_name'],
+                Key=remote_path
+            )
+            response['Body'].get_stream_to_file(local_path)
+            return True, "下载成功"
+        except Exception as e:
+            return self._failed(e)
+    
+    def head_file(self, remote_path: str) -> Optional[dict]:
+        from qcloud_cos.cos_exception import CosServiceError
+        try:
+            response = self._get_client().head_object(
+                Bucket=self.config['bucket_name'],
+                Key=remote_path
+            )
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return None
+            raise
+        return {'key': remote_path, 'size': int(response.get('Content-Length', 0)),
+                'etag': response.get('ETag', '').strip('"')}
+    
+    def stream_file(self, remote_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        response = self._get_client().get_object(
+            Bucket=self.config['bucket_name'],
+            Key=remote_path
+        )
+        stream = response['Body'].get_raw_stream()
+        try:
+            yield from iter(lambda: stream.read(chunk_size), b'')
+        finally:
+            stream.close()
+    
+    def delete_files(self, remote_paths: List[str]) -> Dict[str, str]:
+        client = self._get_client()
+        failed = {}
+        for start in range(0, len(remote_paths), BATCH_DELETE_LIMIT):
+            keys = remote_paths[start:start + BATCH_DELETE_LIMIT]
+            # Quiet 模式只返回删除失败的对象
+            response = client.delete_objects(
+                Bucket=self.config['bucket_name'],
+                Delete={'Object': [{'Key': key} for key in keys], 'Quiet': 'true'}
+            )
+            for error in response.get('Error', []):
+                failed[error['Key']] = f"{error.get('Code')}: {error.get('Message')}"
+        return failed
+    
+    def list_files(self, prefix: str = '') -> Iterator[dict]:
+        marker = ''
+        while True:
+            response = self._get_client().list_objects(
+                Bucket=self.config['bucket_name'],
+                Prefix=prefix,
+                Marker=marker,
+                MaxKeys=1000
+            )
+            for obj in response.get('Contents', []):
+                yield {'key': obj['Key'], 'size': int(obj['Size']), 'etag': obj['ETag'].strip('"'),
+                       'modified': parse_http_time(obj.get('LastModified'))}
+            if response.get('IsTruncated') != 'true':
+                break
+            marker = response.get('NextMarker') or response['Contents'][-1]['Key']
     
     def get_file_url(self, remote_path: str) -> str:
         bucket_name = self.config['bucket_name']
         region = self.config['region']
         return f"https://{bucket_name}.cos.{region}.myqcloud.com/{remote_path}"
     
+    def sign_url(self, remote_path: str, expires: int) -> Optional[str]:
+        if not self.CosConfig:
+            return None
+        return self._get_client().get_presigned_download_url(
+            Bucket=self.config['bucket_name'],
+            Key=remote_path,
+            Expired=expires
+        )
+    
     def is_configured(self) -> bool:
         required_keys = ['secret_id', 'secret_key', 'region', 'bucket_name']
         return all(self.config.get(key) and str(self.config.get(key)).strip() for key in required_keys)
@@ -230,12 +518,7 @@ class TencentCOSStorage(CloudStorageBase):
             return False, "配置信息不完整"
         
         try:
-            config = self.CosConfig(
-                Region=self.config['region'],
-                SecretId=self.config['secret_id'],
-                SecretKey=self.config['secret_key']
-            )
-            client = self.CosS3Client(config)
+            client = self._get_client()
             
             # 尝试获取bucket信息来测试连接
             response = client.head_bucket(Bucket=self.config['bucket_name'])
@@ -246,8 +529,10 @@ class TencentCOSStorage(CloudStorageBase):
 class QiniuStorage(CloudStorageBase):
     """七牛云存储"""
     
-    def __init__(self, config: dict):
-        super().__init__(config)
+    signs_urls = True
+    
+    def __init__(self, config: dict, pool_size: int = STORAGE_POOL_SIZE):
+        super().__init__(config, pool_size)
         try:
             from qiniu import Auth, put_file, BucketManager
             self.qiniu_auth = Auth
@@ -256,48 +541,124 @@ class QiniuStorage(CloudStorageBase):
         except ImportError:
             self.qiniu_auth = None
     
+    def _create_client(self):
+        # 七牛SDK内部使用进程级的 requests Session，这里复用 Auth、BucketManager 和下载用的 Session
+        auth = self.qiniu_auth(
+            self.config['access_key'],
+            self.config['secret_key']
+        )
+        return auth, self.BucketManager(auth), pooled_session(self.pool_size)
+    
+    def _close_client(self, client):
+        client[2].close()
+    
     def upload_file(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
         if not self.qiniu_auth:
             return False, "请安装qiniu库: pip install qiniu"
         
         try:
-            auth = self.qiniu_auth(
-                self.config['access_key'],
-                self.config['secret_key']
-            )
+            auth = self._get_client()[0]
             token = auth.upload_token(self.config['bucket_name'], remote_path)
             
             ret, info = self.put_file(token, remote_path, local_path)
             if info.status_code == 200:
                 return True, "上传成功"
             else:
-                return False, f"上传失败: {info.text_body}"
+                return self._failed(http_error(f"上传失败: {info.text_body}", info.status_code))
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
     
     def delete_file(self, remote_path: str) -> Tuple[bool, str]:
         if not self.qiniu_auth:
             return False, "请安装qiniu库"
         
         try:
-            auth = self.qiniu_auth(
-                self.config['access_key'],
-                self.config['secret_key']
-            )
-            bucket_manager = self.BucketManager(auth)
+            bucket_manager = self._get_client()[1]
             
             ret, info = bucket_manager.delete(self.config['bucket_name'], remote_path)
             if info.status_code == 200:
                 return True, "删除成功"
             else:
-                return False, f"删除失败: {info.text_body}"
+                return self._failed(http_error(f"删除失败: {info.text_body}", info.status_code))
+        except Exception as e:
+            return self._failed(e)
+    
+    def download_file(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
+        if not self.qiniu_auth:
+            return False, "请安装qiniu库"
+        
+        try:
+            session = self._get_client()[2]
+            url = self.sign_url(remote_path, 3600)
+            with session.get(url, stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    return self._failed(http_error(f"下载失败: {response.status_code}", response.status_code))
+                with open(local_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+            return True, "下载成功"
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
+    
+    def stream_file(self, remote_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        session = self._get_client()[2]
+        url = self.sign_url(remote_path, 3600)
+        with session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise http_error(f"读取文件失败: HTTP {response.status_code}", response.status_code)
+            yield from response.iter_content(chunk_size=chunk_size)
+    
+    def delete_files(self, remote_paths: List[str]) -> Dict[str, str]:
+        from qiniu import build_batch_delete
+        bucket_manager = self._get_client()[1]
+        failed = {}
+        for start in range(0, len(remote_paths), BATCH_DELETE_LIMIT):
+            keys = remote_paths[start:start + BATCH_DELETE_LIMIT]
+            ret, info = bucket_manager.batch(build_batch_delete(self.config['bucket_name'], keys))
+            # 298 表示部分操作失败（SDK 不解析其响应体），逐项结果与请求顺序一致
+            if info.status_code == 298:
+                ret = json.loads(info.text_body)
+            if info.status_code not in (200, 298) or not isinstance(ret, list):
+                raise http_error(f"批量删除失败: {info.status_code} {info.text_body}", info.status_code)
+            for key, item in zip(keys, ret):
+                if item.get('code') not in (200, 612):  # 612: 资源不存在
+                    failed[key] = f"{item.get('code')}: {item.get('data', {}).get('error')}"
+        return failed
+    
+    def head_file(self, remote_path: str) -> Optional[dict]:
+        ret, info = self._get_client()[1].stat(self.config['bucket_name'], remote_path)
+        if info.status_code == 612:  # 七牛: 资源不存在
+            return None
+        if info.status_code != 200:
+            raise http_error(f"获取文件信息失败: {info.status_code} {info.text_body}", info.status_code)
+        return {'key': remote_path, 'size': ret['fsize'], 'etag': ret['hash']}
+    
+    def list_files(self, prefix: str = '') -> Iterator[dict]:
+        bucket_manager = self._get_client()[1]
+        marker = None
+        while True:
+            ret, eof, info = bucket_manager.list(self.config['bucket_name'], prefix=prefix or None,
+                                                 marker=marker, limit=1000)
+            if info.status_code != 200:
+                raise http_error(f"列出文件失败: {info.status_code} {info.text_body}", info.status_code)
+            for item in ret.get('items', []):
+                # putTime 的单位是 100 纳秒
+                yield {'key': item['key'], 'size': item['fsize'], 'etag': item['hash'],
+                       'modified': item['putTime'] / 10000000 if item.get('putTime') else None}
+            marker = ret.get('marker')
+            if eof or not marker:
+                break
     
     def get_file_url(self, remote_path: str) -> str:
         domain = self.config['domain']
         return f"https://{domain}/{remote_path}"
     
+    def sign_url(self, remote_path: str, expires: int) -> Optional[str]:
+        if not self.qiniu_auth:
+            return None
+        # 私有空间需要签名URL，公开空间忽略签名参数
+        return self._get_client()[0].private_download_url(self.get_file_url(quote(remote_path)), expires=expires)
+    
     def is_configured(self) -> bool:
         required_keys = ['access_key', 'secret_key', 'bucket_name', 'domain']
         return all(self.config.get(key) and str(self.config.get(key)).strip() for key in required_keys)
@@ -310,11 +671,7 @@ class QiniuStorage(CloudStorageBase):
             return False, "配置信息不完整"
         
         try:
-            auth = self.qiniu_auth(
-                self.config['access_key'],
-                self.config['secret_key']
-            )
-            bucket_manager = self.BucketManager(auth)
+            bucket_manager = self._get_client()[1]
             
             # 尝试获取bucket信息来测试连接
             ret, info = bucket_manager.buckets()
@@ -328,14 +685,23 @@ class QiniuStorage(CloudStorageBase):
 class JianguoyunStorage(CloudStorageBase):
     """坚果云存储（WebDAV）"""
     
-    def __init__(self, config: dict):
-        super().__init__(config)
+    def __init__(self, config: dict, pool_size: int = STORAGE_POOL_SIZE):
+        super().__init__(config, pool_size)
         try:
             import requests
             self.requests = requests
         except ImportError:
             self.requests = None
     
+    def _create_client(self):
+        # 带 keep-alive 连接池的 Session，认证信息只设置一次
+        session = pooled_session(self.pool_size)
+        session.auth = (self.config['username'], self.config['password'])
+        return session
+    
+    def _close_client(self, session):
+        session.close()
+    
     def upload_file(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
         if not self.requests:
             return False, "请安装requests库: pip install requests"
@@ -344,18 +710,14 @@ class JianguoyunStorage(CloudStorageBase):
             url = f"{self.config['webdav_url']}/{remote_path}"
             
             with open(local_path, 'rb') as f:
-                response = self.requests.put(
-                    url,
-                    data=f,
-                    auth=(self.config['username'], self.config['password'])
-                )
+                response = self._get_client().put(url, data=f, timeout=self.timeout)
             
             if response.status_code in [200, 201, 204]:
                 return True, "上传成功"
             else:
-                return False, f"上传失败: {response.status_code}"
+                return self._failed(http_error(f"上传失败: {response.status_code}", response.status_code))
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
     
     def delete_file(self, remote_path: str) -> Tuple[bool, str]:
         if not self.requests:
@@ -364,17 +726,81 @@ class JianguoyunStorage(CloudStorageBase):
         try:
             url = f"{self.config['webdav_url']}/{remote_path}"
             
-            response = self.requests.delete(
-                url,
-                auth=(self.config['username'], self.config['password'])
-            )
+            response = self._get_client().delete(url, timeout=self.timeout)
             
             if response.status_code in [200, 204]:
                 return True, "删除成功"
             else:
-                return False, f"删除失败: {response.status_code}"
+                return self._failed(http_error(f"删除失败: {response.status_code}", response.status_code))
         except Exception as e:
-            return False, str(e)
+            return self._failed(e)
+    
+    def download_file(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
+        if not self.requests:
+            return False, "请安装requests库"
+        
+        try:
+            url = f"{self.config['webdav_url']}/{remote_path}"
+            with self._get_client().get(url, stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    return self._failed(http_error(f"下载失败: {response.status_code}", response.status_code))
+                with open(local_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+            return True, "下载成功"
+        except Exception as e:
+            return self._failed(e)
+    
+    def stream_file(self, remote_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        url = f"{self.config['webdav_url']}/{remote_path}"
+        with self._get_client().get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise http_error(f"读取文件失败: HTTP {response.status_code}", response.status_code)
+            yield from response.iter_content(chunk_size=chunk_size)
+    
+    def delete_files(self, remote_paths: List[str]) -> Dict[str, str]:
+        # WebDAV 没有批量删除，在连接池大小的线程数内并发删除
+        session = self._get_client()
+        
+        def delete(remote_path):
+            try:
+                response = session.delete(f"{self.config['webdav_url']}/{remote_path}", timeout=self.timeout)
+            except Exception as e:
+                return str(e)
+            if response.status_code in (200, 204, 404):
+                return None
+            return f"删除失败: {response.status_code}"
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(self.pool_size, len(remote_paths)))) as executor:
+            errors = executor.map(delete, remote_paths)
+            return {path: error for path, error in zip(remote_paths, errors) if error is not None}
+    
+    def head_file(self, remote_path: str) -> Optional[dict]:
+        response = self._get_client().head(f"{self.config['webdav_url']}/{remote_path}", timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return {'key': remote_path, 'size': int(response.headers.get('Content-Length', 0)),
+                'etag': response.headers.get('ETag', '').strip('"') or None}
+    
+    def list_files(self, prefix: str = '') -> Iterator[dict]:
+        # 很多 WebDAV 服务（包括坚果云）不支持 Depth: infinity，逐级列出目录
+        pending = [prefix.rstrip('/')]
+        while pending:
+            directory = pending.pop()
+            url = f"{self.config['webdav_url']}/{directory}/" if directory else f"{self.config['webdav_url']}/"
+            response = self._get_client().request('PROPFIND', url, headers={'Depth': '1'}, timeout=self.timeout)
+            if response.status_code == 404:
+                continue
+            if response.status_code != 207:
+                raise http_error(f"列出文件失败: HTTP {response.status_code}", response.status_code)
+            for entry in parse_propfind(response.content, self.config['webdav_url']):
+                if entry['key'].rstrip('/') == directory:
+                    continue
+                if entry.pop('is_dir'):
+                    pending.append(entry['key'].rstrip('/'))
+                else:
+                    yield entry
     
     def get_file_url(self, remote_path: str) -> str:
         # 坚果云需要通过分享链接访问，这里返回WebDAV路径
@@ -393,10 +819,9 @@ class JianguoyunStorage(CloudStorageBase):
         
         try:
             # 尝试发送PROPFIND请求来测试WebDAV连接
-            response = self.requests.request(
+            response = self._get_client().request(
                 'PROPFIND',
                 self.config['webdav_url'],
-                auth=(self.config['username'], self.config['password']),
                 timeout=10
             )
             
@@ -407,10 +832,38 @@ class JianguoyunStorage(CloudStorageBase):
         except Exception as e:
             return False, f"连接失败: {str(e)}"
 
+def parse_http_time(value: Optional[str]) -> Optional[float]:
+    """把 ISO 8601（COS 列表）或 RFC 1123（WebDAV getlastmodified）格式的时间转换为 Unix 时间戳，无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        if value[:4].isdigit():
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def parse_propfind(body: bytes, base_url: str) -> list:
+    """解析 PROPFIND 的 207 响应，返回 [{'key', 'size', 'etag', 'modified', 'is_dir'}]，key 为相对 base_url 的路径"""
+    base_path = urlparse(base_url).path.rstrip('/') + '/'
+    namespace = {'d': 'DAV:'}
+    entries = []
+    for response in ET.fromstring(body).findall('d:response', namespace):
+        href = unquote(urlparse(response.findtext('d:href', '', namespace)).path)
+        key = href[len(base_path):] if href.startswith(base_path) else href.lstrip('/')
+        prop = response.find('d:propstat/d:prop', namespace)
+        is_dir = prop is not None and prop.find('d:resourcetype/d:collection', namespace) is not None
+        size = prop.findtext('d:getcontentlength', '0', namespace) if prop is not None else '0'
+        etag = prop.findtext('d:getetag', '', namespace) if prop is not None else ''
+        modified = prop.findtext('d:getlastmodified', '', namespace) if prop is not None else ''
+        entries.append({'key': key, 'size': int(size or 0), 'etag': etag.strip('"') or None,
+                        'modified': parse_http_time(modified), 'is_dir': is_dir})
+    return entries
+
 class CloudStorageManager:
     """云存储管理器"""
     
-    def __init__(self):
+    def __init__(self, pool_size: int = STORAGE_POOL_SIZE):
         self.providers = {
             'local': LocalStorage,
             'aliyun_oss': AliyunOSSStorage,
@@ -418,30 +871,82 @@ class CloudStorageManager:
             'qiniu': QiniuStorage,
             'jianguoyun': JianguoyunStorage
         }
-    
-    def get_storage_client(self, provider: str, config: dict) -> Optional[CloudStorageBase]:
-        """获取存储客户端"""
+        self.pool_size = pool_size
+        # 客户端注册表：{provider: (配置摘要, 客户端)}，每个提供商只保留当前配置对应的一个客户端
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        # 可选的配置来源 provider -> dict（应用设置为数据库中的存储设置），其中非空的值覆盖环境变量
+        self.config_source: Optional[Callable[[str], dict]] = None
+    
+    @staticmethod
+    def config_hash(config: dict) -> str:
+        return hashlib.sha1(json.dumps(config or {}, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    
+    def get_storage_client(self, provider: str, config: dict, cached: bool = True) -> Optional[CloudStorageBase]:
+        """获取存储客户端；默认从注册表复用，配置变化时自动替换为新客户端"""
         if provider not in self.providers:
             return None
         
         storage_class = self.providers[provider]
-        return storage_class(config)
+        if not cached:
+            return storage_class(config, self.pool_size)
+        
+        digest = self.config_hash(config)
+        with self._lock:
+            if self._pid != os.getpid():
+                # fork 后不复用父进程的连接
+                self._clients = {}
+                self._pid = os.getpid()
+            entry = self._clients.get(provider)
+            if entry is not None and entry[0] == digest:
+                return entry[1]
+            client = storage_class(config, self.pool_size)
+            if provider != 'local':
+                # 复用的客户端都经过容错层（超时重试、熔断）；临时客户端用于测试连接，直接返回真实结果
+                client = ResilientStorage(client, provider)
+            self._clients[provider] = (digest, client)
+        
+        if entry is not None:
+            entry[1].close()
+        return client
+    
+    def invalidate(self, provider: Optional[str] = None):
+        """丢弃缓存的客户端（存储设置修改后调用），provider 为空时清空全部"""
+        with self._lock:
+            if provider is None:
+                entries, self._clients = list(self._clients.values()), {}
+            else:
+                entry = self._clients.pop(provider, None)
+                entries = [entry] if entry else []
+        for _, client in entries:
+            client.close()
     
     def test_storage_connection(self, provider: str, config: dict) -> Tuple[bool, str]:
-        """测试存储连接"""
-        storage_client = self.get_storage_client(provider, config)
+        """测试存储连接（使用临时客户端，不进入注册表）"""
+        storage_client = self.get_storage_client(provider, config, cached=False)
         if not storage_client:
             return False, f"不支持的存储提供商: {provider}"
         
-        return storage_client.test_connection()
+        try:
+            return storage_client.test_connection()
+        finally:
+            storage_client.close()
     
     def get_storage(self, provider: str) -> Optional[CloudStorageBase]:
-        """获取当前配置的存储实例"""
-        # 从环境变量获取配置
-        config = self._get_provider_config(provider)
+        """获取当前配置的存储实例；配置变化后按新的配置摘要替换客户端"""
+        config = self.get_provider_config(provider)
         return self.get_storage_client(provider, config)
     
-    def _get_provider_config(self, provider: str) -> dict:
+    def get_provider_config(self, provider: str) -> dict:
+        """存储提供商配置：环境变量，被 config_source 中非空的值覆盖"""
+        config = self.get_env_config(provider)
+        if self.config_source is not None and provider != 'local':
+            overrides = self.config_source(provider) or {}
+            config.update((key, value) for key, value in overrides.items() if value)
+        return config
+    
+    def get_env_config(self, provider: str) -> dict:
         """从环境变量获取存储提供商配置"""
         if provider == 'local':
             return {}
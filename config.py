@@ -1,5 +1,6 @@
 import os
 from datetime import timedelta
+from sqlite_profile import DEFAULT_SQLITE_PRAGMAS, is_sqlite_memory_uri
 
 def is_docker():
     """简单检测是否在Docker中运行"""
@@ -14,8 +15,99 @@ class Config:
         'sqlite:////app/data/SoloCloud.db' if is_docker() else f'sqlite:///{os.path.abspath("data/SoloCloud.db")}'
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # SQLite 连接级 PRAGMA（WAL、synchronous=NORMAL 等），非SQLite数据库自动忽略
+    SQLITE_PRAGMAS = dict(DEFAULT_SQLITE_PRAGMAS,
+                          busy_timeout=int(os.environ.get('SQLITE_BUSY_TIMEOUT', '10000')))
+    # 连接池配置 - 每个worker一个连接池；内存数据库使用StaticPool，不设置池大小
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': 30,
+    } if not is_sqlite_memory_uri(SQLALCHEMY_DATABASE_URI) else {}
+    
     MAX_CONTENT_LENGTH = 1024 * 1024 * 1024  # 1GB max file size
     
+    # JSON编码器: auto | orjson | msgspec | stdlib（auto 按顺序选择可用的最快编码器）
+    JSON_ENCODER = os.environ.get('JSON_ENCODER') or 'auto'
+    
+    # JSON响应压缩 - 超过该字节数的响应按 Accept-Encoding 使用 brotli/gzip 压缩
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    
+    # 分享链接访问计数 - 批量写库间隔（秒）与有上限链接每次预占的次数
+    SHARE_COUNTER_FLUSH_INTERVAL = float(os.environ.get('SHARE_COUNTER_FLUSH_INTERVAL', '5'))
+    SHARE_COUNTER_RESERVATION_BLOCK = int(os.environ.get('SHARE_COUNTER_RESERVATION_BLOCK', '10'))
+    
+    # 分享链接解析缓存 - 有效链接/无效令牌的缓存时间（秒）与最大条目数
+    SHARE_LINK_CACHE_TTL = float(os.environ.get('SHARE_LINK_CACHE_TTL', '60'))
+    SHARE_LINK_NEGATIVE_CACHE_TTL = float(os.environ.get('SHARE_LINK_NEGATIVE_CACHE_TTL', '30'))
+    SHARE_LINK_CACHE_SIZE = int(os.environ.get('SHARE_LINK_CACHE_SIZE', '10000'))
+    SHARE_LINK_NEGATIVE_CACHE_SIZE = int(os.environ.get('SHARE_LINK_NEGATIVE_CACHE_SIZE', '1000'))
+    
+    # 分享链接清理 - 后台执行间隔（秒，0表示不启用）、过期宽限天数、每批行数、可选的归档文件
+    SHARE_SWEEPER_INTERVAL = float(os.environ.get('SHARE_SWEEPER_INTERVAL', '0'))
+    SHARE_SWEEPER_GRACE_DAYS = int(os.environ.get('SHARE_SWEEPER_GRACE_DAYS', '7'))
+    SHARE_SWEEPER_BATCH_SIZE = int(os.environ.get('SHARE_SWEEPER_BATCH_SIZE', '500'))
+    SHARE_SWEEPER_ARCHIVE = os.environ.get('SHARE_SWEEPER_ARCHIVE', '')
+    # 变更日志保留天数（由清理任务删除更早的记录）
+    CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', '90'))
+    
+    # 频率限制 - 计数存储在独立的SQLite文件中，所有worker共享；限流值为每分钟请求数
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE') or (
+        '/app/data/ratelimit.db' if is_docker() else os.path.abspath('data/ratelimit.db')
+    )
+    RATE_LIMIT_MAX_ENTRIES = int(os.environ.get('RATE_LIMIT_MAX_ENTRIES', '10000'))
+    LOGIN_RATE_LIMIT = int(os.environ.get('LOGIN_RATE_LIMIT', '20'))
+    URL_UPLOAD_RATE_LIMIT = int(os.environ.get('URL_UPLOAD_RATE_LIMIT', '10'))
+    # 每个IP每分钟最多查询多少次未缓存的分享令牌（已缓存的有效链接不受限制）
+    SHARE_LINK_MISS_RATE_LIMIT = int(os.environ.get('SHARE_LINK_MISS_RATE_LIMIT', '30'))
+    
+    # 密码哈希 - 算法: pbkdf2 | scrypt | bcrypt；成本为空时使用算法默认值
+    # （pbkdf2 为迭代次数，scrypt 为 log2(N)，bcrypt 为 rounds）
+    PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER') or 'pbkdf2'
+    PASSWORD_HASH_COST = int(os.environ['PASSWORD_HASH_COST']) if os.environ.get('PASSWORD_HASH_COST') else None
+    
+    # API令牌 - 签名密钥（默认使用 SECRET_KEY）、默认与最长有效期（秒）
+    API_TOKEN_SECRET = os.environ.get('API_TOKEN_SECRET')
+    API_TOKEN_DEFAULT_TTL = int(os.environ.get('API_TOKEN_DEFAULT_TTL', str(30 * 86400)))
+    API_TOKEN_MAX_TTL = int(os.environ.get('API_TOKEN_MAX_TTL', str(365 * 86400)))
+    
+    # 实时事件推送（SSE）- 跨worker通知文件、轮询间隔、心跳间隔和单个连接最长持续时间（秒）
+    EVENT_NOTIFY_FILE = os.environ.get('EVENT_NOTIFY_FILE') or (
+        '/app/data/events.notify' if is_docker() else os.path.abspath('data/events.notify')
+    )
+    EVENT_POLL_INTERVAL = float(os.environ.get('EVENT_POLL_INTERVAL', '0.5'))
+    EVENT_HEARTBEAT_INTERVAL = float(os.environ.get('EVENT_HEARTBEAT_INTERVAL', '15'))
+    EVENT_STREAM_MAX_DURATION = float(os.environ.get('EVENT_STREAM_MAX_DURATION', '300'))
+    # 是否启用实时推送：sync worker 中每个长连接会占用一整个进程，默认只在异步 worker 下启用
+    LIVE_UPDATES_ENABLED = os.environ.get(
+        'LIVE_UPDATES_ENABLED', str(os.environ.get('GUNICORN_WORKER_CLASS', 'sync') != 'sync')
+    ).lower() == 'true'
+    
+    # 冷热分层存储 - 本地磁盘容量预算（MB，0表示不启用分层）、后台执行间隔（秒，0表示不在后台执行）
+    TIER_LOCAL_CAPACITY_MB = int(os.environ.get('TIER_LOCAL_CAPACITY_MB', '0'))
+    TIER_INTERVAL = float(os.environ.get('TIER_INTERVAL', '0'))
+    # 超过多少天未访问的本地文件降级到云存储；最近多少小时内访问至少多少次（衰减后）的云端文件升级回本地
+    TIER_COLD_DAYS = int(os.environ.get('TIER_COLD_DAYS', '30'))
+    TIER_HOT_HOURS = int(os.environ.get('TIER_HOT_HOURS', '24'))
+    TIER_PROMOTE_MIN_ACCESSES = int(os.environ.get('TIER_PROMOTE_MIN_ACCESSES', '3'))
+    # 每次最多迁移的文件数；每次执行后访问次数乘以该系数（越小越看重近期访问）
+    TIER_BATCH_SIZE = int(os.environ.get('TIER_BATCH_SIZE', '50'))
+    TIER_ACCESS_DECAY = float(os.environ.get('TIER_ACCESS_DECAY', '0.5'))
+    # 云存储对象本地读穿缓存 - 缓存目录与容量上限（MB，0表示不启用，直接重定向到云存储URL）
+    OBJECT_CACHE_DIR = os.environ.get('OBJECT_CACHE_DIR') or (
+        '/app/data/object_cache' if is_docker() else os.path.abspath('data/object_cache')
+    )
+    OBJECT_CACHE_MAX_MB = int(os.environ.get('OBJECT_CACHE_MAX_MB', '0'))
+    # 回收站 - 删除的文件保留天数（0表示下次清理时永久删除），后台清理间隔（秒，0表示不启动）和每批处理的文件数
+    TRASH_RETENTION_DAYS = float(os.environ.get('TRASH_RETENTION_DAYS', '30'))
+    TRASH_PURGE_INTERVAL = float(os.environ.get('TRASH_PURGE_INTERVAL', '300'))
+    TRASH_PURGE_BATCH_SIZE = int(os.environ.get('TRASH_PURGE_BATCH_SIZE', '1000'))
+    # 文件访问统计批量写库间隔（秒）
+    FILE_ACCESS_FLUSH_INTERVAL = float(os.environ.get('FILE_ACCESS_FLUSH_INTERVAL', '5'))
+    
     # 上传配置 - 环境变量优先，否则自动检测
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or (
         '/app/uploads' if is_docker() else 'uploads'
@@ -24,6 +116,11 @@ class Config:
     # 存储配置
     STORAGE_PROVIDER = os.environ.get('STORAGE_PROVIDER') or 'local'
     
+    # 系统配置缓存 - 每隔多少秒检查一次配置版本号（多worker间同步）
+    CONFIG_CACHE_TTL = float(os.environ.get('CONFIG_CACHE_TTL', '2'))
+    # 用户身份缓存 - 每隔多少秒检查一次用户版本号
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '5'))
+    
     # 会话配置 - 自动适应HTTP/HTTPS
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     SESSION_COOKIE_HTTPONLY = True
@@ -55,6 +152,7 @@ class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     WTF_CSRF_ENABLED = False
 
 # 配置映射
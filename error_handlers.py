@@ -98,16 +98,21 @@ def init_error_handlers(app):
         error_id = str(uuid.uuid4())[:8]
         log_error(error, error_id, "Rate Limit Exceeded")
         
+        # 保留限流器给出的 Retry-After
+        headers = {}
+        if getattr(error, 'retry_after', None) is not None:
+            headers['Retry-After'] = str(error.retry_after)
+        
         if request.is_json:
             return jsonify({
                 'error': 'Rate Limit Exceeded',
                 'message': '请求过于频繁，请稍后再试',
                 'error_id': error_id
-            }), 429
+            }), 429, headers
         
         return render_template('errors/429.html',
                              error_id=error_id,
-                             message='请求过于频繁，请稍后再试'), 429
+                             message='请求过于频繁，请稍后再试'), 429, headers
     
     @app.errorhandler(500)
     def internal_server_error(error):
@@ -0,0 +1,149 @@
+"""
+实时事件推送（Server-Sent Events）
+提交包含变更日志的事务后会更新一个通知文件的修改时间；每个 worker 中的 EventHub
+后台线程轮询该文件（只是一次 stat，不查库），发现变化后读取新的变更日志并分发给本 worker 的订阅者。
+配合 gevent worker 使用时，空闲连接不会占用同步 worker。
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+def touch(path: str):
+    """更新通知文件的修改时间，通知所有 worker 有新的变更"""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'a'):
+            pass
+        os.utime(path)
+
+
+class Subscription:
+    """一个 SSE 连接的事件队列；队列满时标记为溢出，由连接通知客户端重新同步"""
+
+    def __init__(self, user_id: int, maxsize: int = 256):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout: float) -> Optional[dict]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub:
+    """进程内的事件分发中心
+
+    fetch(since_seq) 返回序号大于 since_seq 的变更（字典，包含 seq 和 user_id），
+    latest() 返回当前最大序号。后台线程在首次订阅时于当前进程中启动（fork 安全）。
+    """
+
+    def __init__(self, notify_path: str, fetch: Callable[[int], List[dict]], latest: Callable[[], int],
+                 poll_interval: float = 0.5, fallback_interval: float = 10.0):
+        self.notify_path = notify_path
+        self.fetch = fetch
+        self.latest = latest
+        self.poll_interval = poll_interval
+        self.fallback_interval = fallback_interval
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Subscription] = {}
+        self._pid = None
+        self._last_seq = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        self._ensure_thread()
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers[id(subscription)] = subscription
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.pop(id(subscription), None)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def dispatch(self, events: List[dict]):
+        """把事件分发给对应用户的订阅者"""
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for event in events:
+            for subscription in subscribers:
+                if subscription.user_id == event['user_id']:
+                    subscription.put(event)
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # fork 之后父进程的订阅者和线程都不属于当前进程
+            self._pid = os.getpid()
+            self._subscribers = {}
+            self._last_seq = self.latest()
+            thread = threading.Thread(target=self._run, name='event-hub', daemon=True)
+            thread.start()
+
+    def _mtime(self):
+        try:
+            return os.stat(self.notify_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _run(self):
+        last_mtime = self._mtime()
+        last_check = time.monotonic()
+        while True:
+            time.sleep(self.poll_interval)
+            if not self._subscribers:
+                continue
+            mtime = self._mtime()
+            # 通知文件没有变化时不查库；每隔 fallback_interval 兜底检查一次（如通知文件不可写）
+            if mtime == last_mtime and time.monotonic() - last_check < self.fallback_interval:
+                continue
+            last_mtime = mtime
+            last_check = time.monotonic()
+            try:
+                while True:
+                    events = self.fetch(self._last_seq)
+                    if not events:
+                        break
+                    self._last_seq = events[-1]['seq']
+                    self.dispatch(events)
+            except Exception as e:
+                print(f"读取变更事件失败: {e}")
+
+
+def format_event(event: Optional[dict] = None, name: Optional[str] = None, event_id=None,
+                 retry: Optional[int] = None, comment: Optional[str] = None) -> str:
+    """格式化一条 SSE 消息"""
+    lines = []
+    if comment is not None:
+        lines.append(f': {comment}')
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if name is not None:
+        lines.append(f'event: {name}')
+    if event is not None:
+        lines.append('data: ' + json.dumps(event, ensure_ascii=False, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
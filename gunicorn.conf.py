@@ -2,10 +2,20 @@
 import os
 import multiprocessing
 
+# worker 类型：sync（默认）或 gevent。
+# sync worker 中实时推送（/api/events）的每个长连接会占用一整个进程，因此不启用实时推送（见 LIVE_UPDATES_ENABLED）；
+# gevent 中长连接只占用一个协程，但 SQLite 等待锁、登录时的密码哈希、生成缩略图都会阻塞同一 worker 的所有请求，
+# 需要实时推送时再通过 GUNICORN_WORKER_CLASS=gevent 启用
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+if worker_class == 'gevent':
+    # preload_app 会在 master 中导入应用，必须在此之前打补丁，否则应用创建的锁和线程不是协程友好的
+    from gevent import monkey
+    monkey.patch_all()
+
 # 服务器配置
 bind = "0.0.0.0:8080"
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
 worker_connections = 1000
 timeout = 600  # 增加到10分钟，支持大文件上传
 keepalive = 2
@@ -39,6 +49,12 @@ pidfile = "/app/logs/solocloud.pid"
 # 临时目录
 tmp_upload_dir = None
 
+def on_starting(server):
+    # preload_app 模式下应用已在 master 中加载，在 fork worker 之前完成一次性数据库初始化
+    from app import bootstrap
+    bootstrap()
+    server.log.info("SoloCloud bootstrap finished")
+
 def when_ready(server):
     server.log.info("SoloCloud server is ready. Listening on: %s", server.address)
 
@@ -50,6 +66,19 @@ def pre_fork(server, worker):
 
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+    # 丢弃从master继承的连接池（close=False 不会关闭父进程仍在使用的连接）
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # 可选的分享链接后台清理（SHARE_SWEEPER_INTERVAL > 0 时启用，多个worker通过文件锁互斥）
+    from sweeper import start_background_sweeper
+    start_background_sweeper()
+    # 可选的冷热分层（TIER_INTERVAL > 0 且设置了 TIER_LOCAL_CAPACITY_MB 时启用）
+    from tiering import start_background_tiering
+    start_background_tiering()
+    # 回收站清理（TRASH_PURGE_INTERVAL > 0 时启用，默认开启）
+    from purge import start_background_purge
+    start_background_purge()
 
 def post_worker_init(worker):
     worker.log.info("Worker initialized (pid: %s)", worker.pid)
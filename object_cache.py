@@ -0,0 +1,296 @@
+"""
+云存储对象的本地读穿缓存
+首次请求时从云存储逐块读取，一边返回给客户端一边写入本地缓存目录，之后的请求直接读本地磁盘。
+  - 容量上限：按文件修改时间近似 LRU（命中时更新修改时间），超出上限时淘汰最久未使用的对象
+  - 请求合并：同一对象同时只有一个请求回源，进程内的其他请求等待其完成后读缓存；
+    其他 worker 通过独占创建的 .part 文件得知对象正在下载
+  - 统计命中、未命中、合并、淘汰次数
+缓存目录由所有 worker 共享，各 worker 在写入后累计用量，定期扫描目录校准。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ObjectCache:
+    """有容量上限的本地对象缓存"""
+
+    def __init__(self, directory: str, max_bytes: int, wait_timeout: float = 60.0,
+                 rescan_interval: float = 60.0, touch_interval: float = 60.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self.rescan_interval = rescan_interval
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._usage = 0
+        self._last_scan = 0.0
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'uncached': 0, 'errors': 0,
+                       'evictions': 0, 'evicted_bytes': 0, 'stored_bytes': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def path_for(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def lookup(self, key: str) -> Optional[str]:
+        """已缓存时返回本地路径，并更新其最近使用时间"""
+        path = self.path_for(key)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        # 修改时间即 LRU 时间戳；频繁命中的对象不必每次都改写元数据
+        if time.time() - mtime > self.touch_interval:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+        return path
+
+    def open(self, key: str, opener: Callable[[], Iterator[bytes]], expected_size: Optional[int] = None,
+             stream: bool = True) -> Tuple[str, object]:
+        """读取对象，返回 ('path', 缓存文件路径) 或 ('stream', 可迭代的数据块)
+
+        未命中时由 opener() 回源读取。stream 为 True 时返回边读边缓存的数据流，
+        为 False 时先完整写入缓存再返回路径（用于需要 Range 的请求）。回源失败时抛出异常。
+        """
+        path = self.lookup(key)
+        if path is not None:
+            self._count('hits')
+            return 'path', path
+
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            # 同一进程中已有请求在回源，等它写完后读缓存
+            self._count('coalesced')
+            event.wait(self.wait_timeout)
+            path = self.lookup(key)
+            if path is not None:
+                return 'path', path
+            self._count('uncached')
+            return 'stream', opener()
+
+        self._count('misses')
+        try:
+            fill = self._claim(key, self.path_for(key), opener, expected_size)
+        except Exception:
+            self._release(key)
+            raise
+        if fill is None:
+            # 另一个 worker 正在下载同一对象
+            self._release(key)
+            path = self._wait_for_other_worker(key)
+            if path is not None:
+                self._count('coalesced')
+                return 'path', path
+            self._count('uncached')
+            return 'stream', opener()
+        if stream:
+            return 'stream', fill
+        for _ in fill:
+            pass
+        fill.close()
+        path = self.lookup(key)
+        if path is None:
+            raise IOError('写入缓存失败')
+        return 'path', path
+
+    def _release(self, key: str):
+        with self._lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _claim(self, key, path, opener, expected_size) -> Optional['_FillStream']:
+        """独占创建 .part 文件并开始回源；其他 worker 正在下载时返回 None"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_path = f"{path}.part"
+        for _ in range(2):
+            try:
+                fd = os.open(part_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                break
+            except FileExistsError:
+                try:
+                    stale = time.time() - os.stat(part_path).st_mtime > self.wait_timeout
+                except FileNotFoundError:
+                    continue
+                if not stale:
+                    return None
+                # 下载进程已退出留下的残留文件
+                try:
+                    os.remove(part_path)
+                except FileNotFoundError:
+                    pass
+        else:
+            return None
+        fill = _FillStream(self, key, path, part_path, os.fdopen(fd, 'wb'), expected_size)
+        try:
+            fill.start(opener)
+        except Exception:
+            self._count('errors')
+            fill.close()
+            raise
+        return fill
+
+    def _wait_for_other_worker(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        part_path = f"{path}.part"
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            found = self.lookup(key)
+            if found is not None:
+                return found
+            if not os.path.exists(part_path):
+                return self.lookup(key)
+            time.sleep(0.1)
+        return None
+
+    def _stored(self, nbytes: int):
+        with self._lock:
+            self._usage += nbytes
+            self._stats['stored_bytes'] += nbytes
+            due = self._usage > self.max_bytes or time.monotonic() - self._last_scan > self.rescan_interval
+        if due:
+            self.evict()
+
+    def scan(self):
+        """扫描缓存目录，返回 [(修改时间, 大小, 路径)] 与总字节数"""
+        entries = []
+        total = 0
+        if not os.path.isdir(self.directory):
+            return entries, total
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith('.part') or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        """淘汰最久未使用的对象，直到用量降到上限的 90% 以下；其他 worker 正在淘汰时跳过"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.evict.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            entries, total = self.scan()
+            evictions = evicted_bytes = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * 0.9
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        continue
+                    total -= size
+                    evictions += 1
+                    evicted_bytes += size
+        with self._lock:
+            self._usage = total
+            self._last_scan = time.monotonic()
+            self._stats['evictions'] += evictions
+            self._stats['evicted_bytes'] += evicted_bytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._stats)
+            result['usage_bytes'] = self._usage
+        result['max_bytes'] = self.max_bytes
+        lookups = result['hits'] + result['misses'] + result['coalesced']
+        result['hit_ratio'] = round((result['hits'] + result['coalesced']) / lookups, 4) if lookups else 0
+        return result
+
+
+class _FillStream:
+    """边返回边写入缓存的数据流；完整读完并且大小一致时才发布到缓存
+
+    WSGI 服务器在响应结束（包括客户端中途断开）时会调用 close()，在这里清理临时文件并唤醒等待的请求。
+    """
+
+    def __init__(self, cache: ObjectCache, key: str, path: str, part_path: str, file, expected_size):
+        self.cache = cache
+        self.key = key
+        self.path = path
+        self.part_path = part_path
+        self.file = file
+        self.expected_size = expected_size
+        self.written = 0
+        self.complete = False
+        self.closed = False
+        self._chunks = None
+        self._first = b''
+
+    def start(self, opener):
+        """读取第一块数据，使回源失败在返回响应之前就能发现"""
+        self._chunks = iter(opener())
+        self._first = next(self._chunks, b'')
+
+    def __iter__(self):
+        chunks = self._chunks
+        chunk = self._first
+        self._first = b''
+        while True:
+            if chunk:
+                self.file.write(chunk)
+                self.written += len(chunk)
+                yield chunk
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                break
+        self.complete = True
+        # 读完即发布，不必等服务器调用 close()，等待中的请求可以尽早读缓存
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.file.close()
+            if self.complete and (self.expected_size is None or self.written == self.expected_size):
+                os.replace(self.part_path, self.path)
+                self.cache._stored(self.written)
+            else:
+                if self.complete:
+                    self.cache._count('errors')
+                os.remove(self.part_path)
+        except OSError:
+            pass
+        finally:
+            close = getattr(self._chunks, 'close', None)
+            if close is not None:
+                close()
+            self.cache._release(self.key)
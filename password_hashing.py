@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+可配置的密码哈希
+支持 pbkdf2 / scrypt（Werkzeug 实现）和 bcrypt，成本参数可调；
+校验时按已存储哈希的格式识别算法，旧哈希仍然有效，登录成功后可透明升级为当前配置。
+使用方法:
+  python password_hashing.py --target-ms 250            # 为所有算法校准成本参数
+  python password_hashing.py --scheme bcrypt --target-ms 100
+"""
+import argparse
+import time
+from typing import Optional
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+try:
+    import bcrypt
+except ImportError:
+    bcrypt = None
+
+SCHEMES = ('pbkdf2', 'scrypt', 'bcrypt')
+
+# 各算法的默认成本：pbkdf2 为迭代次数，scrypt 为 log2(N)，bcrypt 为 rounds
+DEFAULT_COSTS = {
+    'pbkdf2': DEFAULT_PBKDF2_ITERATIONS,
+    'scrypt': 15,
+    'bcrypt': 12,
+}
+
+# 校准时允许的成本范围
+COST_LIMITS = {
+    'pbkdf2': (10000, 10000000),
+    'scrypt': (10, 20),
+    'bcrypt': (4, 16),
+}
+
+
+def identify(stored_hash: str) -> tuple:
+    """解析已存储哈希的 (算法, 成本)，无法识别时返回 (None, None)"""
+    if not stored_hash:
+        return None, None
+    if stored_hash.startswith(('$2a$', '$2b$', '$2y$')):
+        return 'bcrypt', int(stored_hash[4:6])
+    method = stored_hash.split('$', 1)[0]
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        # pbkdf2:sha256[:iterations]
+        return 'pbkdf2', int(parts[2]) if len(parts) > 2 else DEFAULT_PBKDF2_ITERATIONS
+    if parts[0] == 'scrypt':
+        # scrypt[:n:r:p]
+        n = int(parts[1]) if len(parts) > 1 else 2 ** 15
+        return 'scrypt', n.bit_length() - 1
+    return None, None
+
+
+class PasswordHasher:
+    """按配置的算法和成本生成哈希；校验兼容所有支持的算法"""
+
+    def __init__(self, scheme: str = 'pbkdf2', cost: Optional[int] = None):
+        if scheme not in SCHEMES:
+            raise ValueError(f'不支持的密码哈希算法: {scheme}')
+        if scheme == 'bcrypt' and bcrypt is None:
+            raise ValueError('使用 bcrypt 需要安装 bcrypt 库')
+        self.scheme = scheme
+        self.cost = cost or DEFAULT_COSTS[scheme]
+
+    def hash(self, password: str) -> str:
+        if self.scheme == 'bcrypt':
+            return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.cost)).decode('ascii')
+        if self.scheme == 'scrypt':
+            return generate_password_hash(password, f'scrypt:{2 ** self.cost}:8:1')
+        return generate_password_hash(password, f'pbkdf2:sha256:{self.cost}')
+
+    def verify(self, password: str, stored_hash: str) -> bool:
+        scheme, _ = identify(stored_hash)
+        if scheme == 'bcrypt':
+            if bcrypt is None:
+                return False
+            return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('ascii'))
+        return check_password_hash(stored_hash, password)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """已存储的哈希是否与当前配置的算法或成本不一致"""
+        return identify(stored_hash) != (self.scheme, self.cost)
+
+
+def measure(scheme: str, cost: int, rounds: int = 3) -> float:
+    """测量一次哈希的耗时（毫秒，取多次中的最小值）"""
+    hasher = PasswordHasher(scheme, cost)
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hasher.hash('calibration-password')
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate(scheme: str, target_ms: float) -> tuple:
+    """在当前机器上选出耗时不超过 target_ms 的最大成本，返回 (成本, 实测毫秒)"""
+    low, high = COST_LIMITS[scheme]
+    if scheme == 'pbkdf2':
+        # 耗时与迭代次数成正比，按基准测量结果线性换算，取整到千次
+        base = 100000
+        per_iteration = measure(scheme, base) / base
+        cost = int(target_ms / per_iteration) // 1000 * 1000
+        cost = max(low, min(high, cost))
+        return cost, measure(scheme, cost)
+
+    # scrypt / bcrypt 的成本是指数级的，逐级增加直到超过目标
+    cost, elapsed = low, measure(scheme, low)
+    while cost < high:
+        next_elapsed = measure(scheme, cost + 1)
+        if next_elapsed > target_ms:
+            break
+        cost, elapsed = cost + 1, next_elapsed
+    return cost, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SoloCloud 密码哈希成本校准工具')
+    parser.add_argument('--scheme', choices=SCHEMES, help='只校准指定算法（默认全部）')
+    parser.add_argument('--target-ms', type=float, default=250, help='单次哈希的目标耗时（默认: %(default)s 毫秒）')
+    args = parser.parse_args()
+
+    schemes = [args.scheme] if args.scheme else [s for s in SCHEMES if s != 'bcrypt' or bcrypt is not None]
+    print(f"⏱️  目标耗时: {args.target_ms:.0f} ms")
+    for scheme in schemes:
+        cost, elapsed = calibrate(scheme, args.target_ms)
+        print(f"  {scheme:<7} PASSWORD_HASH_COST={cost:<8} 实测 {elapsed:.1f} ms")
+    print("\n💡 在 .env 中设置 PASSWORD_HASHER 和 PASSWORD_HASH_COST，用户下次登录时自动升级已存储的哈希")
+
+
+if __name__ == '__main__':
+    main()
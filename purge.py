@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+回收站清理任务 - 永久删除回收站中已到期（purge_at 已过）的文件
+  - 云端对象按存储提供商分组，通过批量删除接口删除（每次请求最多 BATCH_DELETE_LIMIT 个对象）
+  - 然后删除本地文件和缩略图，最后在一个事务中删除数据库记录和分享链接
+  - 删除失败的文件推迟 PURGE_RETRY_DELAY 后重试，不影响同批其他文件
+对象不存在视为已删除，重复执行是安全的。
+使用方法:
+  python purge.py             # 执行一次
+  python purge.py --dry-run   # 只列出到期的文件
+默认由 gunicorn worker 每 TRASH_PURGE_INTERVAL 秒在后台执行
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, MediaFile, ShareLink, CacheVersion, storage_manager
+from background_jobs import start_periodic
+
+# 删除失败的文件推迟多久后重试
+PURGE_RETRY_DELAY = timedelta(hours=1)
+
+
+def due_files(now, batch_size):
+    """已到期的文件（只查询清理需要的列）"""
+    return db.session.query(
+        MediaFile.id, MediaFile.storage_type, MediaFile.file_path, MediaFile.thumbnail_path,
+        MediaFile.remote_storage, MediaFile.remote_path, MediaFile.file_size
+    ).filter(MediaFile.purge_at <= now).order_by(MediaFile.purge_at, MediaFile.id).limit(batch_size).all()
+
+
+def delete_cloud_objects(rows):
+    """按存储提供商批量删除云端对象，返回 {文件ID: 错误信息}"""
+    objects = defaultdict(lambda: defaultdict(list))  # 提供商 -> 对象名 -> 引用它的文件ID
+    for row in rows:
+        if row.storage_type != 'local':
+            objects[row.storage_type][row.file_path].append(row.id)
+        # 分层存储保留的云端副本
+        if row.remote_storage and row.remote_path:
+            objects[row.remote_storage][row.remote_path].append(row.id)
+
+    failed = {}
+    for provider, paths in objects.items():
+        storage = storage_manager.get_storage(provider)
+        if not storage or not storage.is_configured():
+            errors = dict.fromkeys(paths, f'存储提供商 {provider} 不可用')
+        else:
+            try:
+                errors = storage.delete_files(list(paths))
+            except Exception as e:
+                # 整个请求失败（包括熔断），这一组文件全部推迟重试
+                errors = dict.fromkeys(paths, str(e))
+        for path, message in errors.items():
+            for file_id in paths[path]:
+                failed.setdefault(file_id, f'{provider}: {message}')
+    return failed
+
+
+def delete_local_files(rows, failed):
+    """删除本地文件和缩略图（已不存在视为成功），失败的文件记入 failed"""
+    for row in rows:
+        if row.id in failed:
+            # 云端对象还没删掉，保留缩略图等下次一起删除
+            continue
+        paths = [row.thumbnail_path]
+        if row.storage_type == 'local':
+            paths.append(row.file_path)
+        for path in paths:
+            if not path:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                failed.setdefault(row.id, f'local: {e}')
+
+
+def delete_records(file_ids, now):
+    """删除数据库记录和分享链接；只删除仍处于到期状态的文件"""
+    media_table = MediaFile.__table__
+    share_table = ShareLink.__table__
+    deleted = 0
+    for start in range(0, len(file_ids), 500):
+        chunk = file_ids[start:start + 500]
+        db.session.execute(share_table.delete().where(share_table.c.file_id.in_(chunk)))
+        deleted += db.session.execute(media_table.delete().where(
+            media_table.c.id.in_(chunk), media_table.c.purge_at <= now
+        )).rowcount
+    return deleted
+
+
+def postpone(file_ids, now):
+    """删除失败的文件推迟重试"""
+    table = MediaFile.__table__
+    for start in range(0, len(file_ids), 500):
+        db.session.execute(table.update().where(
+            table.c.id.in_(file_ids[start:start + 500]), table.c.purge_at <= now
+        ).values(purge_at=now + PURGE_RETRY_DELAY))
+
+
+def run_purge(batch_size=None, dry_run=False):
+    """清理所有已到期的文件（每批 batch_size 个），返回统计结果字典"""
+    if batch_size is None:
+        batch_size = app.config.get('TRASH_PURGE_BATCH_SIZE', 1000)
+    batch_size = max(1, batch_size)
+
+    started = time.monotonic()
+    now = datetime.utcnow()
+    result = {'purged': 0, 'bytes': 0, 'batches': 0, 'failed': [], 'dry_run': dry_run}
+    if dry_run:
+        rows = due_files(now, batch_size)
+        result['due'] = [row.id for row in rows]
+        result['bytes'] = sum(row.file_size or 0 for row in rows)
+        return result
+
+    while True:
+        rows = due_files(now, batch_size)
+        if not rows:
+            break
+        failed = delete_cloud_objects(rows)
+        delete_local_files(rows, failed)
+
+        done = [row.id for row in rows if row.id not in failed]
+        if done:
+            result['purged'] += delete_records(done, now)
+            result['bytes'] += sum(row.file_size or 0 for row in rows if row.id not in failed)
+            # 已缓存的分享链接解析结果中可能还有这些文件
+            CacheVersion.bump('share_link')
+        if failed:
+            postpone(sorted(failed), now)
+            result['failed'].extend({'id': file_id, 'error': message} for file_id, message in sorted(failed.items()))
+        db.session.commit()
+        result['batches'] += 1
+        # 失败的文件已推迟，不会在下一批中再次出现
+        if len(rows) < batch_size:
+            break
+
+    result['elapsed'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def log_result(result):
+    """有删除或失败时记录日志"""
+    if result['purged'] or result['failed']:
+        app.logger.info(f"回收站清理完成: 删除 {result['purged']} 个文件 {result['bytes']} 字节，"
+                        f"失败 {len(result['failed'])} 个")
+
+
+def start_background_purge(interval=None):
+    """在当前进程中启动后台清理线程；interval 为 0 时不启动"""
+    if interval is None:
+        interval = app.config.get('TRASH_PURGE_INTERVAL', 300)
+    if not interval or interval <= 0:
+        return None
+    return start_periodic(app, 'purge', interval, run_purge, log_result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SoloCloud 回收站清理工具')
+    parser.add_argument('--batch-size', type=int, default=app.config.get('TRASH_PURGE_BATCH_SIZE', 1000),
+                        help='每批删除的文件数（默认: %(default)s）')
+    parser.add_argument('--dry-run', action='store_true', help='只列出到期的文件')
+    args = parser.parse_args()
+
+    print("🗑️  正在清理回收站...")
+    with app.app_context():
+        result = run_purge(batch_size=args.batch_size, dry_run=args.dry_run)
+
+    if result['dry_run']:
+        print(f"📋 已到期的文件（最多 {args.batch_size} 个）: {result['due']}，共 {result['bytes']} 字节")
+        return
+    print(f"✅ 永久删除 {result['purged']} 个文件，释放 {result['bytes']} 字节，"
+          f"{result['batches']} 批，耗时 {result['elapsed']} 秒")
+    for failure in result['failed']:
+        print(f"❌ 文件 {failure['id']} 删除失败，稍后重试: {failure['error']}")
+
+
+if __name__ == '__main__':
+    main()
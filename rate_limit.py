@@ -0,0 +1,186 @@
+"""
+跨进程频率限制
+计数保存在独立的 SQLite 文件中，由所有 gunicorn worker 共享。
+使用滑动窗口计数（当前窗口计数 + 上一窗口按剩余比例加权），每个key只占一行，
+检查和计数都是一次主键查找；过期条目按TTL清理，条目数超过上限时按最近访问时间淘汰。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+
+# allowed: 本次是否放行；count: 当前窗口内（加权）计数；remaining: 剩余次数；retry_after: 需等待的秒数
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'count', 'remaining', 'retry_after'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit (
+    key TEXT PRIMARY KEY,
+    window_start REAL NOT NULL,
+    current INTEGER NOT NULL,
+    previous INTEGER NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0,
+    expires_at REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_rate_limit_expires_at ON rate_limit (expires_at);
+CREATE INDEX IF NOT EXISTS ix_rate_limit_last_seen ON rate_limit (last_seen);
+"""
+
+
+class RateLimiter:
+    """基于 SQLite 的滑动窗口频率限制器
+
+    path 为共享的数据库文件；每个线程持有自己的连接，fork 后自动重新连接。
+    每写入 maintenance_interval 次清理一次过期条目，并把条目数控制在 max_entries 以内。
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, maintenance_interval: int = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self.maintenance_interval = maintenance_interval
+        self._local = threading.local()
+        self._writes = 0
+
+    def hit(self, key: str, limit: int, window: float, block: float = 0) -> RateLimitResult:
+        """记录一次请求；超过 limit 时拒绝且不计数。block > 0 时达到上限后封禁 block 秒"""
+        return self._update(key, limit, window, block)
+
+    def peek(self, key: str, limit: int, window: float) -> RateLimitResult:
+        """只查询当前状态，不计数"""
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT window_start, current, previous, blocked_until FROM rate_limit WHERE key = ?', (key,)
+        ).fetchone()
+        return self._evaluate(row, limit, window, now)[0]
+
+    def reset(self, key: str):
+        """清除某个key的计数和封禁"""
+        conn = self._connection()
+        conn.execute('DELETE FROM rate_limit WHERE key = ?', (key,))
+
+    def _update(self, key, limit, window, block):
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT window_start, current, previous, blocked_until FROM rate_limit WHERE key = ?', (key,)
+            ).fetchone()
+            result, window_start, current, previous, blocked_until = self._evaluate(row, limit, window, now)
+            if result.allowed:
+                current += 1
+                count = result.count + 1
+                if block and count >= limit:
+                    blocked_until = now + block
+                result = RateLimitResult(True, count, max(0, limit - count),
+                                         max(0.0, blocked_until - now))
+            elif not result.allowed and block and blocked_until <= now:
+                blocked_until = now + block
+                result = result._replace(retry_after=block)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limit '
+                '(key, window_start, current, previous, blocked_until, expires_at, last_seen) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, window_start, current, previous, blocked_until,
+                 max(window_start + 2 * window, blocked_until), now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._writes += 1
+        if self._writes % self.maintenance_interval == 0:
+            self.evict()
+        return result
+
+    @staticmethod
+    def _evaluate(row, limit, window, now):
+        """根据存储的计数计算当前状态，返回 (结果, 窗口起点, 当前计数, 上一窗口计数, 封禁截止时间)"""
+        window_start = (now // window) * window
+        current = previous = 0
+        blocked_until = 0.0
+        if row is not None:
+            stored_start, stored_current, stored_previous, blocked_until = row
+            if stored_start == window_start:
+                current, previous = stored_current, stored_previous
+            elif stored_start == window_start - window:
+                previous = stored_current
+
+        if blocked_until > now:
+            return (RateLimitResult(False, limit, 0, blocked_until - now),
+                    window_start, current, previous, blocked_until)
+
+        elapsed = (now - window_start) / window
+        count = int(previous * (1 - elapsed)) + current
+        if count >= limit:
+            # 上一窗口的权重随时间线性下降，估算计数回落到 limit 以下需要等待的时间
+            window_left = window_start + window - now
+            if current >= limit or previous == 0:
+                retry_after = window_left
+            else:
+                retry_after = min(window_left, (1 - (limit - current) / previous) * window - (now - window_start))
+            return (RateLimitResult(False, count, 0, max(retry_after, 1.0)),
+                    window_start, current, previous, blocked_until)
+        return (RateLimitResult(True, count, limit - count, 0.0),
+                window_start, current, previous, blocked_until)
+
+    def evict(self):
+        """删除过期条目；仍超过 max_entries 时淘汰最久未访问的条目"""
+        conn = self._connection()
+        conn.execute('DELETE FROM rate_limit WHERE expires_at < ?', (time.time(),))
+        excess = conn.execute('SELECT COUNT(*) FROM rate_limit').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM rate_limit WHERE key IN '
+                '(SELECT key FROM rate_limit ORDER BY last_seen LIMIT ?)', (excess,)
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None：自动提交，需要原子读改写时手动 BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # 计数数据丢失无害，不需要每次提交都刷盘
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+
+def client_ip() -> str:
+    """限流使用的客户端地址（ProxyFix 已处理 X-Forwarded-For）"""
+    return request.remote_addr or 'unknown'
+
+
+def rate_limit(limiter: RateLimiter, limit: int, window: float, scope: Optional[str] = None,
+               key_func: Callable[[], str] = client_ip, methods=None, block: float = 0):
+    """频率限制装饰器：超过限制时返回 429（带 Retry-After）
+
+    methods 指定只对哪些请求方法计数，例如 ('POST',)。
+    """
+    def decorator(f):
+        name = scope or f.__name__
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if methods is None or request.method in methods:
+                result = limiter.hit(f'{name}:{key_func()}', limit, window, block)
+                if not result.allowed:
+                    raise TooManyRequests(retry_after=int(result.retry_after) + 1)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+存储对账工具 - 找出数据库、本地磁盘和云存储之间不一致的文件
+  孤儿文件: 上传目录或存储桶中存在、但没有任何 MediaFile/ChatMessage 记录引用的文件
+            （上传到云存储失败后留下的本地文件、已删除文件的缩略图、没有删掉的云端对象等）
+  缺失文件: 数据库记录引用、但实际不存在的文件（只报告，不修改数据库）
+先逐目录遍历上传目录、按页列出存储桶，再按主键分页读取数据库，都写入临时 SQLite 索引后用 SQL 求差集，
+内存占用与文件数量无关。最近 --min-age 小时内修改过的文件可能正在上传，不算作孤儿。
+回收站中的文件仍被记录引用，由清理任务（purge.py）负责删除。
+使用方法:
+  python reconcile.py                          # 只报告（不删除任何文件）
+  python reconcile.py --reclaim                # 删除孤儿文件和云端对象
+  python reconcile.py --providers local,qiniu  # 只检查指定的存储
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, MediaFile, ChatMessage, UPLOAD_FOLDER, storage_manager, get_current_storage_provider
+from cloud_storage import BATCH_DELETE_LIMIT
+
+# 上传到云存储的对象名都以这些子目录开头（<子目录>/<文件名>），存储桶中只检查这些前缀
+CLOUD_PREFIXES = ('images/', 'videos/', 'audio/', 'archives/', 'code/', 'files/')
+# 写入索引和读取数据库时每批的行数
+INDEX_BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE stored (
+    location TEXT NOT NULL, key TEXT NOT NULL, size INTEGER NOT NULL, modified REAL,
+    PRIMARY KEY (location, key)
+) WITHOUT ROWID;
+CREATE TABLE referenced (
+    location TEXT NOT NULL, key TEXT NOT NULL, record TEXT NOT NULL,
+    PRIMARY KEY (location, key)
+) WITHOUT ROWID;
+"""
+
+
+class ReconcileIndex:
+    """临时 SQLite 索引：实际存在的文件（stored）和数据库引用的文件（referenced）"""
+
+    def __init__(self, directory=None):
+        fd, self.path = tempfile.mkstemp(prefix='solocloud-reconcile-', suffix='.db', dir=directory)
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path)
+        # 索引只在本次运行中使用，不需要持久性保证
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _insert(self, sql, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= INDEX_BATCH_SIZE:
+                self.conn.executemany(sql, batch)
+                batch = []
+        if batch:
+            self.conn.executemany(sql, batch)
+        self.conn.commit()
+
+    def add_stored(self, location, entries):
+        """entries: 可迭代的 (key, size, modified)"""
+        self._insert('INSERT OR REPLACE INTO stored VALUES (?, ?, ?, ?)',
+                     ((location, key, size, modified) for key, size, modified in entries))
+
+    def add_referenced(self, rows):
+        """rows: 可迭代的 (location, key, record)；同一文件被多条记录引用时只保留一条"""
+        self._insert('INSERT OR IGNORE INTO referenced VALUES (?, ?, ?)', rows)
+
+    def stored_totals(self, location):
+        return self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM stored WHERE location = ?', (location,)
+        ).fetchone()
+
+    def orphans(self, location, cutoff):
+        """没有被引用、且修改时间早于 cutoff 的文件，按 key 排序逐行产出 (key, size)"""
+        return self.conn.execute(
+            'SELECT s.key, s.size FROM stored s WHERE s.location = ? AND s.modified < ? AND NOT EXISTS '
+            '(SELECT 1 FROM referenced r WHERE r.location = s.location AND r.key = s.key) ORDER BY s.key',
+            (location, cutoff)
+        )
+
+    def recent_unreferenced(self, location, cutoff):
+        """没有被引用、但修改时间较新（或未知）的文件数和字节数"""
+        return self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(s.size), 0) FROM stored s WHERE s.location = ? '
+            'AND (s.modified IS NULL OR s.modified >= ?) AND NOT EXISTS '
+            '(SELECT 1 FROM referenced r WHERE r.location = s.location AND r.key = s.key)',
+            (location, cutoff)
+        ).fetchone()
+
+    def missing(self, location):
+        """被引用但不存在的文件，逐行产出 (key, record)"""
+        return self.conn.execute(
+            'SELECT r.key, r.record FROM referenced r WHERE r.location = ? AND NOT EXISTS '
+            '(SELECT 1 FROM stored s WHERE s.location = r.location AND s.key = r.key) ORDER BY r.key',
+            (location,)
+        )
+
+
+def local_key(path):
+    """本地文件统一使用绝对路径比较（数据库中保存的可能是相对路径）"""
+    return os.path.abspath(path)
+
+
+def walk_local(root, exclude=()):
+    """逐目录遍历上传目录（跳过 exclude 中的目录），产出 (绝对路径, 大小, 修改时间)"""
+    exclude = {local_key(path) for path in exclude}
+    pending = [local_key(root)]
+    while pending:
+        directory = pending.pop()
+        if directory in exclude:
+            continue
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield entry.path, stat.st_size, stat.st_mtime
+            except FileNotFoundError:
+                continue
+
+
+def list_bucket(storage, prefixes):
+    """按前缀逐页列出存储桶中的对象，产出 (对象名, 大小, 修改时间)"""
+    for prefix in prefixes:
+        for entry in storage.list_files(prefix):
+            yield entry['key'], entry['size'], entry.get('modified')
+
+
+def iter_references():
+    """按主键分页读取文件和聊天消息表，产出 (存储位置, 文件, 引用它的记录)"""
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            MediaFile.id, MediaFile.storage_type, MediaFile.file_path, MediaFile.thumbnail_path,
+            MediaFile.remote_storage, MediaFile.remote_path
+        ).filter(MediaFile.id > last_id).order_by(MediaFile.id).limit(INDEX_BATCH_SIZE).all()
+        if not rows:
+            break
+        for row in rows:
+            record = f'file:{row.id}'
+            if row.file_path:
+                if row.storage_type == 'local':
+                    yield 'local', local_key(row.file_path), record
+                else:
+                    yield row.storage_type, row.file_path, record
+            if row.thumbnail_path:
+                yield 'local', local_key(row.thumbnail_path), record
+            # 分层存储保留的云端副本
+            if row.remote_storage and row.remote_path:
+                yield row.remote_storage, row.remote_path, record
+        last_id = rows[-1].id
+
+    last_id = 0
+    while True:
+        rows = db.session.query(ChatMessage.id, ChatMessage.file_path, ChatMessage.thumbnail_path).filter(
+            ChatMessage.id > last_id
+        ).order_by(ChatMessage.id).limit(INDEX_BATCH_SIZE).all()
+        if not rows:
+            break
+        for row in rows:
+            for path in (row.file_path, row.thumbnail_path):
+                if path:
+                    yield 'local', local_key(path), f'chat_message:{row.id}'
+        last_id = rows[-1].id
+
+
+def referenced_providers():
+    """数据库中引用过的云存储提供商，加上当前配置的提供商"""
+    providers = {get_current_storage_provider()}
+    providers.update(value for (value,) in db.session.query(MediaFile.storage_type).distinct())
+    providers.update(value for (value,) in db.session.query(MediaFile.remote_storage).distinct() if value)
+    return sorted(provider for provider in providers if provider and provider != 'local')
+
+
+def delete_local(keys):
+    """删除本地孤儿文件，返回 {路径: 错误信息}"""
+    failed = {}
+    for key in keys:
+        try:
+            os.remove(key)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            failed[key] = str(e)
+    return failed
+
+
+def reclaim_orphans(index, location, storage, cutoff):
+    """按批删除孤儿文件，返回 (删除的文件数, 字节数, 失败列表)"""
+    deleted = deleted_bytes = 0
+    failures = []
+    cursor = index.orphans(location, cutoff)
+    while True:
+        batch = cursor.fetchmany(BATCH_DELETE_LIMIT)
+        if not batch:
+            break
+        keys = [key for key, _ in batch]
+        try:
+            failed = delete_local(keys) if storage is None else storage.delete_files(keys)
+        except Exception as e:
+            failed = dict.fromkeys(keys, str(e))
+        for key, size in batch:
+            if key in failed:
+                failures.append({'location': location, 'key': key, 'error': failed[key]})
+            else:
+                deleted += 1
+                deleted_bytes += size
+    return deleted, deleted_bytes, failures
+
+
+def run_reconcile(providers=None, min_age_hours=24, reclaim=False, sample=20, index_dir=None):
+    """对账一次，返回每个存储位置的统计结果；reclaim 为 False 时只报告"""
+    started = time.monotonic()
+    if providers is None:
+        providers = ['local'] + referenced_providers()
+    cutoff = time.time() - min_age_hours * 3600
+    result = {'locations': {}, 'errors': {}, 'reclaim': reclaim}
+
+    index = ReconcileIndex(index_dir)
+    try:
+        # 先扫描存储、后读取数据库：扫描期间被删除记录的文件会被判为孤儿，新上传的文件修改时间较新不会被误删
+        storages = {}
+        for location in providers:
+            try:
+                if location == 'local':
+                    # 对象缓存目录可能被配置在上传目录中，其中的文件不属于任何记录
+                    index.add_stored('local', walk_local(UPLOAD_FOLDER, exclude=[app.config['OBJECT_CACHE_DIR']]))
+                    storages['local'] = None
+                    continue
+                storage = storage_manager.get_storage(location)
+                if not storage or not storage.is_configured():
+                    result['errors'][location] = '存储提供商未配置'
+                    continue
+                index.add_stored(location, list_bucket(storage, CLOUD_PREFIXES))
+                storages[location] = storage
+            except Exception as e:
+                # 没有完整列出的存储不参与对账，避免把未列出的文件报告为缺失
+                result['errors'][location] = str(e)
+                index.conn.execute('DELETE FROM stored WHERE location = ?', (location,))
+                index.conn.commit()
+
+        index.add_referenced(iter_references())
+
+        for location, storage in storages.items():
+            count, size = index.stored_totals(location)
+            orphan_count = orphan_bytes = 0
+            orphan_sample = []
+            for key, orphan_size in index.orphans(location, cutoff):
+                orphan_count += 1
+                orphan_bytes += orphan_size
+                if len(orphan_sample) < sample:
+                    orphan_sample.append({'key': key, 'size': orphan_size})
+            recent_count, recent_bytes = index.recent_unreferenced(location, cutoff)
+
+            missing_count = 0
+            missing_sample = []
+            for key, record in index.missing(location):
+                # 本地文件可能保存在上传目录之外（例如更换过 UPLOAD_FOLDER）
+                if location == 'local' and os.path.exists(key):
+                    continue
+                if location != 'local' and not key.startswith(CLOUD_PREFIXES):
+                    continue
+                missing_count += 1
+                if len(missing_sample) < sample:
+                    missing_sample.append({'key': key, 'record': record})
+
+            info = {
+                'files': count, 'bytes': size,
+                'orphans': orphan_count, 'orphan_bytes': orphan_bytes, 'orphan_sample': orphan_sample,
+                'recent_unreferenced': recent_count, 'recent_unreferenced_bytes': recent_bytes,
+                'missing': missing_count, 'missing_sample': missing_sample,
+            }
+            if reclaim and orphan_count:
+                info['reclaimed'], info['reclaimed_bytes'], info['failed'] = reclaim_orphans(
+                    index, location, storage, cutoff
+                )
+            result['locations'][location] = info
+    finally:
+        index.close()
+
+    result['elapsed'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SoloCloud 存储对账工具')
+    parser.add_argument('--providers', help='要检查的存储，逗号分隔（默认: local 和数据库中用到的云存储）')
+    parser.add_argument('--min-age', type=float, default=24,
+                        help='修改时间在多少小时内的文件不算作孤儿（默认: %(default)s）')
+    parser.add_argument('--reclaim', action='store_true', help='删除孤儿文件（默认只报告）')
+    parser.add_argument('--sample', type=int, default=20, help='每个存储最多列出多少个孤儿/缺失文件（默认: %(default)s）')
+    parser.add_argument('--index-dir', help='临时索引所在目录（默认: 系统临时目录）')
+    args = parser.parse_args()
+    providers = [value for value in args.providers.split(',') if value] if args.providers else None
+
+    print(f"🔍 正在对账{'并回收孤儿文件' if args.reclaim else '（只报告）'}...")
+    with app.app_context():
+        result = run_reconcile(providers=providers, min_age_hours=args.min_age, reclaim=args.reclaim,
+                               sample=args.sample, index_dir=args.index_dir)
+
+    for location, error in result['errors'].items():
+        print(f"⚠️  {location}: 跳过，{error}")
+    for location, info in result['locations'].items():
+        print(f"📦 {location}: {info['files']} 个文件 {info['bytes']} 字节")
+        print(f"   孤儿文件 {info['orphans']} 个 {info['orphan_bytes']} 字节"
+              f"（另有 {info['recent_unreferenced']} 个最近修改的未引用文件未计入）")
+        for entry in info['orphan_sample']:
+            print(f"     - {entry['key']} ({entry['size']} 字节)")
+        print(f"   缺失文件 {info['missing']} 个")
+        for entry in info['missing_sample']:
+            print(f"     - {entry['key']} ({entry['record']})")
+        if 'reclaimed' in info:
+            print(f"   ✅ 已删除 {info['reclaimed']} 个孤儿文件，释放 {info['reclaimed_bytes']} 字节")
+            for failure in info['failed'][:args.sample]:
+                print(f"   ❌ {failure['key']}: {failure['error']}")
+    print(f"⏱️  耗时 {result['elapsed']} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,7 @@ import sys
 import os
 sys.path.insert(0, '.')
 
-from app import app, db, User
+from app import app, User, commit_user_changes
 
 def reset_user_password(username, new_password):
     """重置用户密码"""
@@ -26,7 +26,8 @@ def reset_user_password(username, new_password):
             
             # 重置密码
             user.set_password(new_password)
-            db.session.commit()
+            # 递增用户版本号，使运行中各worker的身份缓存失效
+            commit_user_changes()
             
             print(f"✅ 用户 '{username}' 的密码已成功重置")
             print(f"📧 邮箱: {user.email}")
@@ -0,0 +1,86 @@
+"""
+响应中间件
+为较大的JSON响应提供 gzip/brotli 压缩，并为列表接口提供基于结果集摘要的弱ETag，
+列表未变化时直接返回 304，无需查询和序列化数据行
+"""
+
+import gzip
+import hashlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 参与压缩的响应类型
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+
+
+def weak_etag(*parts) -> str:
+    """根据结果集摘要（如数量、最大更新时间）和请求参数生成ETag值"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def is_not_modified(etag: str) -> bool:
+    """客户端缓存的ETag是否与当前结果一致"""
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag: str):
+    """返回不带正文的 304 响应"""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def set_list_etag(response, etag: str):
+    """为列表响应设置弱ETag；no-cache 让浏览器每次都带 If-None-Match 重新验证"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _choose_encoding(accept_encoding) -> str:
+    """按客户端支持情况选择压缩算法，优先 brotli"""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+def init_compression(app):
+    """注册压缩钩子：超过 COMPRESS_MIN_SIZE 字节的JSON响应按 Accept-Encoding 压缩"""
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        encoding = _choose_encoding(request.accept_encodings)
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=brotli_quality)
+        elif encoding == 'gzip':
+            compressed = gzip.compress(data, compresslevel=gzip_level)
+        else:
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return app
@@ -0,0 +1,58 @@
+"""
+SQLite 生产环境配置
+在每个新建的数据库连接上应用 WAL、同步级别、缓存等 PRAGMA，
+以便多个 gunicorn worker 并发写入同一个 SQLite 文件
+"""
+
+from sqlalchemy import event
+
+# 默认的连接级 PRAGMA
+DEFAULT_SQLITE_PRAGMAS = {
+    # WAL 模式下读写互不阻塞，提交只需追加日志
+    'journal_mode': 'WAL',
+    # WAL 模式下 NORMAL 已能保证数据库一致性，只在检查点时 fsync
+    'synchronous': 'NORMAL',
+    # 遇到写锁时最多等待的毫秒数，而不是立即报 "database is locked"
+    'busy_timeout': 10000,
+    # 页缓存大小，负数表示 KiB（约 20MB）
+    'cache_size': -20000,
+    # 使用内存映射读取数据库文件（256MB）
+    'mmap_size': 268435456,
+    # 临时表和排序使用内存
+    'temp_store': 'MEMORY',
+}
+
+
+def is_sqlite_memory_uri(uri) -> bool:
+    """判断数据库URI是否为内存SQLite数据库（使用StaticPool，不能设置连接池大小）"""
+    uri = str(uri or '')
+    if not uri.startswith('sqlite'):
+        return False
+    database = uri.split(':///', 1)[1] if ':///' in uri else ''
+    return database in ('', ':memory:')
+
+
+def apply_sqlite_profile(engine, pragmas=None) -> bool:
+    """为SQLite引擎注册连接钩子，在每个新连接上执行 PRAGMA；非SQLite引擎直接忽略"""
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    return True
+
+
+def apply_pragmas(connection, pragmas=None):
+    """在原生 sqlite3 连接上执行 PRAGMA（供脚本和基准测试使用）"""
+    pragmas = DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name}={value}')
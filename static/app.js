@@ -190,6 +190,40 @@ function initializeApp() {
     loadFiles();
     loadNotes();
     loadStorageConfig(); // 加载存储配置
+    initializeLiveUpdates(); // 其他设备上的修改实时刷新
+}
+
+// 实时更新：通过 Server-Sent Events 接收变更，按类型刷新对应列表
+function initializeLiveUpdates() {
+    // 服务端使用 sync worker 时不启用：每个长连接会占用一个 worker 进程
+    if (!window.EventSource || !window.LIVE_UPDATES_ENABLED) return;
+
+    const pending = new Set();
+    let refreshTimer = null;
+
+    // 合并短时间内的多条变更，每个列表只刷新一次（列表接口带ETag，未变化时返回304）
+    function scheduleRefresh(entity) {
+        pending.add(entity);
+        clearTimeout(refreshTimer);
+        refreshTimer = setTimeout(() => {
+            if (pending.has('file')) loadFiles(currentPage);
+            if (pending.has('note')) loadNotes();
+            if (pending.has('chat_message')) {
+                const chatSection = document.getElementById('chat-section');
+                if (chatSection && chatSection.style.display !== 'none') loadChatMessages();
+            }
+            pending.clear();
+        }, 300);
+    }
+
+    // 断线后浏览器自动重连并带上 Last-Event-ID，服务端补发错过的变更
+    const source = new EventSource('/api/events');
+    source.addEventListener('change', event => {
+        scheduleRefresh(JSON.parse(event.data).entity);
+    });
+    source.addEventListener('reset', () => {
+        ['file', 'note', 'chat_message'].forEach(scheduleRefresh);
+    });
 }
 
 function initializeNavigation() {
@@ -524,8 +558,13 @@ function uploadFile(file, index) {
     xhr.send(formData);
 }
 
+// 列表接口只请求界面需要的字段
+const FILE_LIST_FIELDS = 'id,original_filename,file_type,file_size,upload_time,has_thumbnail';
+const CHAT_MESSAGE_FIELDS = 'id,message_type,content,file_name,file_size,created_time,has_thumbnail';
+const NOTE_LIST_FIELDS = 'id,title,content,tags';
+
 function loadFiles(page = 1) {
-    let url = `/api/files?page=${page}`;
+    let url = `/api/files?page=${page}&fields=${FILE_LIST_FIELDS}`;
     if (currentFileType) url += `&type=${currentFileType}`;
     if (currentSearchTerm) url += `&search=${encodeURIComponent(currentSearchTerm)}`;
     if (currentSortBy) url += `&sort_by=${currentSortBy}`;
@@ -647,7 +686,7 @@ function displayFilesList(files, container) {
 
 // 获取缩略图 HTML
 function getThumbnailHtml(file) {
-    if ((file.file_type === 'image' || file.file_type === 'video') && file.thumbnail_path) {
+    if ((file.file_type === 'image' || file.file_type === 'video') && file.has_thumbnail) {
         const iconClass = getFileIcon(file.file_type);
         const videoOverlay = file.file_type === 'video' ? '<div class="video-overlay"><i class="bi bi-play-circle-fill"></i></div>' : '';
         return `<div class="thumbnail-container">
@@ -754,7 +793,7 @@ function downloadFile(fileId) {
 }
 
 function deleteFile(fileId) {
-    if (!confirm('确定要删除这个文件吗？')) return;
+    if (!confirm('确定要删除这个文件吗？文件会移入回收站，到期后永久删除。')) return;
     
     fetch(`/api/files/${fileId}`, { method: 'DELETE' })
         .then(response => response.json())
@@ -853,7 +892,7 @@ function initializeNotes() {
 }
 
 function loadNotes(page = 1) {
-    fetch(`/api/notes?page=${page}`)
+    fetch(`/api/notes?page=${page}&fields=${NOTE_LIST_FIELDS}`)
         .then(response => response.json())
         .then(data => {
             displayNotes(data.notes);
@@ -1228,7 +1267,7 @@ function handleChatFiles(files) {
 }
 
 function loadChatMessages(page = 1) {
-    fetch(`/api/chat/messages?page=${page}`)
+    fetch(`/api/chat/messages?page=${page}&fields=${CHAT_MESSAGE_FIELDS}`)
         .then(response => response.json())
         .then(data => {
             if (data.messages) {
@@ -1287,7 +1326,7 @@ function generateChatMessageHtml(message) {
                 <div class="message-time">${time}</div>
             </div>
         `;
-    } else if (message.message_type === 'image' && message.thumbnail_path) {
+    } else if (message.message_type === 'image' && message.has_thumbnail) {
         return `
             <div class="chat-message file" data-message-id="${message.id}">
                 <div class="image-message" onclick="previewChatFile(${message.id}, '${message.file_name}', 'image')">
@@ -1301,7 +1340,7 @@ function generateChatMessageHtml(message) {
                 <div class="message-time">${time}</div>
             </div>
         `;
-    } else if (message.message_type === 'video' && message.thumbnail_path) {
+    } else if (message.message_type === 'video' && message.has_thumbnail) {
         return `
             <div class="chat-message file" data-message-id="${message.id}">
                 <div class="video-message" onclick="previewChatFile(${message.id}, '${message.file_name}', 'video')">
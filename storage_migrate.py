@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+存储迁移工具 - 把已有文件从一个存储提供商批量迁移到另一个
+  - 多个并发流复制对象（云存储之间经本地临时文件中转），可限制总带宽
+  - 校验目标对象的大小（可选哈希）后，分批更新 storage_type / file_path
+  - 可选在提交后删除源对象
+  - 可中断续传：进度以数据库为准，重新执行只处理仍在源存储上的文件，
+    目标上已有且校验通过的对象不会重复上传
+使用方法:
+  python storage_migrate.py --from local --to aliyun_oss
+  python storage_migrate.py --from qiniu --to tencent_cos --workers 16 --limit-mbps 50 --delete-source
+  python storage_migrate.py --from local --to jianguoyun --dry-run
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, MediaFile, CacheVersion, ChangeLog, UPLOAD_FOLDER, storage_manager
+from async_storage import get_async_storage, batch_delete
+from change_feed import append_changes
+from cloud_storage import STORAGE_PROVIDERS
+from tiering import cloud_object_name
+
+MD5_ETAG = re.compile(r'^[0-9a-f]{32}$')
+
+
+class MigrationError(Exception):
+    """单个文件迁移失败"""
+
+
+def file_digest(path, algorithm='md5'):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Throttle:
+    """所有并发流共享的令牌桶带宽限制（字节/秒），0 表示不限制"""
+
+    def __init__(self, bytes_per_second: float):
+        self.rate = bytes_per_second
+        self.allowance = bytes_per_second
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def consume(self, nbytes: int):
+        if not self.rate:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.updated) * self.rate)
+            self.updated = now
+            self.allowance -= nbytes
+            if self.allowance < 0:
+                # 持有锁等待，后续的流排在后面，总速率不超过限制
+                await asyncio.sleep(-self.allowance / self.rate)
+
+
+class Progress:
+    """迁移进度统计"""
+
+    def __init__(self, total_files: int, total_bytes: int):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self.failed = []
+        self.started = time.monotonic()
+
+    def done(self, size: int):
+        self.files += 1
+        self.bytes += size
+
+    def fail(self, file_id: int, error):
+        self.failed.append((file_id, str(error)))
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.bytes / elapsed
+        remaining = self.total_bytes - self.bytes
+        eta = f"{int(remaining / rate // 60)} 分 {int(remaining / rate % 60)} 秒" if rate > 0 else '-'
+        return (f"📦 {self.files}/{self.total_files} 个文件，"
+                f"{self.bytes / 1048576:.1f}/{self.total_bytes / 1048576:.1f} MB，"
+                f"{rate / 1048576:.2f} MB/s，失败 {len(self.failed)}，预计剩余 {eta}")
+
+
+class StorageMigration:
+    """把 storage_type 为 source 的文件迁移到 destination"""
+
+    def __init__(self, source, destination, workers=8, batch_size=100, verify='size', delete_source=False,
+                 limit_mbps=0, limit=None, temp_dir=None, report_interval=10):
+        self.source = source
+        self.destination = destination
+        self.workers = workers
+        self.batch_size = batch_size
+        self.verify = verify
+        self.delete_source = delete_source
+        self.throttle_rate = limit_mbps * 1048576
+        self.limit = limit
+        self.temp_dir = temp_dir
+        self.report_interval = report_interval
+        self.pending = []
+        self.progress = None
+
+    def pending_query(self):
+        return db.session.query(
+            MediaFile.id, MediaFile.filename, MediaFile.file_path, MediaFile.file_size,
+            MediaFile.remote_storage, MediaFile.remote_path
+        ).filter(
+            MediaFile.storage_type == self.source, MediaFile.deleted_at.is_(None)
+        )
+
+    def totals(self):
+        """待迁移的文件数和总字节数"""
+        count, size = db.session.query(
+            db.func.count(MediaFile.id), db.func.coalesce(db.func.sum(MediaFile.file_size), 0)
+        ).filter(MediaFile.storage_type == self.source, MediaFile.deleted_at.is_(None)).one()
+        if self.limit is not None and count > self.limit:
+            # 限定数量时按实际要处理的文件计算
+            rows = self.pending_query().order_by(MediaFile.id).limit(self.limit).all()
+            return len(rows), sum(row.file_size for row in rows)
+        return count, size
+
+    def destination_key(self, row):
+        """目标上的对象名：云端之间保持原对象名，本地文件使用与上传时一致的 <子目录>/<文件名>"""
+        return cloud_object_name(row) if self.source == 'local' else row.file_path
+
+    async def matches(self, key, local_path, size):
+        """目标对象是否存在且与本地文件一致"""
+        if self.destination == 'local':
+            if not os.path.exists(key) or os.path.getsize(key) != size:
+                return False
+            if self.verify != 'hash':
+                return True
+            digests = await asyncio.gather(*(asyncio.to_thread(file_digest, path) for path in (key, local_path)))
+            return digests[0] == digests[1]
+
+        info = await self.dst.head_file(key)
+        if info is None or info['size'] != size:
+            return False
+        if self.verify != 'hash':
+            return True
+        local_md5 = await asyncio.to_thread(file_digest, local_path)
+        etag = (info.get('etag') or '').lower()
+        if MD5_ETAG.match(etag):
+            return etag == local_md5
+        # 分片上传或七牛等 ETag 不是 MD5 的情况，读回对象比较
+        check_path = f"{local_path}.verify"
+        try:
+            ok, message = await self.dst.download_file(key, check_path)
+            return ok and await asyncio.to_thread(file_digest, check_path) == local_md5
+        finally:
+            if os.path.exists(check_path):
+                os.remove(check_path)
+
+    async def copy_one(self, row):
+        """复制一个文件并校验，返回目标路径"""
+        temp_path = None
+        try:
+            if self.source == 'local':
+                local_path = row.file_path
+                if not os.path.exists(local_path):
+                    raise MigrationError('源文件不存在')
+            else:
+                temp_path = local_path = os.path.join(self.temp_dir, f"{row.id}.part")
+                await self.throttle.consume(row.file_size)
+                ok, message = await self.src.download_file(row.file_path, temp_path)
+                if not ok:
+                    raise MigrationError(f'下载失败: {message}')
+            size = os.path.getsize(local_path)
+            if size != row.file_size:
+                raise MigrationError(f'源文件大小 {size} 与记录 {row.file_size} 不一致')
+
+            # 冷热分层保留的云端副本就在目标存储上且内容一致时直接复用（与 tiering.demote_file 相同）
+            if row.remote_storage == self.destination and row.remote_path:
+                if await self.matches(row.remote_path, local_path, size):
+                    return row.remote_path
+
+            key = self.destination_key(row)
+            if self.destination == 'local':
+                key = os.path.join(UPLOAD_FOLDER, key)
+            # 续传：上次已经复制过（但未提交）的对象不用重新上传
+            if await self.matches(key, local_path, size):
+                return key
+            await self.throttle.consume(size)
+            if self.destination == 'local':
+                os.makedirs(os.path.dirname(key), exist_ok=True)
+                await asyncio.to_thread(shutil.copyfile, local_path, key)
+            else:
+                ok, message = await self.dst.upload_file(local_path, key)
+                if not ok:
+                    raise MigrationError(f'上传失败: {message}')
+            if not await self.matches(key, local_path, size):
+                raise MigrationError('目标对象校验失败')
+            return key
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def flush(self):
+        """提交一批迁移结果，之后按需删除源对象"""
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        table = MediaFile.__table__
+        # 只更新仍在源存储、路径未变的记录（迁移期间被删除或移动的文件保持不变）；
+        # 分层保留的云端副本要么已作为新位置复用，要么不再被引用，一并清空
+        stmt = table.update().where(
+            table.c.id == db.bindparam('file_id'),
+            table.c.storage_type == self.source,
+            table.c.file_path == db.bindparam('old_path')
+        ).values(storage_type=self.destination, file_path=db.bindparam('new_path'),
+                 remote_storage=None, remote_path=None)
+        db.session.execute(stmt, [{'file_id': row.id, 'old_path': row.file_path, 'new_path': new_path}
+                                  for row, new_path in batch])
+        # 批量更新不经过 ORM flush，按文件所有者补写变更记录，客户端增量同步时刷新这些文件
+        owners = defaultdict(list)
+        for file_id, user_id in db.session.query(MediaFile.id, MediaFile.user_id).filter(
+            MediaFile.id.in_([row.id for row, _ in batch]), MediaFile.storage_type == self.destination
+        ):
+            owners[user_id].append(file_id)
+        for user_id, file_ids in owners.items():
+            append_changes(db.session, ChangeLog.__table__, 'file', file_ids, 'update', user_id)
+        CacheVersion.bump('share_link')
+        db.session.commit()
+
+        moved = {file_id for file_ids in owners.values() for file_id in file_ids}
+        await self.delete_stale_copies([(row, new_path) for row, new_path in batch if row.id in moved])
+        if self.delete_source:
+            paths = [row.file_path for row, _ in batch if row.id in moved]
+            for path, ok, message in await batch_delete(self.src, paths, self.workers):
+                if not ok:
+                    print(f"⚠️  删除源对象失败: {path} {message}")
+
+    async def delete_stale_copies(self, moved):
+        """删除迁移后不再被引用的分层云端副本（已复用为新位置的除外）"""
+        stale = defaultdict(list)
+        for row, new_path in moved:
+            if row.remote_storage and row.remote_path and \
+                    (row.remote_storage, row.remote_path) != (self.destination, new_path):
+                stale[row.remote_storage].append(row.remote_path)
+        for provider, paths in stale.items():
+            storage = storage_manager.get_storage(provider)
+            if not storage:
+                print(f"⚠️  存储提供商 {provider} 不可用，未删除旧的云端副本: {paths}")
+                continue
+            try:
+                failed = await asyncio.to_thread(storage.delete_files, paths)
+            except Exception as e:
+                failed = dict.fromkeys(paths, str(e))
+            for path, message in failed.items():
+                print(f"⚠️  删除旧的云端副本失败: {path} {message}")
+
+    async def run(self):
+        total_files, total_bytes = self.totals()
+        self.progress = Progress(total_files, total_bytes)
+        self.throttle = Throttle(self.throttle_rate)
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        finished = asyncio.Event()
+
+        async def produce():
+            # 按主键分页读取，不一次性载入全部记录
+            last_id, queued = 0, 0
+            while self.limit is None or queued < self.limit:
+                page = self.batch_size if self.limit is None else min(self.batch_size, self.limit - queued)
+                rows = self.pending_query().filter(MediaFile.id > last_id).order_by(MediaFile.id).limit(page).all()
+                if not rows:
+                    break
+                for row in rows:
+                    await queue.put(row)
+                last_id, queued = rows[-1].id, queued + len(rows)
+            for _ in range(self.workers):
+                await queue.put(None)
+
+        async def work():
+            while True:
+                row = await queue.get()
+                if row is None:
+                    return
+                try:
+                    new_path = await self.copy_one(row)
+                except Exception as e:
+                    self.progress.fail(row.id, e)
+                    continue
+                self.pending.append((row, new_path))
+                self.progress.done(row.file_size)
+                if len(self.pending) >= self.batch_size:
+                    await self.flush()
+
+        async def report():
+            while not finished.is_set():
+                try:
+                    await asyncio.wait_for(finished.wait(), self.report_interval)
+                except asyncio.TimeoutError:
+                    print(self.progress.line(), flush=True)
+
+        async with get_async_storage(self.source, storage_manager.get_provider_config(self.source),
+                                     self.workers) as self.src, \
+                get_async_storage(self.destination, storage_manager.get_provider_config(self.destination),
+                                  self.workers) as self.dst:
+            reporter = asyncio.create_task(report())
+            try:
+                await asyncio.gather(produce(), *(work() for _ in range(self.workers)))
+            finally:
+                # 中断时也提交已完成的部分
+                await self.flush()
+                finished.set()
+                await reporter
+        return self.progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SoloCloud 存储迁移工具')
+    parser.add_argument('--from', dest='source', required=True, choices=list(STORAGE_PROVIDERS), help='源存储')
+    parser.add_argument('--to', dest='destination', required=True, choices=list(STORAGE_PROVIDERS), help='目标存储')
+    parser.add_argument('--workers', type=int, default=8, help='并发复制数（默认: %(default)s）')
+    parser.add_argument('--batch-size', type=int, default=100, help='每批提交的文件数（默认: %(default)s）')
+    parser.add_argument('--verify', choices=('size', 'hash'), default='size', help='校验方式（默认: %(default)s）')
+    parser.add_argument('--delete-source', action='store_true', help='提交后删除源对象')
+    parser.add_argument('--limit-mbps', type=float, default=0, help='总带宽上限 MB/s，0 表示不限制')
+    parser.add_argument('--limit', type=int, help='本次最多迁移的文件数')
+    parser.add_argument('--tmp-dir', default=None, help='云存储之间中转用的临时目录')
+    parser.add_argument('--report-interval', type=float, default=10, help='进度输出间隔（秒）')
+    parser.add_argument('--dry-run', action='store_true', help='只统计待迁移的文件')
+    args = parser.parse_args()
+
+    if args.source == args.destination:
+        parser.error('源存储和目标存储不能相同')
+
+    with app.app_context():
+        for provider in (args.source, args.destination):
+            storage = storage_manager.get_storage(provider)
+            if storage is None or not storage.is_configured():
+                print(f"❌ {STORAGE_PROVIDERS[provider]} 未配置")
+                sys.exit(1)
+
+        migration = StorageMigration(
+            args.source, args.destination, workers=args.workers, batch_size=args.batch_size,
+            verify=args.verify, delete_source=args.delete_source, limit_mbps=args.limit_mbps,
+            limit=args.limit, report_interval=args.report_interval
+        )
+        total_files, total_bytes = migration.totals()
+        print(f"🚚 {STORAGE_PROVIDERS[args.source]} -> {STORAGE_PROVIDERS[args.destination]}："
+              f"{total_files} 个文件，{total_bytes / 1048576:.1f} MB")
+        if args.dry_run or not total_files:
+            return
+
+        migration.temp_dir = tempfile.mkdtemp(prefix='solocloud-migrate-', dir=args.tmp_dir)
+        try:
+            progress = asyncio.run(migration.run())
+        finally:
+            shutil.rmtree(migration.temp_dir, ignore_errors=True)
+
+    print(progress.line())
+    for file_id, error in progress.failed:
+        print(f"❌ 文件 {file_id}: {error}")
+    if progress.failed:
+        print("⚠️  部分文件迁移失败，修复问题后重新执行即可继续")
+        sys.exit(2)
+    print(f"✅ 迁移完成，如需新上传也使用 {STORAGE_PROVIDERS[args.destination]}，请在存储设置中切换")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""
+云存储容错层
+包装存储客户端的每次调用：
+  - 每种操作有总时限（含重试），单次请求由适配器的连接/读取超时限制
+  - 幂等操作遇到可重试的错误（网络错误、超时、5xx）时按带抖动的指数退避重试
+  - 每个存储提供商一个熔断器，可重试的错误连续达到阈值后快速失败，冷却后放行一个探测请求；
+    文件不存在、无权限等请求本身的错误说明后端正常，不重试也不计入熔断
+  - 记录调用、失败、重试、熔断次数，供 /api/storage/metrics 查看
+"""
+
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional
+
+# 同一操作最多尝试的次数（含首次）
+STORAGE_RETRY_ATTEMPTS = int(os.getenv('STORAGE_RETRY_ATTEMPTS', '3'))
+# 退避基数和上限（秒）
+STORAGE_RETRY_BASE_DELAY = float(os.getenv('STORAGE_RETRY_BASE_DELAY', '0.2'))
+STORAGE_RETRY_MAX_DELAY = float(os.getenv('STORAGE_RETRY_MAX_DELAY', '5'))
+# 连续失败多少次后熔断，熔断后多少秒放行探测请求
+STORAGE_BREAKER_THRESHOLD = int(os.getenv('STORAGE_BREAKER_THRESHOLD', '5'))
+STORAGE_BREAKER_RESET = float(os.getenv('STORAGE_BREAKER_RESET', '30'))
+
+# 各操作的总时限（秒）；超过时限不再重试，且本次调用计入熔断
+OPERATION_DEADLINES = {
+    'head_file': 15,
+    'delete_file': 15,
+    'delete_files': 120,
+    'list_files': 120,
+    'upload_file': 600,
+    'download_file': 600,
+}
+# 耗时取决于文件大小的操作：超过时限只停止重试，慢不说明后端不健康
+TRANSFER_OPERATIONS = {'upload_file', 'download_file'}
+
+
+class TransientStorageError(IOError):
+    """可重试的存储错误：网络错误、超时或服务端 5xx"""
+
+
+def transient_status(status: Optional[int]) -> bool:
+    """HTTP 状态码是否表示可重试的错误：5xx、408、429"""
+    return status is not None and (500 <= status < 600 or status in (408, 429))
+
+
+@lru_cache(maxsize=None)
+def _network_errors() -> tuple:
+    """表示网络错误或超时的异常类型（未安装的 SDK 跳过）"""
+    errors = [TransientStorageError, ConnectionError, TimeoutError]
+    try:
+        import requests
+        errors += [requests.ConnectionError, requests.Timeout]
+    except ImportError:
+        pass
+    try:
+        from oss2.exceptions import RequestError
+        errors.append(RequestError)
+    except ImportError:
+        pass
+    try:
+        from qcloud_cos.cos_exception import CosClientError
+        errors.append(CosClientError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def is_transient(error: BaseException) -> bool:
+    """异常是否可重试：网络错误、超时和服务端 5xx；文件不存在、无权限、4xx 等重试也不会成功"""
+    if isinstance(error, _network_errors()):
+        return True
+    # oss2 的 status、COS 的 get_status_code()、requests 的 HTTPError
+    status = getattr(error, 'status', None)
+    if status is None and callable(getattr(error, 'get_status_code', None)):
+        status = error.get_status_code()
+    if status is None and getattr(error, 'response', None) is not None:
+        status = getattr(error.response, 'status_code', None)
+    return isinstance(status, int) and transient_status(status)
+
+
+class StorageUnavailable(Exception):
+    """存储提供商已熔断，请求未发出"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"存储服务 {provider} 暂时不可用，请 {int(retry_after) + 1} 秒后重试")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """熔断器：closed（正常）-> open（快速失败）-> half_open（放行一个探测请求）"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = STORAGE_BREAKER_THRESHOLD,
+                 reset_timeout: float = STORAGE_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否放行请求；冷却结束后只放行一个探测请求，其结果决定恢复还是继续熔断"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """记录一次失败，返回本次是否触发熔断"""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class StorageMetrics:
+    """按提供商和操作统计的计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers: Dict[str, dict] = {}
+
+    def _provider(self, provider: str) -> dict:
+        entry = self._providers.get(provider)
+        if entry is None:
+            entry = self._providers[provider] = {'trips': 0, 'rejected': 0, 'operations': {}}
+        return entry
+
+    def incr(self, provider: str, operation: Optional[str], name: str, amount: float = 1):
+        with self._lock:
+            entry = self._provider(provider)
+            if operation is not None:
+                entry = entry['operations'].setdefault(operation, {
+                    'calls': 0, 'failures': 0, 'retries': 0, 'deadline_exceeded': 0, 'total_ms': 0.0,
+                })
+            entry[name] += amount
+
+    def snapshot(self, breakers: Dict[str, CircuitBreaker]) -> dict:
+        with self._lock:
+            result = {}
+            for provider, entry in self._providers.items():
+                operations = {}
+                for operation, counters in entry['operations'].items():
+                    counters = dict(counters)
+                    total_ms = counters.pop('total_ms')
+                    counters['avg_ms'] = round(total_ms / counters['calls'], 2) if counters['calls'] else 0
+                    operations[operation] = counters
+                result[provider] = {'trips': entry['trips'], 'rejected': entry['rejected'], 'operations': operations}
+        for provider, breaker in breakers.items():
+            info = result.setdefault(provider, {'trips': 0, 'rejected': 0, 'operations': {}})
+            info['state'] = breaker.state
+            info['consecutive_failures'] = breaker.failures
+            if breaker.state != CircuitBreaker.CLOSED:
+                info['retry_after'] = round(breaker.retry_after(), 1)
+        return result
+
+
+# 进程内共享：同一提供商的所有客户端（包括配置变更后新建的）使用同一个熔断器
+metrics = StorageMetrics()
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker()
+        return breaker
+
+
+def metrics_snapshot() -> dict:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return metrics.snapshot(breakers)
+
+
+def backoff_delay(attempt: int, base: float = STORAGE_RETRY_BASE_DELAY, cap: float = STORAGE_RETRY_MAX_DELAY) -> float:
+    """第 attempt 次重试前的等待时间（full jitter：0 到指数上限之间均匀随机）"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class ResilientStorage:
+    """存储客户端的容错代理，接口与被包装的客户端相同
+
+    上传（整对象覆盖写同一个键）、下载、删除、查询都是幂等的，遇到可重试的错误时会重试（批量删除只在整个请求失败时重试）；
+    列出文件和流式读取只在还没有返回任何结果时重试。不涉及网络的方法（get_file_url、is_configured 等）直接转发。
+    适配器把可重试的错误作为异常抛出，其他失败以 (False, 消息) 返回。
+    """
+
+    def __init__(self, storage, provider: str, attempts: int = STORAGE_RETRY_ATTEMPTS,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.storage = storage
+        self.provider = provider
+        self.attempts = max(1, attempts)
+        self.breaker = breaker or get_breaker(provider)
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def _acquire(self):
+        if not self.breaker.allow():
+            metrics.incr(self.provider, None, 'rejected')
+            raise StorageUnavailable(self.provider, self.breaker.retry_after())
+
+    def _record(self, operation: str, ok: bool, started: float, deadline: float, transient: bool = False):
+        """记录一次请求；transient 表示失败原因是网络错误、超时或 5xx"""
+        elapsed = time.monotonic() - started
+        metrics.incr(self.provider, operation, 'calls')
+        metrics.incr(self.provider, operation, 'total_ms', elapsed * 1000)
+        if not ok:
+            metrics.incr(self.provider, operation, 'failures')
+        slow = elapsed > deadline
+        if slow:
+            metrics.incr(self.provider, operation, 'deadline_exceeded')
+        # 固定大小的请求慢到超出时限同样说明后端不健康，计入熔断（结果照常返回，不重试）
+        if not transient and not (slow and operation not in TRANSFER_OPERATIONS):
+            self.breaker.record_success()
+        elif self.breaker.record_failure():
+            metrics.incr(self.provider, None, 'trips')
+            print(f"存储服务 {self.provider} 连续失败 {self.breaker.failures} 次，已熔断")
+
+    def _call(self, operation: str, func: Callable, *args, failed: Callable = lambda result: False):
+        """执行一次带重试的调用；failed(result) 判断返回值是否表示失败（只计数，不重试）
+
+        只有可重试的异常才会重试和计入熔断，其他异常直接抛出。
+        """
+        deadline = OPERATION_DEADLINES.get(operation, 60)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            self._acquire()
+            attempt_started = time.monotonic()
+            try:
+                result = func(*args)
+            except Exception as e:
+                transient = is_transient(e)
+                self._record(operation, False, attempt_started, deadline, transient)
+                attempt += 1
+                delay = backoff_delay(attempt - 1)
+                if not transient or attempt >= self.attempts or time.monotonic() - started + delay > deadline:
+                    raise
+            else:
+                self._record(operation, not failed(result), attempt_started, deadline)
+                return result
+            metrics.incr(self.provider, operation, 'retries')
+            time.sleep(delay)
+
+    def _call_result(self, operation: str, func: Callable, *args):
+        """返回 (是否成功, 消息) 的操作；熔断或重试后仍然失败时同样以失败结果返回，不抛异常"""
+        try:
+            return self._call(operation, func, *args, failed=lambda result: not result[0])
+        except Exception as e:
+            return False, str(e)
+
+    def upload_file(self, local_path: str, remote_path: str):
+        return self._call_result('upload_file', self.storage.upload_file, local_path, remote_path)
+
+    def download_file(self, remote_path: str, local_path: str):
+        return self._call_result('download_file', self.storage.download_file, remote_path, local_path)
+
+    def delete_file(self, remote_path: str):
+        return self._call_result('delete_file', self.storage.delete_file, remote_path)
+
+    def delete_files(self, remote_paths: List[str]) -> Dict[str, str]:
+        return self._call('delete_files', self.storage.delete_files, remote_paths)
+
+    def head_file(self, remote_path: str) -> Optional[dict]:
+        return self._call('head_file', self.storage.head_file, remote_path)
+
+    def list_files(self, prefix: str = '') -> Iterator[dict]:
+        return self._iterate('list_files', lambda: self.storage.list_files(prefix))
+
+    def stream_file(self, remote_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        return self._iterate('stream_file', lambda: self.storage.stream_file(remote_path, chunk_size))
+
+    def _iterate(self, operation: str, factory: Callable[[], Iterator]) -> Iterator:
+        """逐项产出的操作：只在还没有产出任何结果时重试
+        耗时包含调用方处理每一项的时间，不按时限判定"""
+        attempt = 0
+        while True:
+            self._acquire()
+            started = time.monotonic()
+            yielded = False
+            try:
+                for item in factory():
+                    yielded = True
+                    yield item
+            except GeneratorExit:
+                # 调用方提前结束遍历，已取得的结果说明后端正常
+                self._record(operation, True, started, float('inf'))
+                raise
+            except Exception as e:
+                transient = is_transient(e)
+                self._record(operation, False, started, float('inf'), transient)
+                attempt += 1
+                if not transient or yielded or attempt >= self.attempts:
+                    raise
+                metrics.incr(self.provider, operation, 'retries')
+                time.sleep(backoff_delay(attempt - 1))
+                continue
+            self._record(operation, True, started, float('inf'))
+            return
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+分享链接清理脚本 - 分批删除（可选归档）过期、已停用或文件已删除的分享链接，清理过期的变更日志，并整理数据库
+使用方法:
+  python sweeper.py                         # 清理并整理数据库
+  python sweeper.py --dry-run               # 只统计，不删除
+  python sweeper.py --archive shares.jsonl  # 删除前把记录追加到归档文件
+也可以设置 SHARE_SWEEPER_INTERVAL（秒）由 gunicorn worker 在后台定期执行
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, ShareLink, MediaFile, CacheVersion, ChangeLog, SystemConfig, CHANGE_LOG_PRUNED_KEY
+from background_jobs import start_periodic
+
+# 归档时保存的列
+ARCHIVE_COLUMNS = ('id', 'token', 'file_id', 'created_time', 'expires_at', 'access_count', 'max_access', 'is_active')
+
+
+def stale_share_link_filter(grace_days):
+    """待清理的分享链接：已停用、过期超过宽限期，或对应文件已不存在"""
+    cutoff = datetime.utcnow() - timedelta(days=grace_days)
+    orphaned = ~db.session.query(MediaFile.id).filter(MediaFile.id == ShareLink.file_id).exists()
+    return db.or_(ShareLink.is_active == False, ShareLink.expires_at < cutoff, orphaned)
+
+
+def archive_rows(path, rows):
+    """把即将删除的记录追加写入 JSONL 归档文件"""
+    with open(path, 'a', encoding='utf-8') as f:
+        for row in rows:
+            record = {}
+            for name, value in zip(ARCHIVE_COLUMNS, row):
+                record[name] = value.isoformat() if isinstance(value, datetime) else value
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def sweep_share_links(grace_days=7, batch_size=500, archive_path=None, dry_run=False):
+    """分批清理分享链接，返回删除的行数；每批一个短事务，避免长时间占用写锁"""
+    criteria = stale_share_link_filter(grace_days)
+    if dry_run:
+        return db.session.query(db.func.count(ShareLink.id)).filter(criteria).scalar()
+
+    columns = [getattr(ShareLink, name) for name in ARCHIVE_COLUMNS]
+    deleted = 0
+    while True:
+        rows = db.session.query(*columns).filter(criteria).order_by(ShareLink.id).limit(batch_size).all()
+        if not rows:
+            break
+        if archive_path:
+            archive_rows(archive_path, rows)
+        ids = [row.id for row in rows]
+        ShareLink.query.filter(ShareLink.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        if len(rows) < batch_size:
+            break
+
+    if deleted:
+        # 已缓存的分享链接解析结果随之失效
+        CacheVersion.bump('share_link')
+        db.session.commit()
+    return deleted
+
+
+def prune_change_log(retention_days=90, batch_size=500, dry_run=False):
+    """删除超过保留天数的变更日志，返回删除的行数；since 早于保留范围的客户端会收到 reset 并全量刷新"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    query = db.session.query(ChangeLog.seq).filter(ChangeLog.created_time < cutoff)
+    if dry_run:
+        return query.count()
+
+    # 先记下将要清理到的序号再删除，中途失败时只会让客户端多做一次全量刷新
+    pruned_through = query.with_entities(db.func.max(ChangeLog.seq)).scalar()
+    if pruned_through is None:
+        return 0
+    SystemConfig.set_config(CHANGE_LOG_PRUNED_KEY, pruned_through, 'string', '已清理的变更日志的最大序号')
+    query = query.filter(ChangeLog.seq <= pruned_through)
+    deleted = 0
+    while True:
+        seqs = [row.seq for row in query.order_by(ChangeLog.seq).limit(batch_size).all()]
+        if not seqs:
+            break
+        ChangeLog.query.filter(ChangeLog.seq.in_(seqs)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(seqs)
+        if len(seqs) < batch_size:
+            break
+    return deleted
+
+
+def sqlite_page_stats():
+    """返回 (page_count, freelist_count, page_size)，非SQLite数据库返回 None"""
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    with db.engine.connect() as conn:
+        return tuple(conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+                     for name in ('page_count', 'freelist_count', 'page_size'))
+
+
+def compact_database(vacuum=False):
+    """更新统计信息并回收空间：ANALYZE、WAL检查点，可选 VACUUM（会短暂锁库）"""
+    if db.engine.dialect.name != 'sqlite':
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+        return
+    # VACUUM 不能在事务中执行，使用自动提交连接
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql(f'ANALYZE {ShareLink.__tablename__}')
+        conn.exec_driver_sql(f'ANALYZE {MediaFile.__tablename__}')
+        conn.exec_driver_sql(f'ANALYZE {ChangeLog.__tablename__}')
+        if vacuum:
+            conn.exec_driver_sql('VACUUM')
+        conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+def run_sweep(grace_days=7, batch_size=500, archive_path=None, dry_run=False, vacuum=False):
+    """执行一次完整清理，返回统计结果字典"""
+    started = time.monotonic()
+    before = sqlite_page_stats()
+    removed = sweep_share_links(grace_days, batch_size, archive_path, dry_run)
+    pruned = prune_change_log(app.config.get('CHANGE_LOG_RETENTION_DAYS', 90), batch_size, dry_run)
+    if not dry_run:
+        compact_database(vacuum)
+    after = sqlite_page_stats()
+
+    result = {
+        'share_links': removed,
+        'change_log': pruned,
+        'dry_run': dry_run,
+        'remaining': db.session.query(db.func.count(ShareLink.id)).scalar(),
+        'elapsed': round(time.monotonic() - started, 3),
+    }
+    if before and after:
+        result['pages_before'] = before[0]
+        result['pages_after'] = after[0]
+        result['free_pages'] = after[1]
+        result['reclaimed_bytes'] = max(0, before[0] - after[0]) * after[2]
+    return result
+
+
+def log_result(result):
+    """有删除时记录日志"""
+    if result['share_links'] or result['change_log']:
+        app.logger.info(f"分享链接清理完成: {result}")
+
+
+def start_background_sweeper(interval=None):
+    """在当前进程中启动后台清理线程；interval 为 0 时不启动"""
+    if interval is None:
+        interval = app.config.get('SHARE_SWEEPER_INTERVAL', 0)
+    if not interval or interval <= 0:
+        return None
+    return start_periodic(app, 'sweeper', interval, run_sweep, log_result,
+                          grace_days=app.config.get('SHARE_SWEEPER_GRACE_DAYS', 7),
+                          batch_size=app.config.get('SHARE_SWEEPER_BATCH_SIZE', 500),
+                          archive_path=app.config.get('SHARE_SWEEPER_ARCHIVE') or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SoloCloud 分享链接清理工具')
+    parser.add_argument('--grace-days', type=int, default=app.config.get('SHARE_SWEEPER_GRACE_DAYS', 7),
+                        help='过期超过多少天的链接才删除（默认: %(default)s）')
+    parser.add_argument('--batch-size', type=int, default=app.config.get('SHARE_SWEEPER_BATCH_SIZE', 500),
+                        help='每批删除的行数（默认: %(default)s）')
+    parser.add_argument('--archive', default=app.config.get('SHARE_SWEEPER_ARCHIVE') or None,
+                        help='删除前把记录追加到该 JSONL 文件')
+    parser.add_argument('--dry-run', action='store_true', help='只统计待清理的行数')
+    parser.add_argument('--vacuum', action='store_true', help='清理后执行 VACUUM 回收磁盘空间')
+    args = parser.parse_args()
+
+    print("🧹 正在清理分享链接...")
+    with app.app_context():
+        result = run_sweep(args.grace_days, args.batch_size, args.archive, args.dry_run, args.vacuum)
+
+    if result['dry_run']:
+        print(f"📋 待清理分享链接: {result['share_links']} 条，过期变更日志: {result['change_log']} 条")
+        return
+    print(f"✅ 已删除分享链接: {result['share_links']} 条，剩余 {result['remaining']} 条")
+    print(f"✅ 已删除过期变更日志: {result['change_log']} 条")
+    if 'pages_before' in result:
+        print(f"📦 数据库页数: {result['pages_before']} -> {result['pages_after']}，"
+              f"空闲页 {result['free_pages']}，回收 {result['reclaimed_bytes']} 字节")
+    print(f"🕒 耗时 {result['elapsed']} 秒")
+
+
+if __name__ == '__main__':
+    main()
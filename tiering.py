@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+冷热分层存储任务 - 根据访问统计在本地磁盘和云存储之间迁移文件
+  降级: 超过 TIER_COLD_DAYS 天未访问的本地文件，以及本地占用超出容量预算时最久未访问的文件，
+        上传到当前配置的云存储后删除本地副本
+  升级: 最近 TIER_HOT_HOURS 小时内访问过、访问次数达到阈值的云端文件，在容量预算内下载回本地，保留云端副本
+每次执行后访问次数按 TIER_ACCESS_DECAY 衰减，访问次数反映的是近期热度。
+使用方法:
+  python tiering.py             # 执行一次
+  python tiering.py --dry-run   # 只列出计划迁移的文件
+也可以设置 TIER_INTERVAL（秒）由 gunicorn worker 在后台定期执行
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, MediaFile, CacheVersion, UPLOAD_FOLDER, storage_manager, get_current_storage_provider
+from background_jobs import start_periodic
+
+
+def last_used():
+    """最近使用时间：从未访问过的文件按上传时间计算"""
+    return db.func.coalesce(MediaFile.last_access, MediaFile.upload_time)
+
+
+def local_usage():
+    """本地存储的文件占用的字节数（不含缩略图）"""
+    return db.session.query(db.func.coalesce(db.func.sum(MediaFile.file_size), 0)).filter(
+        MediaFile.storage_type == 'local'
+    ).scalar()
+
+
+def plan_tiering(capacity, cold_days=30, hot_hours=24, min_accesses=3, batch_size=50):
+    """计算本次要迁移的文件，返回 (待降级列表, 待升级列表)"""
+    now = datetime.utcnow()
+    usage = local_usage()
+
+    demote = []
+    cold_cutoff = now - timedelta(days=cold_days) if cold_days > 0 else None
+    # 回收站中的文件等待清理任务删除，不再迁移
+    candidates = MediaFile.query.filter(MediaFile.storage_type == 'local', MediaFile.deleted_at.is_(None)).order_by(
+        last_used(), MediaFile.id
+    ).limit(batch_size)
+    for media_file in candidates:
+        used = media_file.last_access or media_file.upload_time
+        # 按最久未使用排序，遇到既不冷、容量也不超的文件就可以停止
+        if usage <= capacity and (cold_cutoff is None or used >= cold_cutoff):
+            break
+        demote.append(media_file)
+        usage -= media_file.file_size
+
+    promote = []
+    hot_cutoff = now - timedelta(hours=hot_hours)
+    candidates = MediaFile.query.filter(
+        MediaFile.storage_type != 'local',
+        MediaFile.deleted_at.is_(None),
+        MediaFile.last_access >= hot_cutoff,
+        MediaFile.access_count >= min_accesses
+    ).order_by(MediaFile.access_count.desc(), MediaFile.last_access.desc()).limit(batch_size)
+    for media_file in candidates:
+        if len(demote) + len(promote) >= batch_size:
+            break
+        if usage + media_file.file_size > capacity:
+            continue
+        promote.append(media_file)
+        usage += media_file.file_size
+    return demote, promote
+
+
+def cloud_object_name(media_file):
+    """与上传时一致的对象名：<子目录>/<文件名>"""
+    subfolder = os.path.basename(os.path.dirname(media_file.file_path)) or 'files'
+    return f"{subfolder}/{media_file.filename}"
+
+
+def demote_file(media_file, provider, storage):
+    """把本地文件迁到云存储：先上传并提交新位置，再删除本地副本"""
+    local_path = media_file.file_path
+    if not os.path.exists(local_path):
+        return False, '本地文件不存在'
+
+    remote_path = None
+    if media_file.remote_storage == provider and media_file.remote_path:
+        # 升级时保留的云端副本仍然存在且大小一致，就不用重新上传
+        info = storage.head_file(media_file.remote_path)
+        if info is not None and info['size'] == media_file.file_size:
+            remote_path = media_file.remote_path
+    if remote_path is None:
+        remote_path = cloud_object_name(media_file)
+        success, message = storage.upload_file(local_path, remote_path)
+        if not success:
+            return False, message
+        stale_copy = (media_file.remote_storage, media_file.remote_path)
+    else:
+        stale_copy = (None, None)
+
+    media_file.storage_type, media_file.file_path = provider, remote_path
+    media_file.remote_storage = media_file.remote_path = None
+    db.session.commit()
+
+    os.remove(local_path)
+    # 旧的云端副本（例如存储提供商已更换）不再被引用
+    if stale_copy[0] and stale_copy[1] != remote_path:
+        old_storage = storage_manager.get_storage(stale_copy[0])
+        if old_storage:
+            old_storage.delete_file(stale_copy[1])
+    return True, remote_path
+
+
+def promote_file(media_file):
+    """把云端文件下载回本地：下载完成并校验大小后再提交新位置，云端副本保留"""
+    storage = storage_manager.get_storage(media_file.storage_type)
+    if not storage or not storage.is_configured():
+        return False, f'存储提供商 {media_file.storage_type} 不可用'
+
+    subfolder = os.path.dirname(media_file.file_path) or 'files'
+    local_path = os.path.join(UPLOAD_FOLDER, subfolder, media_file.filename)
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    temp_path = f"{local_path}.tiering"
+    success, message = storage.download_file(media_file.file_path, temp_path)
+    if success and os.path.getsize(temp_path) != media_file.file_size:
+        success, message = False, '下载的文件大小不一致'
+    if not success:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False, message
+    os.replace(temp_path, local_path)
+
+    media_file.remote_storage, media_file.remote_path = media_file.storage_type, media_file.file_path
+    media_file.storage_type, media_file.file_path = 'local', local_path
+    db.session.commit()
+    return True, local_path
+
+
+def decay_access_counts(factor):
+    """访问次数按系数衰减（取整），使其反映近期热度"""
+    if factor >= 1:
+        return
+    table = MediaFile.__table__
+    db.session.execute(table.update().where(table.c.access_count > 0).values(
+        access_count=db.cast(table.c.access_count * factor, db.Integer)
+    ))
+    db.session.commit()
+
+
+def run_tiering(capacity_mb=None, cold_days=None, hot_hours=None, min_accesses=None, batch_size=None,
+                decay=None, dry_run=False):
+    """执行一次分层迁移，返回统计结果字典"""
+    config = app.config
+    capacity_mb = config.get('TIER_LOCAL_CAPACITY_MB', 0) if capacity_mb is None else capacity_mb
+    cold_days = config.get('TIER_COLD_DAYS', 30) if cold_days is None else cold_days
+    hot_hours = config.get('TIER_HOT_HOURS', 24) if hot_hours is None else hot_hours
+    min_accesses = config.get('TIER_PROMOTE_MIN_ACCESSES', 3) if min_accesses is None else min_accesses
+    batch_size = config.get('TIER_BATCH_SIZE', 50) if batch_size is None else batch_size
+    decay = config.get('TIER_ACCESS_DECAY', 0.5) if decay is None else decay
+
+    started = time.monotonic()
+    result = {'demoted': [], 'promoted': [], 'failed': [], 'dry_run': dry_run}
+    provider = get_current_storage_provider()
+    storage = storage_manager.get_storage(provider) if provider != 'local' else None
+    if capacity_mb <= 0 or storage is None or not storage.is_configured():
+        # 未启用分层，或当前没有可用的云存储作为冷数据层
+        result['skipped'] = True
+        return result
+
+    demote, promote = plan_tiering(capacity_mb * 1024 * 1024, cold_days, hot_hours, min_accesses, batch_size)
+    if dry_run:
+        result['demoted'] = [media_file.id for media_file in demote]
+        result['promoted'] = [media_file.id for media_file in promote]
+        result['local_bytes'] = local_usage()
+        return result
+
+    for action, files in (('demoted', demote), ('promoted', promote)):
+        for media_file in files:
+            try:
+                if action == 'demoted':
+                    success, message = demote_file(media_file, provider, storage)
+                else:
+                    success, message = promote_file(media_file)
+            except Exception as e:
+                db.session.rollback()
+                success, message = False, str(e)
+            if success:
+                result[action].append(media_file.id)
+            else:
+                result['failed'].append({'id': media_file.id, 'action': action, 'error': message})
+
+    if result['demoted'] or result['promoted']:
+        # 已缓存的分享链接解析结果中包含文件位置
+        CacheVersion.bump('share_link')
+        db.session.commit()
+    decay_access_counts(decay)
+    result['local_bytes'] = local_usage()
+    result['elapsed'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def log_result(result):
+    """有迁移或失败时记录日志"""
+    if result['demoted'] or result['promoted'] or result['failed']:
+        app.logger.info(f"冷热分层完成: {result}")
+
+
+def start_background_tiering(interval=None):
+    """在当前进程中启动后台分层线程；interval 为 0 或未设置容量预算时不启动
+
+    每次执行都会衰减访问次数，多个 worker 共用上次执行时间，每个间隔只执行一次。
+    """
+    if interval is None:
+        interval = app.config.get('TIER_INTERVAL', 0)
+    if not interval or interval <= 0 or app.config.get('TIER_LOCAL_CAPACITY_MB', 0) <= 0:
+        return None
+    return start_periodic(app, 'tiering', interval, run_tiering, log_result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SoloCloud 冷热分层存储工具')
+    parser.add_argument('--capacity-mb', type=int, default=app.config.get('TIER_LOCAL_CAPACITY_MB', 0),
+                        help='本地磁盘容量预算，单位MB（默认: %(default)s）')
+    parser.add_argument('--cold-days', type=int, default=app.config.get('TIER_COLD_DAYS', 30),
+                        help='超过多少天未访问的本地文件降级（0表示只按容量降级，默认: %(default)s）')
+    parser.add_argument('--batch-size', type=int, default=app.config.get('TIER_BATCH_SIZE', 50),
+                        help='本次最多迁移的文件数（默认: %(default)s）')
+    parser.add_argument('--dry-run', action='store_true', help='只列出计划迁移的文件')
+    args = parser.parse_args()
+
+    print("🗄️  正在执行冷热分层...")
+    with app.app_context():
+        result = run_tiering(capacity_mb=args.capacity_mb, cold_days=args.cold_days,
+                             batch_size=args.batch_size, dry_run=args.dry_run)
+
+    if result.get('skipped'):
+        print("⚠️  未设置本地容量预算或当前没有可用的云存储，跳过")
+        return
+    if result['dry_run']:
+        print(f"📋 计划降级: {result['demoted']}")
+        print(f"📋 计划升级: {result['promoted']}")
+        return
+    print(f"✅ 降级到云存储: {len(result['demoted'])} 个，升级到本地: {len(result['promoted'])} 个")
+    for failure in result['failed']:
+        print(f"❌ 文件 {failure['id']} {failure['action']} 失败: {failure['error']}")
+    print(f"📦 本地占用 {result['local_bytes']} 字节，耗时 {result['elapsed']} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+写回缓冲计数器
+热点计数（如分享链接访问次数）先在进程内存中累加，由后台线程每隔几秒批量写入数据库，
+避免每次访问都产生一次 SQLite 写事务
+"""
+
+import atexit
+import os
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+
+class WriteBehindCounter:
+    """进程内累加、定期批量落库的计数器
+
+    flush_fn 接收 {key: 增量} 字典并负责写入数据库；写入失败时增量会放回缓冲区，下次重试。
+    后台刷新线程在首次计数时于当前进程中启动，因此在 gunicorn master 中创建、fork 后使用也没有问题。
+    """
+
+    def __init__(self, flush_fn: Callable[[Dict[Hashable, int]], None], interval: float = 5.0):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, int] = {}
+        self._pid = None
+        self._stop = threading.Event()
+        atexit.register(self.close)
+
+    def increment(self, key: Hashable, amount: int = 1):
+        """累加计数（只修改内存）"""
+        self._ensure_flusher()
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def pending(self, key: Hashable) -> int:
+        """尚未写入数据库的增量"""
+        with self._lock:
+            return self._pending.get(key, 0)
+
+    def flush(self):
+        """把缓冲区中的增量批量写入数据库"""
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+        try:
+            self.flush_fn(batch)
+        except Exception as e:
+            print(f"写回计数刷新失败，稍后重试: {e}")
+            with self._lock:
+                for key, amount in batch.items():
+                    self._pending[key] = self._pending.get(key, 0) + amount
+
+    def close(self):
+        """进程退出前写入剩余增量"""
+        self._stop.set()
+        if self._pid == os.getpid():
+            self.flush()
+
+    def _ensure_flusher(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # fork 之后父进程的缓冲区和线程都不属于当前进程
+            self._pid = os.getpid()
+            self._pending = {}
+            self._stop = threading.Event()
+            thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+            thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+class ReservingCounter(WriteBehindCounter):
+    """带上限的写回计数器
+
+    无上限的计数直接走写回缓冲；有上限的计数通过预占机制保证多个worker合计不超限：
+    worker 用一条原子 UPDATE 从数据库预占一批次数，之后在本地消耗，用完再预占。
+    预占的次数已经计入数据库，进程退出时未用完的部分通过 release_fn 归还。
+    """
+
+    def __init__(self, flush_fn: Callable[[Dict[Hashable, int]], None],
+                 reserve_fn: Callable[[Hashable, int], bool],
+                 release_fn: Callable[[Dict[Hashable, int]], None],
+                 interval: float = 5.0, block_size: int = 10):
+        self.reserve_fn = reserve_fn
+        self.release_fn = release_fn
+        self.block_size = block_size
+        self._reserved: Dict[Hashable, int] = {}
+        self._reserved_pid = None
+        super().__init__(flush_fn, interval)
+
+    def acquire(self, key: Hashable, limit: int, used_hint: Optional[int] = None) -> bool:
+        """记录一次访问；limit 为 0 表示不限次数。超过上限时返回 False"""
+        if limit <= 0:
+            self.increment(key)
+            return True
+
+        with self._lock:
+            if self._reserved_pid != os.getpid():
+                self._reserved_pid = os.getpid()
+                self._reserved = {}
+            if self._reserved.get(key, 0) > 0:
+                self._reserved[key] -= 1
+                return True
+
+        # 剩余次数较多时一次预占一批，接近上限时逐次预占，避免其他worker被饿死
+        remaining = limit - (used_hint or 0)
+        block = max(1, min(self.block_size, remaining // 4))
+        for amount in ((block, 1) if block > 1 else (1,)):
+            if self.reserve_fn(key, amount):
+                with self._lock:
+                    self._reserved[key] = self._reserved.get(key, 0) + amount - 1
+                return True
+        return False
+
+    def reserved(self, key: Hashable) -> int:
+        """本进程已预占（已计入数据库）但尚未使用的次数"""
+        with self._lock:
+            if self._reserved_pid != os.getpid():
+                return 0
+            return self._reserved.get(key, 0)
+
+    def discard(self, key: Hashable):
+        """丢弃某个key的本地预占（例如链接已被删除）"""
+        with self._lock:
+            self._reserved.pop(key, None)
+
+    def close(self):
+        super().close()
+        if self._reserved_pid != os.getpid():
+            return
+        with self._lock:
+            unused = {key: amount for key, amount in self._reserved.items() if amount > 0}
+            self._reserved = {}
+        if unused:
+            try:
+                self.release_fn(unused)
+            except Exception as e:
+                print(f"归还预占的访问次数失败: {e}")